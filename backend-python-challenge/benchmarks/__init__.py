@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The benchmarks import the application from src, and the settings require the
+# MinIO credentials, unused since MinIO is replaced by an in-memory stand-in
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+os.environ.setdefault("MINIO_ROOT_USER", "benchmarks")
+os.environ.setdefault("MINIO_ROOT_PASSWORD", "benchmarks")
@@ -0,0 +1,75 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+from .harness import compare_with_baseline, write_results
+
+SUITES = ("micro", "endpoints")
+
+
+def main() -> int:
+    """
+    Run the benchmarks, write their results and compare them with a baseline.
+    Returns:
+        int: Exit status, 1 if a benchmark regressed.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmark the API hot paths."
+    )
+    parser.add_argument("--suite", choices=SUITES, action="append")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes.")
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", default="benchmarks/results/baseline.json")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of the median reported as a regression.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Also write the results as the new baseline.",
+    )
+    args = parser.parse_args()
+    suites = args.suite or list(SUITES)
+
+    # The application logs every request, keep the output to the timings
+    logging.disable(logging.INFO)
+
+    results = []
+    if "micro" in suites:
+        from .micro import run_micro_benchmarks
+
+        results += run_micro_benchmarks(args.quick)
+    if "endpoints" in suites:
+        from .endpoints import run_endpoint_benchmarks
+
+        results += run_endpoint_benchmarks(args.quick)
+
+    document = write_results(results, args.output, quick=args.quick, suites=suites)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        write_results(results, args.baseline, quick=args.quick, suites=suites)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("quick") != args.quick:
+        print("Warning: the baseline was run with different sizes (--quick)")
+    regressions = compare_with_baseline(document, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import itertools
+import time
+
+import polars as ps
+from fastapi.testclient import TestClient
+
+from api.app import create_app
+from config.settings import settings
+
+from .fakes import DataServiceServer, FakeMinio, FakeMinioObjectStore, generate_animals
+from .harness import BenchmarkResult, measure
+
+API = "/api/v1/mpc"
+MODEL_DATAPOINTS = 1000
+
+
+def train(client: TestClient, seed: int, number_of_datapoints: int) -> dict:
+    """
+    Train a model through the API and wait for its job to finish.
+    Args:
+        client (TestClient): Client of the application.
+        seed (int): Seed of the training data.
+        number_of_datapoints (int): Number of data points of the training data.
+    Returns:
+        dict: The finished job.
+    Raises:
+        RuntimeError: If the job did not complete.
+    """
+    response = client.post(
+        f"{API}/train",
+        params={"seed": seed, "number_of_datapoints": number_of_datapoints},
+    )
+    job = response.json()["data"]
+    while job["status"] in ("pending", "running"):
+        time.sleep(0.05)
+        job = client.get(f"{API}/jobs/{job['id']}").json()["data"]
+    if job["status"] != "completed":
+        raise RuntimeError(f"Training job {job['id']} {job['status']}: {job['error']}")
+    return job
+
+
+def animals_payload(number_of_animals: int, seed: int = 0) -> list[dict]:
+    """
+    Args:
+        number_of_animals (int): Number of animals.
+        seed (int): Seed of the generator.
+    Returns:
+        list[dict]: Animals in the format of the /predict payload.
+    """
+    return ps.DataFrame(generate_animals(seed, number_of_animals)).to_dicts()
+
+
+def run_endpoint_benchmarks(quick: bool = False) -> list[BenchmarkResult]:
+    """
+    Benchmark the endpoints of the application, run in-process with an in-memory
+    MinIO and a fake data service.
+    Args:
+        quick (bool): Smaller sizes and fewer repetitions.
+    Returns:
+        list[BenchmarkResult]: Results of the benchmarks.
+    """
+    train_sizes = [1000] if quick else [1000, 5000]
+    batch_sizes = [1, 10, 100, 1000]
+    history_sizes = [1_000, 10_000] if quick else [1_000, 10_000, 100_000]
+    validation_datapoints = 5_000 if quick else 50_000
+    repeat = 3 if quick else 10
+
+    results = []
+    minio_client = FakeMinio()
+    with DataServiceServer() as data_service:
+        settings.DATA_SERVICE_URL = data_service.url
+        app = create_app(minio_client, FakeMinioObjectStore(minio_client))
+        with TestClient(app) as client:
+            # A new seed per call, so every training generates its data and
+            # searches its hyperparameters instead of reusing a previous model
+            seeds = itertools.count(1000)
+            for number_of_datapoints in train_sizes:
+                results.append(
+                    measure(
+                        f"train[{number_of_datapoints}]",
+                        lambda n=number_of_datapoints: train(client, next(seeds), n),
+                        repeat=1 if quick else 2,
+                        number_of_datapoints=number_of_datapoints,
+                    )
+                )
+            model = {"seed": 42, "number_of_datapoints": MODEL_DATAPOINTS}
+            model_key = f"{model['seed']}-{model['number_of_datapoints']}"
+            train(client, model["seed"], model["number_of_datapoints"])
+
+            prediction_log = app.state.prediction_log
+            logged_rows = 0
+            for history_rows in history_sizes:
+                history = ps.DataFrame(
+                    generate_animals(history_rows, history_rows - logged_rows)
+                ).with_columns(ps.lit("dog").alias("label"))
+                prediction_log.append_frame(model_key, history)
+                client.portal.call(prediction_log.flush)
+                logged_rows = history_rows
+                results.append(
+                    measure(
+                        f"predictions[{history_rows}]",
+                        lambda: client.get(f"{API}/predictions").raise_for_status(),
+                        repeat=repeat,
+                        history_rows=history_rows,
+                    )
+                )
+
+            for batch_size in batch_sizes:
+                payload = {"model": model, "data": animals_payload(batch_size)}
+                for mode in ("full", "fast"):
+                    results.append(
+                        measure(
+                            f"predict[{batch_size},{mode}]",
+                            lambda mode=mode, payload=payload: client.post(
+                                f"{API}/predict", params={"mode": mode}, json=payload
+                            ).raise_for_status(),
+                            repeat=repeat * 2,
+                            batch_size=batch_size,
+                            mode=mode,
+                        )
+                    )
+
+            payload = {
+                "model": model,
+                "data": {"seed": 7, "number_of_datapoints": validation_datapoints},
+            }
+            results.append(
+                measure(
+                    f"validate[{validation_datapoints}]",
+                    lambda: client.post(
+                        f"{API}/validate", json=payload
+                    ).raise_for_status(),
+                    repeat=repeat,
+                    validation_datapoints=validation_datapoints,
+                )
+            )
+    return results
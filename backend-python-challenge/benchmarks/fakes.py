@@ -0,0 +1,296 @@
+import hashlib
+import io
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult
+from urllib3._collections import HTTPHeaderDict
+
+from storage.object_store import ObjectInfo, ObjectNotFoundError, ObjectStore
+
+
+class FakeObjectResponse:
+    """Body of a FakeMinio.get_object call, with the methods the API uses."""
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    @property
+    def data(self) -> bytes:
+        return self._stream.getvalue()
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._stream.read(amt)
+
+    def stream(self, amt: int = 64 * 1024) -> Iterator[bytes]:
+        while chunk := self._stream.read(amt):
+            yield chunk
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class FakeMinio:
+    """
+    In-memory stand-in for the synchronous MinIO client.
+
+    Implements the calls made by the API, with the same return types, and raises
+    errors whose message contains 'NoSuchKey' for missing objects, like S3Error.
+    It is thread-safe, since the API calls it from its executors.
+    """
+
+    def __init__(self):
+        self._objects: dict[str, dict[str, tuple[bytes, Object]]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        with self._lock:
+            return bucket_name in self._objects
+
+    def make_bucket(self, bucket_name: str) -> None:
+        with self._lock:
+            self._objects.setdefault(bucket_name, {})
+
+    def put_object(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO,
+        length: int,
+        content_type: str = "application/octet-stream",
+        part_size: int = 0,
+        **kwargs,
+    ) -> ObjectWriteResult:
+        # A length of -1 is a multipart upload of a stream of unknown length
+        if length < 0:
+            chunks = []
+            while chunk := data.read(part_size or 16 * 1024 * 1024):
+                chunks.append(chunk)
+            content = b"".join(chunks)
+        else:
+            content = data.read(length)
+        info = Object(
+            bucket_name,
+            object_name,
+            last_modified=datetime.now(timezone.utc),
+            etag=hashlib.md5(content).hexdigest(),
+            size=len(content),
+            content_type=content_type,
+        )
+        with self._lock:
+            self.requests += 1
+            self._objects.setdefault(bucket_name, {})[object_name] = (content, info)
+        return ObjectWriteResult(
+            bucket_name, object_name, None, info.etag, HTTPHeaderDict()
+        )
+
+    def get_object(self, bucket_name: str, object_name: str) -> FakeObjectResponse:
+        content, _ = self._lookup(bucket_name, object_name)
+        return FakeObjectResponse(content)
+
+    def fget_object(self, bucket_name: str, object_name: str, file_path: str) -> Object:
+        content, info = self._lookup(bucket_name, object_name)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        return info
+
+    def stat_object(self, bucket_name: str, object_name: str) -> Object:
+        _, info = self._lookup(bucket_name, object_name)
+        return info
+
+    def remove_object(self, bucket_name: str, object_name: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self._objects.get(bucket_name, {}).pop(object_name, None)
+
+    def list_objects(
+        self, bucket_name: str, prefix: str = "", recursive: bool = False
+    ) -> List[Object]:
+        with self._lock:
+            self.requests += 1
+            entries = sorted(self._objects.get(bucket_name, {}).items())
+        results: dict[str, Object] = {}
+        for name, (_, info) in entries:
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix) :]
+            if not recursive and "/" in rest:
+                # Collapse deeper objects into their common prefix, like S3
+                directory = prefix + rest.split("/", 1)[0] + "/"
+                results.setdefault(directory, Object(bucket_name, directory))
+            else:
+                results[name] = info
+        return list(results.values())
+
+    def _lookup(self, bucket_name: str, object_name: str) -> tuple[bytes, Object]:
+        with self._lock:
+            self.requests += 1
+            try:
+                return self._objects[bucket_name][object_name]
+            except KeyError as e:
+                raise ObjectNotFoundError(bucket_name, object_name) from e
+
+
+class FakeMinioObjectStore(ObjectStore):
+    """
+    ObjectStore over a FakeMinio, so the synchronous client and the async store
+    of the API see the same objects, as they do with a real MinIO server.
+    """
+
+    def __init__(self, client: FakeMinio):
+        self.client = client
+
+    async def get(self, bucket: str, object_name: str) -> bytes:
+        return self.client.get_object(bucket, object_name).read()
+
+    async def put(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> ObjectInfo:
+        self.client.put_object(
+            bucket, object_name, io.BytesIO(data), len(data), content_type
+        )
+        return await self.stat(bucket, object_name)
+
+    async def put_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: int = 16 * 1024 * 1024,
+    ) -> ObjectInfo:
+        self.client.put_object(
+            bucket, object_name, stream, -1, content_type, part_size=part_size
+        )
+        return await self.stat(bucket, object_name)
+
+    async def stat(self, bucket: str, object_name: str) -> ObjectInfo:
+        return self._info(self.client.stat_object(bucket, object_name))
+
+    async def list(
+        self, bucket: str, prefix: str = "", recursive: bool = False
+    ) -> List[ObjectInfo]:
+        return [
+            self._info(obj)
+            for obj in self.client.list_objects(bucket, prefix, recursive)
+        ]
+
+    async def remove(self, bucket: str, object_name: str) -> None:
+        self.client.remove_object(bucket, object_name)
+
+    def stats(self) -> dict:
+        return {"requests": self.client.requests}
+
+    @staticmethod
+    def _info(obj: Object) -> ObjectInfo:
+        return ObjectInfo(
+            name=obj.object_name,
+            size=obj.size or 0,
+            etag=obj.etag,
+            last_modified=obj.last_modified,
+            is_dir=obj.is_dir,
+        )
+
+
+def generate_animals(seed: int, number_of_datapoints: int) -> dict[str, np.ndarray]:
+    """
+    Synthetic animals in the shape returned by the data service: dogs, chickens,
+    kangaroos and elephants with noisy sizes, plus a few outliers.
+    Args:
+        seed (int): Seed of the generator.
+        number_of_datapoints (int): Number of animals.
+    Returns:
+        dict[str, np.ndarray]: One array per column.
+    """
+    rng = np.random.default_rng(seed)
+    species = rng.integers(0, 5, number_of_datapoints)
+    # dog, chicken, kangaroo, elephant, outlier
+    legs = np.array([4, 2, 2, 4, 3])[species]
+    height = np.array([0.6, 0.4, 1.5, 3.0, 1.0])[species]
+    weight = np.array([25.0, 3.0, 60.0, 4000.0, 100.0])[species]
+    return {
+        "walks_on_n_legs": legs,
+        "height": height * rng.lognormal(0, 0.15, number_of_datapoints),
+        "weight": weight * rng.lognormal(0, 0.25, number_of_datapoints),
+        "has_wings": species == 1,
+        "has_tail": species != 1,
+    }
+
+
+def create_data_service(chunk_rows: int = 10_000) -> FastAPI:
+    """
+    Fake data service, streaming a JSON array of animals like the real one.
+    Args:
+        chunk_rows (int): Animals serialized per chunk of the response.
+    Returns:
+        FastAPI: The data service application.
+    """
+    service = FastAPI()
+
+    @service.post("/api/v1/animals/data")
+    async def animals_data(payload: dict):
+        columns = generate_animals(payload["seed"], payload["number_of_datapoints"])
+        names = list(columns)
+        rows = zip(*(columns[name].tolist() for name in names), strict=True)
+
+        def body() -> Iterator[bytes]:
+            yield b"["
+            first = True
+            while chunk := [
+                dict(zip(names, row, strict=True))
+                for _, row in zip(range(chunk_rows), rows, strict=False)
+            ]:
+                text = json.dumps(chunk)[1:-1]
+                yield (text if first else "," + text).encode("utf-8")
+                first = False
+            yield b"]"
+
+        return StreamingResponse(body(), media_type="application/json")
+
+    return service
+
+
+class DataServiceServer:
+    """Runs the fake data service on a free local port, in a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        with socket.socket() as s:
+            s.bind((host, 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://{host}:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                create_data_service(), host=host, port=self.port, log_level="warning"
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "DataServiceServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake data service did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
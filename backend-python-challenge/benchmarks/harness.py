@@ -0,0 +1,123 @@
+import json
+import os
+import platform
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+
+@dataclass
+class BenchmarkResult:
+    """Timings of one benchmark, in seconds."""
+
+    name: str
+    repeat: int
+    min: float
+    median: float
+    mean: float
+    max: float
+    params: dict = field(default_factory=dict)
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    repeat: int = 5,
+    warmup: int = 1,
+    setup: Optional[Callable[[], object]] = None,
+    **params,
+) -> BenchmarkResult:
+    """
+    Time a function.
+    Args:
+        name (str): Name of the benchmark, the key of its result.
+        func (Callable): Function to time, called without arguments.
+        repeat (int): Timed calls.
+        warmup (int): Untimed calls before them, to fill the caches.
+        setup (Optional[Callable]): Called, untimed, before every call.
+        **params: Parameters of the benchmark, stored with its result.
+    Returns:
+        BenchmarkResult: Statistics of the timed calls.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    result = BenchmarkResult(
+        name=name,
+        repeat=repeat,
+        min=min(timings),
+        median=statistics.median(timings),
+        mean=statistics.fmean(timings),
+        max=max(timings),
+        params=params,
+    )
+    print(f"{name:<45} median {result.median * 1000:10.2f} ms  (n={repeat})")
+    return result
+
+
+def write_results(results: list[BenchmarkResult], path: str, **metadata) -> dict:
+    """
+    Write the results of a run as JSON.
+    Args:
+        results (list[BenchmarkResult]): Results of the benchmarks.
+        path (str): Output file.
+        **metadata: Extra fields of the run, such as the suite options.
+    Returns:
+        dict: The written document.
+    """
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **metadata,
+        "results": {result.name: asdict(result) for result in results},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    return document
+
+
+def compare_with_baseline(
+    current: dict, baseline: dict, threshold: float = 0.2
+) -> list[str]:
+    """
+    Compare the median timings of a run with those of a baseline run.
+    Args:
+        current (dict): Document written by write_results.
+        baseline (dict): Document of the baseline run.
+        threshold (float): Relative slowdown reported as a regression.
+    Returns:
+        list[str]: Names of the benchmarks slower than the baseline by more than
+        threshold. Benchmarks missing from either run are not compared.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<45} {'-':>12} {result['median'] * 1000:10.2f}ms      new")
+            continue
+        change = result["median"] / reference["median"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<45} {reference['median'] * 1000:10.2f}ms "
+            f"{result['median'] * 1000:10.2f}ms {change:+8.1%}{flag}"
+        )
+    return regressions
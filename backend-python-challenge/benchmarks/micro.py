@@ -0,0 +1,51 @@
+import polars as ps
+
+from api.controllers.animals_controller import save_dataset_as_datafile
+from clustering.cluster_data import label_dataframe, label_dataset_no_clustering
+from machine_learning.machine_learning_functions import prepare_data_for_prediction
+
+from .fakes import generate_animals
+from .harness import BenchmarkResult, measure
+
+
+def run_micro_benchmarks(quick: bool = False) -> list[BenchmarkResult]:
+    """
+    Benchmark the hot functions of the data path, without the application.
+    Args:
+        quick (bool): Smaller sizes and fewer repetitions.
+    Returns:
+        list[BenchmarkResult]: Results of the benchmarks.
+    """
+    sizes = [10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]
+    repeat = 3 if quick else 10
+
+    results = []
+    for rows in sizes:
+        animals = ps.DataFrame(generate_animals(0, rows))
+        records = animals.to_dicts()
+        labeled = label_dataframe(animals)
+        results.append(
+            measure(
+                f"label_dataset_no_clustering[{rows}]",
+                lambda records=records: label_dataset_no_clustering(records),
+                repeat=repeat,
+                rows=rows,
+            )
+        )
+        results.append(
+            measure(
+                f"prepare_data_for_prediction[{rows}]",
+                lambda animals=animals: prepare_data_for_prediction(animals),
+                repeat=repeat,
+                rows=rows,
+            )
+        )
+        results.append(
+            measure(
+                f"save_dataset_as_datafile[{rows}]",
+                lambda labeled=labeled: save_dataset_as_datafile(labeled),
+                repeat=repeat,
+                rows=rows,
+            )
+        )
+    return results
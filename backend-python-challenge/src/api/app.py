@@ -1,21 +1,121 @@
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Request, Response
 from contextlib import asynccontextmanager
 from config.logger_config import setup_logging
+import functools
 import logging
-from config.minio_config import MINIOCONFIG, setup_minio_buckets
+import time
+from config.minio_config import BUCKET_PREDICTIONS, MINIOCONFIG, setup_minio_buckets
+from api.executors import shutdown_executors
+from api.prediction_log import PredictionLogWriter
 from api.routes.animals_routes import router as animals_routes
 from api.routes.machine_learning_routes import router as machine_learning_routes
+from api.routes.system_routes import metrics_router
+from api.routes.system_routes import router as system_routes
+from api.training_jobs import TrainingJobManager
+from config.settings import settings
+from minio import Minio
+from observability.metrics import HTTP_REQUEST_SECONDS
+from observability.tracing import TRACER, start_span
+from storage.minio_store import MinioObjectStore
+from storage.object_store import ObjectStore
 
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def create_app(
+    minio_client: Optional[Minio] = None, object_store: Optional[ObjectStore] = None
+) -> FastAPI:
+    """
+    Build the application.
+    Args:
+        minio_client (Optional[Minio]): MinIO client, defaults to the configured one.
+        object_store (Optional[ObjectStore]): Async object store, defaults to a
+            MinioObjectStore on the configured endpoint. Both are replaced by
+            in-memory stand-ins in the benchmarks.
+    Returns:
+        FastAPI: The application, with its routes.
+    """
+    app = FastAPI(
+        lifespan=functools.partial(
+            lifespan, minio_client=minio_client, object_store=object_store
+        )
+    )
+    app.include_router(animals_routes)
+    app.include_router(machine_learning_routes)
+    app.include_router(system_routes)
+    app.include_router(metrics_router)
+    app.middleware("http")(time_requests)
+    if TRACER.sample_rate > 0:
+        app.middleware("http")(trace_requests)
+    return app
+
+
+async def time_requests(request: Request, call_next) -> Response:
+    """Record the duration of every request, by route template and status code."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The template, not the path, so job ids do not create new series
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
+
+
+# Scrapes and stats polling, not worth a trace
+UNTRACED_PATH_PREFIXES = ("/metrics", "/api/v1/system/")
+
+
+async def trace_requests(request: Request, call_next) -> Response:
+    """
+    Start the trace of a sampled request; the spans of the work it triggers,
+    including its background training job, belong to this trace. The id of the
+    trace is returned in the X-Trace-Id header.
+    """
+    if request.url.path.startswith(UNTRACED_PATH_PREFIXES):
+        return await call_next(request)
+    span = start_span(
+        f"{request.method} {request.url.path}",
+        root=True,
+        method=request.method,
+        path=request.url.path,
+    )
+    if span is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    except BaseException as e:
+        span.end(e)
+        raise
+    route = request.scope.get("route")
+    if route is not None:
+        span.name = f"{request.method} {route.path}"
+    span.set_attribute("status", response.status_code)
+    span.end()
+    if span.context.sampled:
+        response.headers["X-Trace-Id"] = span.context.trace_id
+    return response
+
+
 @asynccontextmanager
-async def lifespan(app: FastAPI):
+async def lifespan(
+    app: FastAPI,
+    minio_client: Optional[Minio] = None,
+    object_store: Optional[ObjectStore] = None,
+):
     """Application lifecycle management with Minio"""
     logger.info("Connecting to Minio...")
-    minio_client = MINIOCONFIG
+    minio_client = minio_client or MINIOCONFIG
     app.state.minio_client = minio_client
     logger.info("Minio connection established")
 
@@ -25,14 +125,47 @@ async def lifespan(app: FastAPI):
         logger.error(f"Minio setup failed: {str(e)}")
         raise e
 
+    app.state.object_store = object_store or MinioObjectStore(
+        endpoint=settings.MINIO_ENDPOINT,
+        access_key=settings.MINIO_ROOT_USER,
+        secret_key=settings.MINIO_ROOT_PASSWORD,
+        secure=False,
+        max_concurrency=settings.STORAGE_MAX_CONCURRENCY,
+        retries=settings.STORAGE_RETRIES,
+        backoff_seconds=settings.STORAGE_RETRY_BACKOFF_SECONDS,
+        timeout_seconds=settings.STORAGE_TIMEOUT_SECONDS,
+    )
+
+    app.state.training_jobs = TrainingJobManager(
+        minio_client,
+        app.state.object_store,
+        max_concurrent_jobs=settings.TRAINING_MAX_CONCURRENT_JOBS,
+    )
+
+    app.state.prediction_log = PredictionLogWriter(
+        app.state.object_store,
+        BUCKET_PREDICTIONS,
+        flush_rows=settings.PREDICTION_LOG_FLUSH_ROWS,
+        flush_seconds=settings.PREDICTION_LOG_FLUSH_SECONDS,
+        max_buffered_rows=settings.PREDICTION_LOG_MAX_BUFFERED_ROWS,
+        compaction_seconds=settings.PREDICTION_LOG_COMPACTION_SECONDS,
+        compaction_min_files=settings.PREDICTION_LOG_COMPACTION_MIN_FILES,
+    )
+    app.state.prediction_log.start()
+
     yield  # Wait until the application stops
 
+    logger.info("Flushing prediction log...")
+    await app.state.prediction_log.stop()
+
+    logger.info("Stopping training jobs...")
+    await app.state.training_jobs.shutdown()
+    shutdown_executors()
+
     logger.info("Closing Minio connection...")
+    await app.state.object_store.close()
     del minio_client
     logger.info("Minio connection closed")
 
 
-app = FastAPI(lifespan=lifespan)
-
-app.include_router(animals_routes)
-app.include_router(machine_learning_routes)
+app = create_app()
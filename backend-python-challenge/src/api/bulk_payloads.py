@@ -0,0 +1,141 @@
+import io
+import json
+from typing import Optional
+
+import numpy as np
+import polars as ps
+import pyarrow as pa
+
+from api.dataset_formats import DATASET_SCHEMA, ParquetDatasetFormat
+
+# Bulk prediction payloads are decoded straight into a DataFrame with this schema,
+# without building one Pydantic object per row
+FEATURE_SCHEMA = {
+    column: dtype for column, dtype in DATASET_SCHEMA.items() if column != "label"
+}
+FEATURE_COLUMNS = list(FEATURE_SCHEMA)
+
+JSON_CONTENT_TYPE = "application/json"
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_CONTENT_TYPE = ParquetDatasetFormat.content_type
+
+ARROW_FILE_MAGIC = b"ARROW1"
+# Arrow IPC streams start with the continuation marker of their first message
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+def detect_bulk_payload_format(body: bytes, content_type: Optional[str]) -> str:
+    """
+    Get the format of a bulk prediction body from its content type, or from its
+    first bytes when the content type is missing or generic.
+    Args:
+        body (bytes): Request body.
+        content_type (Optional[str]): Content-Type header of the request.
+    Returns:
+        str: One of 'json', 'arrow_stream', 'arrow_file' or 'parquet'.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == JSON_CONTENT_TYPE:
+        return "json"
+    if media_type == ARROW_STREAM_CONTENT_TYPE:
+        return "arrow_stream"
+    if media_type == ARROW_FILE_CONTENT_TYPE:
+        return "arrow_file"
+    if media_type == PARQUET_CONTENT_TYPE:
+        return "parquet"
+
+    if body[:4] == ParquetDatasetFormat.magic:
+        return "parquet"
+    if body[:6] == ARROW_FILE_MAGIC:
+        return "arrow_file"
+    if body[:4] == ARROW_STREAM_MAGIC:
+        return "arrow_stream"
+    return "json"
+
+
+def _read_columnar_json(body: bytes) -> ps.DataFrame:
+    payload = json.loads(body)
+    if not isinstance(payload, dict):
+        raise TypeError("Columnar JSON must be an object with one array per feature")
+    missing = [column for column in FEATURE_COLUMNS if column not in payload]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    return ps.DataFrame(
+        {column: payload[column] for column in FEATURE_COLUMNS}, schema=FEATURE_SCHEMA
+    )
+
+
+def _read_arrow(body: bytes, payload_format: str) -> ps.DataFrame:
+    source = pa.BufferReader(body)
+    if payload_format == "arrow_file":
+        table = pa.ipc.open_file(source).read_all()
+    else:
+        table = pa.ipc.open_stream(source).read_all()
+    return ps.from_arrow(table)
+
+
+def decode_bulk_features(body: bytes, content_type: Optional[str]) -> ps.DataFrame:
+    """
+    Decode a bulk prediction body into a features DataFrame.
+    Supported bodies are columnar JSON ({"height": [...], "weight": [...], ...}),
+    Arrow IPC (stream or file) and Parquet. Columns other than the features, such
+    as a label, are ignored.
+    Args:
+        body (bytes): Request body.
+        content_type (Optional[str]): Content-Type header of the request.
+    Returns:
+        ps.DataFrame: Features, cast to FEATURE_SCHEMA, with at least one row.
+    Raises:
+        ValueError: If the body cannot be decoded, lacks feature columns, has
+            no rows or has null or NaN features.
+        TypeError: If a JSON body is not an object.
+    """
+    payload_format = detect_bulk_payload_format(body, content_type)
+    try:
+        if payload_format == "json":
+            df = _read_columnar_json(body)
+        else:
+            if payload_format == "parquet":
+                df = ps.read_parquet(io.BytesIO(body))
+            else:
+                df = _read_arrow(body, payload_format)
+            missing = [column for column in FEATURE_COLUMNS if column not in df.columns]
+            if missing:
+                raise ValueError(f"Missing feature columns: {missing}")
+            df = df.select(FEATURE_COLUMNS).cast(FEATURE_SCHEMA)
+    except (ValueError, TypeError):
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid {payload_format} payload: {str(e)}") from e
+    if df.height == 0:
+        raise ValueError("The payload has no rows")
+    _check_missing_values(df)
+    return df
+
+
+def _check_missing_values(df: ps.DataFrame) -> None:
+    # The models cannot predict missing values, and NaN compares false against
+    # every threshold of the compiled trees
+    counts = df.null_count().row(0, named=True)
+    for column, dtype in FEATURE_SCHEMA.items():
+        if dtype.is_float():
+            counts[column] += df[column].is_nan().sum()
+    missing = {column: count for column, count in counts.items() if count}
+    if missing:
+        raise ValueError(f"Null or NaN feature values: {missing}")
+
+
+def encode_labels_as_arrow(labels: np.ndarray) -> bytes:
+    """
+    Encode predicted labels as an Arrow IPC stream with a single 'label' column.
+    Args:
+        labels (np.ndarray): Predicted labels.
+    Returns:
+        bytes: The encoded stream.
+    """
+    table = pa.table({"label": pa.array(labels, type=pa.string())})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
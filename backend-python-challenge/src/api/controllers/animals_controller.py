@@ -1,6 +1,22 @@
+import asyncio
+import contextlib
 import os
+from api.bulk_payloads import FEATURE_SCHEMA
+from api.dataset_formats import (
+    DATASET_COLUMNS,
+    DATASET_SCHEMA,
+    encode_dataset,
+    get_dataset_format,
+)
+from api.executors import run_dedicated, run_io
 from api.models.generic_response import GenericResponse
-from clustering.cluster_data import label_dataset_no_clustering
+from api.object_cache import OBJECT_CACHE
+from api.streaming import (
+    UploadPipe,
+    iter_json_array_batches,
+    upload_pipe_to_minio,
+)
+from clustering.cluster_data import label_dataframe
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
@@ -11,44 +27,47 @@ import logging
 import io
 import polars as ps
 from config.settings import settings
+from observability.tracing import span
 
 
 logger = logging.getLogger(__name__)
 
 
-def save_dataset_as_datafile(data: list[dict]) -> io.BytesIO:
+def save_dataset_as_datafile(
+    data: ps.DataFrame | list[dict],
+) -> tuple[ps.DataFrame, io.BytesIO]:
     """
-    Converts the dataset to a CSV format and saves it in memory.
+    Converts the dataset to the configured storage format and saves it in memory.
     Args:
-        data (list[dict]): List of dictionaries containing animal data.
+        data (DataFrame | list[dict]): Labeled animal data.
     returns:
-        io.BytesIO: In-memory CSV file.
+        DataFrame: Typed DataFrame with the dataset columns.
+        io.BytesIO: In-memory encoded file.
 
     """
-    df = ps.DataFrame(data)
+    df = data if isinstance(data, ps.DataFrame) else ps.DataFrame(data)
+    df = df.select(DATASET_COLUMNS).cast(DATASET_SCHEMA)
 
-    columns = ["height", "weight", "walks_on_n_legs", "has_wings", "has_tail", "label"]
-
-    df = df[columns]
-
-    buffer = io.StringIO()
-    df.write_csv(buffer)
-
-    byte_data = io.BytesIO(buffer.getvalue().encode("utf-8"))
+    byte_data = encode_dataset(df)
     return df, byte_data
 
 
+@span("process_and_store_data")
 async def process_and_store_data(
     minio_client: Minio, seed: int, number_of_datapoints: int
-) -> ps.DataFrame:
+) -> tuple[int, ps.DataFrame]:
     """
     Fetches animal data from the API, labels it, and stores it in Minio.
+    The response is streamed: it is parsed, labeled and encoded in chunks of
+    INGEST_CHUNK_ROWS rows while a multipart upload sends it to Minio, so memory
+    usage does not depend on the number of datapoints.
     Args:
         minio_client (Minio): Minio client instance for object storage.
         seed (int): Seed for random number generation.
         number_of_datapoints (int): Number of data points to generate.
     Returns:
-            DataFrame: DataFrame containing the labeled animal data.
+            int: Number of data points stored.
+            DataFrame: First ten rows of the labeled animal data.
     Raises:
         Exception: If there is an error fetching data from the API or storing it in Minio.
     """
@@ -56,47 +75,78 @@ async def process_and_store_data(
     headers = {"accept": "application/json", "Content-Type": "application/json"}
     payload = {"seed": seed, "number_of_datapoints": number_of_datapoints}
 
-    print(settings.DATA_SERVICE_URL)
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{settings.DATA_SERVICE_URL}/api/v1/animals/data",
-            headers=headers,
-            json=payload,
+    file_name = f"{seed}-{number_of_datapoints}/animal_data.data"
+    dataset_format = get_dataset_format()
+    pipe = UploadPipe(max_blocks=settings.INGEST_MAX_BUFFERED_BLOCKS)
+    # The upload waits for the writes below, which run on the I/O pool: it gets a
+    # thread of its own so concurrent ingestions cannot starve their writers
+    upload = asyncio.ensure_future(
+        run_dedicated(
+            upload_pipe_to_minio,
+            minio_client,
+            BUCKET_DATA,
+            file_name,
+            pipe,
+            content_type=dataset_format.content_type,
+            part_size=settings.INGEST_PART_SIZE,
         )
+    )
+
+    rows = 0
+    preview = None
+    try:
+        writer = dataset_format.open_writer(pipe)
+        logger.info(f"Requesting data from {settings.DATA_SERVICE_URL}")
+        async with httpx.AsyncClient() as client, span("data_service_stream") as active:
+            async with client.stream(
+                "POST",
+                f"{settings.DATA_SERVICE_URL}/api/v1/animals/data",
+                headers=headers,
+                json=payload,
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    message = (
+                        "Error fetching data from API: "
+                        f"{response.status_code} - {response.text}"
+                    )
+                    logger.error(message)
+                    raise Exception(message)
+
+                logger.info("Receiving data from the API.")
+                async for batch in iter_json_array_batches(
+                    response.aiter_bytes(), settings.INGEST_CHUNK_ROWS
+                ):
+                    # Labeling the chunk, typed by the schema rather than guessed
+                    # from its first rows
+                    chunk = ps.DataFrame(batch, schema=FEATURE_SCHEMA)
+                    chunk = label_dataframe(chunk).select(DATASET_COLUMNS)
+                    # Encoding blocks while the upload is behind, keep it off the loop
+                    await run_io(writer.write, chunk)
+
+                    rows += chunk.height
+                    if preview is None:
+                        preview = chunk.head(10)
+                if active is not None:
+                    active.set_attribute("rows", rows)
+
+        await run_io(writer.close)
+        await run_io(pipe.close)
+        await upload
+    except Exception as e:
+        logger.error(f"Error storing data in Minio: {str(e)}")
+        await run_io(pipe.abort, e)
+        with contextlib.suppress(Exception):
+            await upload
+        raise e
+
+    # A previous version of the dataset may be cached locally
+    OBJECT_CACHE.invalidate(BUCKET_DATA, file_name)
 
-        if response.status_code == 200:
-            logger.info("Data received successfully from the API.")
-
-            # Labeling the dataset
-            data = label_dataset_no_clustering(response.json())
-            df, file_data = save_dataset_as_datafile(data)
-
-            # Working progress
-            # dataframe = ps.DataFrame(response.json())
-            # cluster_and_label_data(dataframe)
-
-            # Get date and time
-            file_name = f"{seed}-{number_of_datapoints}/animal_data.data"
-            try:
-                minio_client.put_object(
-                    BUCKET_DATA,
-                    file_name,
-                    file_data,
-                    length=file_data.getbuffer().nbytes,
-                    content_type="text/plain",
-                )
-
-            except Exception as e:
-                logger.error(f"Error storing data in Minio: {str(e)}")
-                raise e
-        else:
-            logger.error(
-                f"Error fetching data from API: {response.status_code} - {response.text}"
-            )
-            raise Exception(
-                f"Error fetching data from API: {response.status_code} - {response.text}"
-            )
-    return df
+    if preview is None:
+        preview = ps.DataFrame(schema=DATASET_SCHEMA)
+    logger.info(f"Stored {rows} data points in {file_name}")
+    return rows, preview
 
 
 async def fetch_and_store_animal_data(
@@ -119,11 +169,11 @@ async def fetch_and_store_animal_data(
     )
 
     try:
-        df: ps.DataFrame = await process_and_store_data(
+        rows, preview = await process_and_store_data(
             minio_client, seed, number_of_datapoints
         )
-        response.data["data_first_ten"] = df.head(10).to_dicts()
-        logger.info(f"Generated {len(df)} data points for seed {seed}")
+        response.data["data_first_ten"] = preview.to_dicts()
+        logger.info(f"Generated {rows} data points for seed {seed}")
     except Exception as e:
         response.code = 500
         response.message = f"Error processing data: {str(e)}"
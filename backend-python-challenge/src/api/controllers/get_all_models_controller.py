@@ -1,37 +1,94 @@
+from typing import Optional
+from api.model_cache import MODEL_CACHE
+from api.model_registry import MODEL_REGISTRY, filter_models, sort_models
 from api.models.generic_response import GenericResponse
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from minio import Minio
-from config.minio_config import BUCKET_MODELS
+from storage.object_store import ObjectStore
 
 
-async def get_all_models(request: Request) -> JSONResponse:
+async def get_all_models(
+    request: Request,
+    name: Optional[str] = None,
+    training_mode: Optional[str] = None,
+    min_accuracy: Optional[float] = None,
+    sort: str = "name",
+    limit: int = 100,
+    offset: int = 0,
+) -> JSONResponse:
     """
-    Get all models from the database.
+    Get the trained models from the model registry.
     Args:
         request (Request): The FastAPI request object.
+        name (Optional[str]): Substring the model name must contain.
+        training_mode (Optional[str]): Only models trained in this mode.
+        min_accuracy (Optional[float]): Only models with at least this accuracy.
+        sort (str): Field to sort by, prefixed with '-' for descending order.
+        limit (int): Maximum number of models to return.
+        offset (int): Number of models to skip.
     Returns:
+        JSONResponse: Response containing the page of models and the total count.
     """
     response: GenericResponse = GenericResponse(
         code=500, message="Something went wrong", data=None
     )
 
-    minio_client: Minio = request.app.state.minio_client
+    object_store: ObjectStore = request.app.state.object_store
 
-    # Get the list of models from MinIO
     try:
-        models = minio_client.list_objects(
-            bucket_name=BUCKET_MODELS,
-            prefix="",
-            recursive=False,
+        models = await MODEL_REGISTRY.list(object_store)
+        models = sort_models(
+            filter_models(models, name, training_mode, min_accuracy), sort
         )
-        # delete last character '/' from the path
-        models_formatted = [model.object_name[:-1] for model in models]
-        response.data = models_formatted
-        response.code = 200
-        response.message = "Models fetched successfully."
+    except ValueError as e:
+        response.code = 400
+        response.message = str(e)
         return JSONResponse(status_code=response.code, content=response.model_dump())
     except Exception as e:
         response.code = 500
         response.message = f"Error fetching models from MinIO: {str(e)}"
         return JSONResponse(status_code=response.code, content=response.model_dump())
+
+    response.data = {
+        "items": [
+            model.model_dump(mode="json") for model in models[offset : offset + limit]
+        ],
+        "total": len(models),
+        "limit": limit,
+        "offset": offset,
+    }
+    response.code = 200
+    response.message = "Models fetched successfully."
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_model_cache_stats(request: Request) -> JSONResponse:
+    """
+    Get the counters of the in-memory model cache.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing hits, misses, evictions and occupancy.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Model cache stats fetched successfully.",
+        data=MODEL_CACHE.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_model_registry_stats(request: Request) -> JSONResponse:
+    """
+    Get the counters of the model registry.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing the number of models, reads and writes.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Model registry stats fetched successfully.",
+        data=MODEL_REGISTRY.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
@@ -1,24 +1,293 @@
+import asyncio
+import logging
 from datetime import date, datetime
 from io import StringIO
 from typing import Optional
 from api.models.animal_data import AnimalData, Prediction
+from api.executors import run_compute, run_io
 from api.models.generic_response import GenericResponse
+from api.object_cache import OBJECT_CACHE
+from api.prediction_history import (
+    LEGACY_PREFIX_FORMAT,
+    list_prediction_objects,
+    parse_prediction_time,
+)
+from api.prediction_log import (
+    LogFileEntry,
+    decode_manifest,
+    is_manifest,
+    is_prediction_log,
+    load_prediction_log,
+    log_file_writer,
+    manifest_name,
+    select_page_files,
+)
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
 from minio import Minio
 from config.minio_config import BUCKET_PREDICTIONS
+from storage.object_store import ObjectStore
 import polars as ps
 
+logger = logging.getLogger(__name__)
+
+
+def load_prediction(
+    minio_client: Minio, object_name: str, obj_date_str: str
+) -> Optional[Prediction]:
+    """
+    Read a stored prediction file.
+    Args:
+        minio_client: The MinIO client.
+        object_name: Name of the prediction object.
+        obj_date_str: Date of the prediction as stored in the object name.
+    Returns:
+        The prediction, or None if the file is empty.
+    """
+    # Prediction files are never overwritten, cached copies are not revalidated
+    content = (
+        OBJECT_CACHE.read(minio_client, BUCKET_PREDICTIONS, object_name, immutable=True)
+        .decode("utf-8")
+        .strip()
+    )
+
+    if not content:
+        return None
+
+    df = ps.read_csv(StringIO(content))
+
+    animal_list = [
+        AnimalData(
+            walks_on_n_legs=row["walks_on_n_legs"],
+            height=row["height"],
+            weight=row["weight"],
+            has_wings=row["has_wings"],
+            has_tail=row["has_tail"],
+            label=row.get("label"),
+        )
+        for row in df.to_dicts()
+    ]
+
+    return Prediction(date=obj_date_str, animal_data=animal_list)
+
+
+def predictions_from_log(log: ps.DataFrame) -> dict[str, Prediction]:
+    """
+    Group the rows of the prediction log by request.
+    Args:
+        log: Rows of the prediction log.
+    Returns:
+        The predictions, by request id.
+    """
+    predictions = {}
+    for group in log.sort("timestamp").partition_by("request_id", maintain_order=True):
+        first = group.row(0, named=True)
+        predictions[first["request_id"]] = Prediction(
+            date=first["timestamp"].strftime(LEGACY_PREFIX_FORMAT),
+            model=first["model"],
+            animal_data=[
+                AnimalData(**row)
+                for row in group.select(
+                    "walks_on_n_legs",
+                    "height",
+                    "weight",
+                    "has_wings",
+                    "has_tail",
+                    "label",
+                ).to_dicts()
+            ],
+        )
+    return predictions
+
+
+def page_of_log(
+    log: Optional[ps.DataFrame],
+    files: list[tuple[datetime, str]],
+    offset: int,
+    limit: int,
+) -> tuple[list[tuple[datetime, str, str]], dict[str, Prediction]]:
+    """
+    Order the requests of the loaded files and keep a page of them.
+    Args:
+        log: Rows of the loaded prediction log files.
+        files: Time and name of the loaded per-prediction files.
+        offset: Number of loaded requests before the page.
+        limit: Number of requests of the page.
+    Returns:
+        The page, as (time, kind, key) tuples, and the logged predictions of the
+        page, by request id.
+    """
+    index = ps.DataFrame(
+        files, schema={"time": ps.Datetime("us"), "key": ps.String}, orient="row"
+    ).with_columns(ps.lit("file").alias("kind"))
+    if log is not None:
+        requests = log.group_by("request_id").agg(ps.col("timestamp").min())
+        index = ps.concat(
+            [
+                index,
+                requests.select(
+                    ps.col("timestamp").alias("time"),
+                    ps.col("request_id").alias("key"),
+                    ps.lit("log").alias("kind"),
+                ),
+            ],
+            how="vertical_relaxed",
+        )
+    page = (
+        index.sort("time", "kind", "key")
+        .slice(offset, limit)
+        .select("time", "kind", "key")
+        .rows()
+    )
+    page_request_ids = [key for _, kind, key in page if kind == "log"]
+    logged_predictions = (
+        predictions_from_log(log.filter(ps.col("request_id").is_in(page_request_ids)))
+        if page_request_ids
+        else {}
+    )
+    return page, logged_predictions
+
+
+async def read_predictions_page(
+    minio_client: Minio,
+    object_store: ObjectStore,
+    start: Optional[date],
+    end: Optional[date],
+    limit: int,
+    offset: int,
+) -> tuple[list[Prediction], int]:
+    """
+    Read a page of the predictions of a period.
+    Args:
+        minio_client: The MinIO client.
+        object_store: Store of the predictions.
+        start: The start date of the time period.
+        end: The end date of the time period.
+        limit: Maximum number of predictions to return.
+        offset: Number of predictions to skip, in chronological order.
+    Returns:
+        The predictions of the page, and the number of predictions of the period.
+    """
+    object_names = await list_prediction_objects(object_store, start, end)
+
+    manifest_names = [name for name in object_names if is_manifest(name)]
+    manifests = await object_store.fetch_many(BUCKET_PREDICTIONS, manifest_names)
+    manifest_names = set(manifest_names)
+    entries: list[LogFileEntry] = []
+    for manifest in manifests:
+        entries.extend(decode_manifest(manifest))
+
+    # Log files written before the manifests are read to count their requests
+    unlisted_names = [
+        name
+        for name in object_names
+        if is_prediction_log(name)
+        and manifest_name(name.split("/", 1)[0], log_file_writer(name))
+        not in manifest_names
+    ]
+    frames = dict(
+        zip(
+            unlisted_names,
+            await asyncio.gather(
+                *[
+                    run_io(load_prediction_log, minio_client, BUCKET_PREDICTIONS, name)
+                    for name in unlisted_names
+                ]
+            ),
+            strict=True,
+        )
+    )
+    entries.extend(
+        LogFileEntry.from_frame(name, frame)
+        for name, frame in frames.items()
+        if not frame.is_empty()
+    )
+    # A per-prediction file of the older versions holds a single request
+    for name in object_names:
+        if is_prediction_log(name) or is_manifest(name):
+            continue
+        prediction_time = parse_prediction_time(name)
+        if prediction_time is not None:
+            entries.append(
+                LogFileEntry(name, 1, 1, start=prediction_time, end=prediction_time)
+            )
+
+    # Only the files that may hold requests of the page are read
+    selected, skipped_before = select_page_files(entries, offset, limit)
+    selected_logs = [entry.name for entry in selected if is_prediction_log(entry.name)]
+    missing = [name for name in selected_logs if name not in frames]
+    frames.update(
+        zip(
+            missing,
+            await asyncio.gather(
+                *[
+                    run_io(load_prediction_log, minio_client, BUCKET_PREDICTIONS, name)
+                    for name in missing
+                ]
+            ),
+            strict=True,
+        )
+    )
+    log = (
+        ps.concat([frames[name] for name in selected_logs], how="vertical_relaxed")
+        if selected_logs
+        else None
+    )
+    page, logged_predictions = await run_compute(
+        page_of_log,
+        log,
+        [
+            (entry.start, entry.name)
+            for entry in selected
+            if not is_prediction_log(entry.name)
+        ],
+        offset - skipped_before,
+        limit,
+    )
+
+    file_predictions = await asyncio.gather(
+        *[
+            run_io(
+                load_prediction,
+                minio_client,
+                key,
+                prediction_time.strftime(LEGACY_PREFIX_FORMAT),
+            )
+            for prediction_time, kind, key in page
+            if kind == "file"
+        ]
+    )
+    predictions = []
+    file_results = iter(file_predictions)
+    for _, kind, key in page:
+        if kind == "log":
+            predictions.append(logged_predictions[key])
+            continue
+        result = next(file_results)
+        if result is not None:
+            predictions.append(result)
+    return predictions, sum(entry.requests for entry in entries)
+
 
 async def get_predictions_by_time_period(
-    request: Request, start: Optional[date], end: Optional[date]
+    request: Request,
+    start: Optional[date],
+    end: Optional[date],
+    limit: int = 100,
+    offset: int = 0,
 ) -> JSONResponse:
     """
     Get predictions by time period.
+    Only the day partitions of the period are listed. The manifests of the
+    prediction log give the number of requests and the time range of every log
+    file, so only the files of the requested page are read. Errors reading a
+    file are returned, never skipped, so the total stays exact.
     Args:
         request: The request object.
         start: The start date of the time period.
         end: The end date of the time period.
+        limit: Maximum number of predictions to return.
+        offset: Number of predictions to skip, in chronological order.
     Returns:
         A JSON response with the predictions for the specified time period.
     """
@@ -31,54 +300,21 @@ async def get_predictions_by_time_period(
         # Get the database connection from the request state
         minio_client: Minio = request.app.state.minio_client
 
-        objects = minio_client.list_objects(
-            bucket_name=BUCKET_PREDICTIONS,
-            prefix="",
-            recursive=True,
-        )
-
-        # Filter the predictions based on the time period
-        predictions_filtered = []
-
-        for obj in objects:
-            try:
-                obj_date_str = obj.object_name.split("/")[0]
-                obj_date = datetime.strptime(obj_date_str, "%Y-%m-%d_%H-%M-%S").date()
-            except Exception:
-                continue  # Fecha inválida en el nombre
-
-            if start and obj_date < start:
-                continue
-            if end and obj_date > end:
-                continue
-
-            # Leer el archivo prediction.data
-
-            try:
-                obj_data = minio_client.get_object(BUCKET_PREDICTIONS, obj.object_name)
-                content = obj_data.read().decode("utf-8").strip()
-
-                if not content:
-                    continue
-
-                df = ps.read_csv(StringIO(content))
-
-                animal_list = [
-                    AnimalData(
-                        walks_on_n_legs=row["walks_on_n_legs"],
-                        height=row["height"],
-                        weight=row["weight"],
-                        has_wings=row["has_wings"],
-                        has_tail=row["has_tail"],
-                        label=row.get("label"),
-                    )
-                    for row in df.to_dicts()
-                ]
+        object_store: ObjectStore = request.app.state.object_store
 
-                prediction = Prediction(date=obj_date_str, animal_data=animal_list)
-                predictions_filtered.append(prediction)
-            except Exception as e:
-                continue
+        try:
+            predictions_filtered, total = await read_predictions_page(
+                minio_client, object_store, start, end, limit, offset
+            )
+        except Exception as e:
+            if "NoSuchKey" not in str(e):
+                raise e
+            # A compaction replaced files listed by a manifest we read: read the
+            # new manifest
+            logger.info(f"Prediction log compacted while reading, retrying: {e}")
+            predictions_filtered, total = await read_predictions_page(
+                minio_client, object_store, start, end, limit, offset
+            )
 
         # If no predictions are found, return a 204 response
         if not predictions_filtered:
@@ -86,7 +322,12 @@ async def get_predictions_by_time_period(
         # Return the predictions as a JSON response
         response.code = 200
         response.message = "Predictions retrieved successfully."
-        response.data = predictions_filtered
+        response.data = {
+            "items": predictions_filtered,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+        }
         return JSONResponse(status_code=response.code, content=response.dict())
 
     except Exception as e:
@@ -0,0 +1,75 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from api.models.generic_response import GenericResponse
+from api.training_jobs import TrainingJobManager
+
+
+async def get_job_controller(request: Request, job_id: str) -> JSONResponse:
+    """
+    Get the status and progress of a training job.
+    Args:
+        request (Request): The FastAPI request object.
+        job_id (str): Id of the job.
+    Returns:
+        JSONResponse: Response containing the job.
+    """
+    job_manager: TrainingJobManager = request.app.state.training_jobs
+    job = job_manager.get(job_id)
+
+    if job is None:
+        response = GenericResponse(code=404, message=f"Job {job_id} not found.")
+    else:
+        response = GenericResponse(
+            code=200,
+            message="Job fetched successfully.",
+            data=job.model_dump(mode="json"),
+        )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_all_jobs_controller(request: Request) -> JSONResponse:
+    """
+    Get all the known training jobs.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing the jobs, most recent first.
+    """
+    job_manager: TrainingJobManager = request.app.state.training_jobs
+    response = GenericResponse(
+        code=200,
+        message="Jobs fetched successfully.",
+        data=[job.model_dump(mode="json") for job in job_manager.list()],
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def cancel_job_controller(request: Request, job_id: str) -> JSONResponse:
+    """
+    Cancel a training job.
+    Args:
+        request (Request): The FastAPI request object.
+        job_id (str): Id of the job.
+    Returns:
+        JSONResponse: Response containing the job.
+    """
+    job_manager: TrainingJobManager = request.app.state.training_jobs
+    job = job_manager.get(job_id)
+
+    if job is None:
+        response = GenericResponse(code=404, message=f"Job {job_id} not found.")
+    elif job.is_finished:
+        response = GenericResponse(
+            code=409,
+            message=f"Job {job_id} already finished with status {job.status.value}.",
+            data=job.model_dump(mode="json"),
+        )
+    else:
+        job = job_manager.cancel(job_id)
+        response = GenericResponse(
+            code=200,
+            message="Job cancellation requested.",
+            data=job.model_dump(mode="json"),
+        )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
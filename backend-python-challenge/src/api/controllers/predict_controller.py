@@ -1,25 +1,76 @@
 from typing import List
+from api.bulk_payloads import (
+    ARROW_STREAM_CONTENT_TYPE,
+    decode_bulk_features,
+    encode_labels_as_arrow,
+)
 from api.models.animal_data import AnimalData
 from api.models.generic_response import GenericResponse
+from api.executors import run_compute, run_io
+from api.micro_batching import MICRO_BATCHERS
 from api.models.synthetic_data import SyntheticDataParams
-from api.utils import (
-    get_model_deserialized_from_minio,
-    save_prediction_to_minio,
-)
-from config.minio_config import BUCKET_PREDICTIONS, BUCKET_MODELS
+from api.prediction_log import PredictionLogWriter
+from api.utils import get_model_from_minio, get_surrogate_from_minio
+from config.minio_config import BUCKET_MODELS
+from config.settings import settings
 from fastapi import Request
-from fastapi.responses import JSONResponse
-from machine_learning.predict import predict
+from fastapi.responses import JSONResponse, Response
+from machine_learning.predict import (
+    animals_to_features,
+    attach_probabilities,
+    predict,
+    predict_frame,
+    predict_with_probabilities,
+    supports_probabilities,
+)
 from machine_learning.models.analysis_result import AnalysisResult
 from minio import Minio
+from observability.metrics import stage_timer
 import logging
+import polars as ps
 import os
 
 logger = logging.getLogger(__name__)
 
 
+FAST_MODE_MESSAGES = {
+    "fast": "Prediction successfully done with the fast surrogate.",
+    "full": "Prediction successfully done, the model has no fast surrogate.",
+}
+
+
+@stage_timer("load_model")
+def load_model_for_mode(minio_client: Minio, model_key: str, mode: str) -> tuple:
+    """
+    Load the model used to serve a prediction.
+    Args:
+        minio_client (Minio): Configured MinIO client.
+        model_key (str): Model, in the format 'seed-number_of_datapoints'.
+        mode (str): 'full' for the trained model, 'fast' for its distilled tree,
+            falling back to the trained model if it has none.
+    Returns:
+        tuple: The model, its label encoder and the mode actually served.
+    Raises:
+        FileNotFoundError: If the model does not exist.
+    """
+    if mode == "fast":
+        try:
+            model, label_encoder = get_surrogate_from_minio(
+                minio_client, BUCKET_MODELS, model_key
+            )
+            return model, label_encoder, "fast"
+        except FileNotFoundError:
+            logger.info(f"Model {model_key} has no fast surrogate")
+    model, label_encoder = get_model_from_minio(minio_client, BUCKET_MODELS, model_key)
+    return model, label_encoder, "full"
+
+
 async def predict_controller(
-    request: Request, model: SyntheticDataParams, animal_data: List[AnimalData]
+    request: Request,
+    model: SyntheticDataParams,
+    animal_data: List[AnimalData],
+    mode: str = "full",
+    probabilities: bool = False,
 ):
     """
     Predict using the model and data provided.
@@ -27,19 +78,22 @@ async def predict_controller(
         request (Request): The FastAPI request object.
         model (SyntheticDataParams): Model parameters.
         animal_data (List[AnimalData]): List of animal data to predict.
+        mode (str): 'full' to use the trained model, 'fast' to use its distilled
+            decision tree when it has one.
+        probabilities (bool): Also return the probability of each class.
     Returns:
         JSONResponse: Response containing the prediction results.
     """
     response = GenericResponse(code=500, message="Something went wrong", data=None)
 
     minio_client: Minio = request.app.state.minio_client
-    object_path = f"{model.seed}-{model.number_of_datapoints}/model.pkl"
+    model_key = f"{model.seed}-{model.number_of_datapoints}"
 
     # Try to get the model from MinIO
 
     try:
-        model, label_encoder = get_model_deserialized_from_minio(
-            minio_client, BUCKET_MODELS, object_path
+        model, label_encoder, served_mode = await run_io(
+            load_model_for_mode, minio_client, model_key, mode
         )
     except FileNotFoundError:
         logger.warning("Model not found in MinIO")
@@ -53,19 +107,136 @@ async def predict_controller(
         response.message = f"Error validating model: {str(e)}"
         return JSONResponse(status_code=response.code, content=response.model_dump())
 
+    if probabilities and not supports_probabilities(model):
+        response.code = 400
+        response.message = (
+            f"Model {model_key} does not provide probabilities, retrain it to get them."
+        )
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+
     # predict
     try:
-        result: List[AnimalData] = predict(
-            animal_data, model, label_encoder=label_encoder
-        )
+        if settings.PREDICT_MICRO_BATCHING and served_mode == "full":
+            # Coalesce concurrent requests for this model into one predict call
+            batcher = MICRO_BATCHERS.get(
+                model_key, model, label_encoder, probabilities=probabilities
+            )
+            if probabilities:
+                result: List[AnimalData] = attach_probabilities(
+                    animal_data,
+                    await batcher.submit(
+                        await run_compute(animals_to_features, animal_data)
+                    ),
+                    model,
+                    label_encoder,
+                )
+            else:
+                result: List[AnimalData] = await batcher.predict(animal_data)
+        elif probabilities:
+            result: List[AnimalData] = await run_compute(
+                predict_with_probabilities, animal_data, model, label_encoder
+            )
+        else:
+            result: List[AnimalData] = await run_compute(
+                predict, animal_data, model, label_encoder=label_encoder
+            )
         response.data = result
         response.message = "Prediction successfully done."
+        if mode == "fast":
+            response.message = FAST_MODE_MESSAGES[served_mode]
         response.code = 200
         response.data = result
-        save_prediction_to_minio(minio_client, BUCKET_PREDICTIONS, model, result)
+        prediction_log: PredictionLogWriter = request.app.state.prediction_log
+        prediction_log.append(model_key, result)
         return JSONResponse(status_code=response.code, content=response.model_dump())
     except Exception as e:
         logger.error(f"Error validating model: {str(e)}")
         response.code = 500
         response.message = f"Error validating model: {str(e)}"
         return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def predict_bulk_controller(
+    request: Request,
+    model: SyntheticDataParams,
+    output: str = "json",
+    mode: str = "full",
+):
+    """
+    Predict a large batch of animals sent as columnar JSON, Arrow IPC or Parquet.
+    The body is decoded straight into a DataFrame, without validating one
+    AnimalData per row, and the labels are returned as a single array.
+    Args:
+        request (Request): The FastAPI request object, whose body holds the features.
+        model (SyntheticDataParams): Model parameters.
+        output (str): 'json' to return the labels in a GenericResponse, 'arrow' to
+            return them as an Arrow IPC stream with a 'label' column.
+        mode (str): 'full' to use the trained model, 'fast' to use its distilled
+            decision tree when it has one.
+    Returns:
+        Response: Response containing the predicted labels, in the input order.
+    """
+    response = GenericResponse(code=500, message="Something went wrong", data=None)
+
+    minio_client: Minio = request.app.state.minio_client
+    model_key = f"{model.seed}-{model.number_of_datapoints}"
+
+    # Decode the payload
+    try:
+        body = await request.body()
+        features: ps.DataFrame = await run_compute(
+            decode_bulk_features, body, request.headers.get("content-type")
+        )
+        del body
+    except (ValueError, TypeError) as e:
+        response.code = 400
+        response.message = f"Invalid bulk prediction payload: {str(e)}"
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+
+    # Try to get the model from MinIO
+    try:
+        model, label_encoder, served_mode = await run_io(
+            load_model_for_mode, minio_client, model_key, mode
+        )
+    except FileNotFoundError:
+        logger.warning("Model not found in MinIO")
+        response.code = 404
+        response.message = (
+            "Model not found in MinIO, use train endpoint to train a model: "
+            f"{settings.HOST}:{settings.PORT}/api/v1/train?seed={model.seed}"
+            f"&number_of_datapoints={model.number_of_datapoints}"
+        )
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+    except Exception as e:
+        logger.error(f"Error fetching model from MinIO: {str(e)}")
+        response.code = 500
+        response.message = f"Error validating model: {str(e)}"
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+
+    # predict
+    try:
+        labels = await run_compute(predict_frame, features, model, label_encoder)
+        prediction_log: PredictionLogWriter = request.app.state.prediction_log
+        prediction_log.append_frame(
+            model_key, features.with_columns(ps.Series("label", labels))
+        )
+
+        if output == "arrow":
+            content = await run_compute(encode_labels_as_arrow, labels)
+            return Response(content=content, media_type=ARROW_STREAM_CONTENT_TYPE)
+
+        response.code = 200
+        response.message = "Prediction successfully done."
+        if mode == "fast":
+            response.message = FAST_MODE_MESSAGES[served_mode]
+        response.data = {
+            "model": model_key,
+            "rows": len(labels),
+            "labels": labels.tolist(),
+        }
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+    except Exception as e:
+        logger.error(f"Error predicting bulk payload: {str(e)}")
+        response.code = 500
+        response.message = f"Error predicting: {str(e)}"
+        return JSONResponse(status_code=response.code, content=response.model_dump())
@@ -0,0 +1,208 @@
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.executors import get_executors_stats
+from api.micro_batching import MICRO_BATCHERS
+from api.model_cache import MODEL_CACHE
+from api.model_registry import MODEL_REGISTRY
+from api.models.generic_response import GenericResponse
+from api.object_cache import OBJECT_CACHE
+from api.single_flight import DATASET_GENERATIONS
+from config.settings import settings
+from observability.metrics import REGISTRY, MetricFamily, families_from_stats, render
+from observability.tracing import TRACER, InMemoryExporter
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def get_executors_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the load of the executors used to run blocking work.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing in-flight calls and queue depth per executor.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Executor stats fetched successfully.",
+        data=get_executors_stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_prediction_log_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the counters of the prediction log writer.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing buffered, flushed and dropped rows.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Prediction log stats fetched successfully.",
+        data=request.app.state.prediction_log.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_micro_batching_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the stats of the prediction micro-batchers.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing batches, rows and fill ratio per model.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Micro-batching stats fetched successfully.",
+        data={
+            "enabled": settings.PREDICT_MICRO_BATCHING,
+            "max_batch_rows": settings.PREDICT_BATCH_MAX_ROWS,
+            "max_wait_ms": settings.PREDICT_BATCH_WAIT_MS,
+            "models": MICRO_BATCHERS.stats(),
+        },
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_object_cache_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the counters of the local disk cache of MinIO objects.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing hits, misses, evictions and occupancy.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Object cache stats fetched successfully.",
+        data=OBJECT_CACHE.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_object_store_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the counters of the async object store.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing requests, retries and requests in flight.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Object store stats fetched successfully.",
+        data=request.app.state.object_store.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_dataset_generations_stats_controller(request: Request) -> JSONResponse:
+    """
+    Get the counters of the coalesced dataset generations.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        JSONResponse: Response containing generations run, coalesced and in flight.
+    """
+    response = GenericResponse(
+        code=200,
+        message="Dataset generation stats fetched successfully.",
+        data=DATASET_GENERATIONS.stats(),
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_traces_controller(
+    request: Request, limit: int, trace_id: Optional[str]
+) -> JSONResponse:
+    """
+    Get the most recent traces kept by the in-memory exporter.
+    Args:
+        request (Request): The FastAPI request object.
+        limit (int): Number of traces returned.
+        trace_id (Optional[str]): Only return this trace, such as the X-Trace-Id
+            of a response or the trace_id of a training job.
+    Returns:
+        JSONResponse: Response containing the tracer stats and the traces with
+        their spans, or 404 if the spans are exported to a file.
+    """
+    if not isinstance(TRACER.exporter, InMemoryExporter):
+        response = GenericResponse(
+            code=404,
+            message="Traces are not kept in memory, see TRACING_EXPORTER.",
+            data=TRACER.stats(),
+        )
+        return JSONResponse(status_code=response.code, content=response.model_dump())
+
+    response = GenericResponse(
+        code=200,
+        message="Traces fetched successfully.",
+        data={
+            **TRACER.stats(),
+            "traces": TRACER.exporter.traces(limit, trace_id),
+        },
+    )
+    return JSONResponse(status_code=response.code, content=response.model_dump())
+
+
+async def get_metrics_controller(request: Request) -> PlainTextResponse:
+    """
+    Get the metrics of the API in the Prometheus text format: the stage and
+    request histograms, and the stats of the caches, executors, training jobs,
+    prediction log, micro-batchers, object store, model registry and dataset
+    generations.
+    Args:
+        request (Request): The FastAPI request object.
+    Returns:
+        PlainTextResponse: The metrics.
+    """
+    families = REGISTRY.collect()
+
+    training_jobs = MetricFamily(
+        "mpc_training_jobs", "gauge", "Training jobs known to this worker, by status."
+    )
+    for status, count in request.app.state.training_jobs.stats().items():
+        training_jobs.add(count, status=status)
+    families.append(training_jobs)
+
+    families += families_from_stats(
+        "mpc_executor", "Executors", get_executors_stats(), label="executor"
+    )
+    families += families_from_stats(
+        "mpc_model_cache", "In-memory model cache", MODEL_CACHE.stats()
+    )
+    families += families_from_stats(
+        "mpc_object_cache", "Local disk cache of MinIO objects", OBJECT_CACHE.stats()
+    )
+    families += families_from_stats(
+        "mpc_object_store",
+        "Async object store",
+        request.app.state.object_store.stats(),
+    )
+    families += families_from_stats(
+        "mpc_prediction_log",
+        "Prediction log writer",
+        request.app.state.prediction_log.stats(),
+    )
+    families += families_from_stats(
+        "mpc_micro_batcher",
+        "Prediction micro-batchers",
+        MICRO_BATCHERS.stats(),
+        label="model",
+    )
+    families += families_from_stats(
+        "mpc_model_registry", "Model registry", MODEL_REGISTRY.stats()
+    )
+    families += families_from_stats("mpc_tracing", "Tracing", TRACER.stats())
+    families += families_from_stats(
+        "mpc_dataset_generations",
+        "Coalesced dataset generations",
+        DATASET_GENERATIONS.stats(),
+    )
+    return PlainTextResponse(render(families), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,48 +1,154 @@
 from api.models.generic_response import GenericResponse
+from api.executors import CPU_EXECUTOR, run_compute, run_cpu, run_io
+from api.model_artifact import load_model_file
 from api.models.synthetic_data import SyntheticDataParams
+from api.object_cache import CachedObject
 from api.utils import (
     get_data_from_minio_by_seed_and_number_datapoints,
-    get_model_deserialized_from_minio,
+    get_model_file_from_minio,
 )
 from config.minio_config import BUCKET_DATA, BUCKET_MODELS
+from config.settings import settings
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from machine_learning.models.analysis_result import AnalysisResult
-from machine_learning.validate import validate
+from machine_learning.validate import (
+    score_chunk,
+    summarize_validation,
+    validation_classes,
+)
 from minio import Minio
+from observability.metrics import stage_timer
+import asyncio
 import logging
+import math
 import os
+import numpy as np
+import polars as ps
 
 logger = logging.getLogger(__name__)
 
 
+def score_model_file_chunk(
+    object_path: str,
+    cached_object: CachedObject,
+    dataframe: ps.DataFrame,
+    classes: np.ndarray,
+    model_class_index: np.ndarray,
+    chunk_rows: int,
+) -> np.ndarray:
+    """
+    score_chunk, in a worker process, with the model loaded from its copy in the
+    local object cache. Workers keep the model in their model cache, so it is
+    neither pickled per slice nor loaded again by the next validations. Worker
+    processes have no MinIO client, so a copy evicted since the API fetched it
+    fails the slice.
+    Args:
+        object_path (str): Object path of the model.
+        cached_object (CachedObject): Local copy of the model.
+        dataframe (ps.DataFrame): Labeled rows, without outliers.
+        classes (np.ndarray): Classes of the confusion matrix.
+        model_class_index (np.ndarray): Position of each model class in classes.
+        chunk_rows (int): Rows predicted at once.
+    Returns:
+        np.ndarray: Confusion matrix of the rows.
+    Raises:
+        FileNotFoundError: If the local copy was evicted.
+    """
+    model, _ = load_model_file(None, object_path, cached_object)
+    return score_chunk(model, dataframe, classes, model_class_index, chunk_rows)
+
+
+@stage_timer("validate_score")
+async def score_dataset(
+    dataframe: ps.DataFrame,
+    object_path: str,
+    cached_object: CachedObject,
+    label_encoder,
+    bootstrap: int = 0,
+) -> AnalysisResult:
+    """
+    Score a model on a dataset on the CPU process pool. The rows are split in one
+    contiguous slice per worker; each worker loads the model from the object
+    cache, predicts its slice in chunks and only returns its confusion matrix, and
+    the matrices are summed.
+    Args:
+        dataframe (ps.DataFrame): Labeled validation data.
+        object_path (str): Object path of the model, see get_model_file_from_minio.
+        cached_object (CachedObject): Local copy of the model.
+        label_encoder (LabelEncoder): Label encoder of the model.
+        bootstrap (int): Bootstrap resamples for confidence intervals, 0 to skip.
+    Returns:
+        AnalysisResult: The metrics of the model on the dataset. Without labeled
+        rows, every metric is 0 and validation_rows is 0.
+    """
+    dataframe = dataframe.filter(ps.col("label") != "outlier")
+    classes, model_class_index = validation_classes(dataframe, label_encoder)
+    if dataframe.is_empty():
+        n_classes = len(classes)
+        return summarize_validation(np.zeros((n_classes, n_classes)), classes)
+
+    chunk_rows = settings.VALIDATION_CHUNK_ROWS
+    n_slices = min(CPU_EXECUTOR.max_workers, math.ceil(dataframe.height / chunk_rows))
+    slice_rows = math.ceil(dataframe.height / n_slices)
+    matrices = await asyncio.gather(
+        *[
+            run_cpu(
+                score_model_file_chunk,
+                object_path,
+                cached_object,
+                dataframe.slice(offset, slice_rows),
+                classes,
+                model_class_index,
+                chunk_rows,
+            )
+            for offset in range(0, dataframe.height, slice_rows)
+        ]
+    )
+    return await run_compute(
+        summarize_validation,
+        np.sum(matrices, axis=0),
+        classes,
+        bootstrap,
+        settings.VALIDATION_CONFIDENCE,
+    )
+
+
 async def validate_controller(
-    request: Request, model: SyntheticDataParams, data: SyntheticDataParams
+    request: Request,
+    model: SyntheticDataParams,
+    data: SyntheticDataParams,
+    bootstrap: int = 0,
 ):
     """
-    Validate the model using the data provided.
+    Validate the model using the data provided. The stored model is only used to
+    predict, it is never refitted on the validation data.
     Args:
         request (Request): The FastAPI request object.
         model (SyntheticDataParams): Model parameters.
         data (SyntheticDataParams): Data parameters.
+        bootstrap (int): Bootstrap resamples for confidence intervals, 0 to skip.
     Returns:
         JSONResponse: Response containing the validation results.
     """
     response = GenericResponse(code=500, message="Something went wrong", data=None)
 
     minio_client: Minio = request.app.state.minio_client
-    object_path = f"{model.seed}-{model.number_of_datapoints}/model.pkl"
+    model_key = f"{model.seed}-{model.number_of_datapoints}"
 
     # Try to get the model from MinIO
 
     try:
-        trained_model, _ = get_model_deserialized_from_minio(
-            minio_client, BUCKET_MODELS, object_path
+        object_path, cached_object = await run_io(
+            get_model_file_from_minio, minio_client, BUCKET_MODELS, model_key
+        )
+        _, label_encoder = await run_io(
+            load_model_file, minio_client, object_path, cached_object
         )
     except FileNotFoundError:
         logger.warning("Model not found in MinIO")
         response.code = 404
-        response.message = f"Model not found in MinIO, use train endpoint to train a model: {settings.HOST}:{settings.port}/api/v1/train?seed={model.seed}&number_of_datapoints={model.number_of_datapoints}"
+        response.message = f"Model not found in MinIO, use train endpoint to train a model: {settings.HOST}:{settings.PORT}/api/v1/train?seed={model.seed}&number_of_datapoints={model.number_of_datapoints}"
         response.data = None
         return JSONResponse(status_code=response.code, content=response.model_dump())
     except Exception as e:
@@ -64,7 +170,19 @@ async def validate_controller(
         return JSONResponse(status_code=response.code, content=response.model_dump())
     # Validate
     try:
-        result: AnalysisResult = validate(dataframe, trained_model)
+        result: AnalysisResult = await score_dataset(
+            dataframe,
+            object_path,
+            cached_object,
+            label_encoder,
+            bootstrap=bootstrap,
+        )
+        if result.validation_rows == 0:
+            response.code = 400
+            response.message = "The validation data has no labeled rows."
+            return JSONResponse(
+                status_code=response.code, content=response.model_dump()
+            )
         response.data = result.model_dump(exclude={"model"})
         response.message = "Model validated successfully."
         response.code = 200
@@ -0,0 +1,197 @@
+import io
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import polars as ps
+import pyarrow.parquet as pq
+
+from config.settings import settings
+from observability.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+DATASET_SCHEMA = {
+    "height": ps.Float64,
+    "weight": ps.Float64,
+    "walks_on_n_legs": ps.Int64,
+    "has_wings": ps.Boolean,
+    "has_tail": ps.Boolean,
+    "label": ps.String,
+}
+DATASET_COLUMNS = list(DATASET_SCHEMA)
+
+
+class DatasetWriter(ABC):
+    """
+    Incremental writer of a dataset. Chunks are encoded as soon as they are written,
+    so the whole dataset never has to be held in memory.
+    """
+
+    @abstractmethod
+    def write(self, df: ps.DataFrame) -> None: ...
+
+    def close(self) -> None:  # noqa: B027
+        """Write what is still buffered. Optional, most writers have nothing to do."""
+
+
+class CsvDatasetWriter(DatasetWriter):
+    def __init__(self, sink):
+        self.sink = sink
+        self._header_written = False
+
+    def write(self, df: ps.DataFrame) -> None:
+        df.write_csv(self.sink, include_header=not self._header_written)
+        self._header_written = True
+
+    def close(self) -> None:
+        if not self._header_written:
+            ps.DataFrame(schema=DATASET_SCHEMA).write_csv(self.sink)
+
+
+class ParquetDatasetWriter(DatasetWriter):
+    """Writes every chunk as a zstd-compressed Parquet row group."""
+
+    def __init__(self, sink):
+        schema = ps.DataFrame(schema=DATASET_SCHEMA).to_arrow().schema
+        self._writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write(self, df: ps.DataFrame) -> None:
+        self._writer.write_table(df.to_arrow())
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class DatasetFormat(ABC):
+    """
+    Base class of the formats used to store datasets in MinIO.
+    Subclasses define how a DataFrame is encoded and decoded, and how to recognize
+    an object written in that format from its first bytes.
+    """
+
+    name: str = ""
+    content_type: str = "application/octet-stream"
+
+    @abstractmethod
+    def matches(self, data: bytes) -> bool: ...
+
+    @abstractmethod
+    def write(self, df: ps.DataFrame, buffer: io.BytesIO) -> None: ...
+
+    @abstractmethod
+    def read(self, data: bytes) -> ps.DataFrame: ...
+
+    @abstractmethod
+    def open_writer(self, sink) -> DatasetWriter: ...
+
+
+class CsvDatasetFormat(DatasetFormat):
+    """Plain CSV with a header row. Format of the datasets written by older versions."""
+
+    name = "csv"
+    content_type = "text/plain"
+
+    def matches(self, data: bytes) -> bool:
+        # CSV is the fallback for every object that is not recognized otherwise
+        return True
+
+    def write(self, df: ps.DataFrame, buffer: io.BytesIO) -> None:
+        df.write_csv(buffer)
+
+    def read(self, data: bytes) -> ps.DataFrame:
+        return ps.read_csv(data, schema_overrides=DATASET_SCHEMA)
+
+    def open_writer(self, sink) -> DatasetWriter:
+        return CsvDatasetWriter(sink)
+
+
+class ParquetDatasetFormat(DatasetFormat):
+    """Parquet with zstd compression and typed columns."""
+
+    name = "parquet"
+    content_type = "application/vnd.apache.parquet"
+    magic = b"PAR1"
+
+    def matches(self, data: bytes) -> bool:
+        return data[:4] == self.magic
+
+    def write(self, df: ps.DataFrame, buffer: io.BytesIO) -> None:
+        df.write_parquet(buffer, compression="zstd")
+
+    def read(self, data: bytes) -> ps.DataFrame:
+        return ps.read_parquet(data)
+
+    def open_writer(self, sink) -> DatasetWriter:
+        return ParquetDatasetWriter(sink)
+
+
+DATASET_FORMATS: dict[str, DatasetFormat] = {
+    dataset_format.name: dataset_format
+    for dataset_format in (ParquetDatasetFormat(), CsvDatasetFormat())
+}
+
+
+def get_dataset_format(name: Optional[str] = None) -> DatasetFormat:
+    """
+    Get a dataset format by name.
+    Args:
+        name (str): Name of the format. Defaults to the DATASET_FORMAT setting.
+    Returns:
+        DatasetFormat: The requested format.
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    name = name or settings.DATASET_FORMAT
+    try:
+        return DATASET_FORMATS[name]
+    except KeyError as e:
+        raise ValueError(
+            f"Unsupported dataset format '{name}', "
+            f"expected one of {list(DATASET_FORMATS)}"
+        ) from e
+
+
+def detect_dataset_format(data: bytes) -> DatasetFormat:
+    """
+    Detect the format of a stored dataset from its content.
+    Args:
+        data (bytes): Content of the stored object.
+    Returns:
+        DatasetFormat: The first format (in registration order) that matches.
+    """
+    for dataset_format in DATASET_FORMATS.values():
+        if dataset_format.matches(data):
+            return dataset_format
+
+
+@stage_timer("dataset_encode")
+def encode_dataset(df: ps.DataFrame, format_name: Optional[str] = None) -> io.BytesIO:
+    """
+    Encode a dataset with the given format, casting it to the dataset schema.
+    Args:
+        df (ps.DataFrame): Labeled animal data.
+        format_name (str): Name of the format. Defaults to the DATASET_FORMAT setting.
+    Returns:
+        io.BytesIO: In-memory encoded file, positioned at the start.
+    """
+    dataset_format = get_dataset_format(format_name)
+    buffer = io.BytesIO()
+    dataset_format.write(df.select(DATASET_COLUMNS).cast(DATASET_SCHEMA), buffer)
+    buffer.seek(0)
+    return buffer
+
+
+@stage_timer("dataset_decode")
+def decode_dataset(data: bytes) -> ps.DataFrame:
+    """
+    Decode a stored dataset, detecting its format automatically.
+    Args:
+        data (bytes): Content of the stored object.
+    Returns:
+        ps.DataFrame: The decoded dataset.
+    """
+    dataset_format = detect_dataset_format(data)
+    logger.info(f"Decoding dataset stored as {dataset_format.name}")
+    return dataset_format.read(data)
@@ -0,0 +1,210 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config.settings import settings
+from observability.metrics import capture_stages, replay_stages
+from observability.tracing import (
+    capture_spans,
+    current_span_context,
+    export_spans,
+    span,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedExecutor:
+    """
+    Wrapper around a concurrent.futures executor that can be awaited from async
+    handlers and keeps track of its load.
+
+    Three executors are used by the API:
+        - io: threads for blocking MinIO and HTTP calls.
+        - compute: threads for short CPU work on objects that live in this process,
+          such as predicting with a cached model, where sending the model to another
+          process would cost more than the work itself.
+        - cpu: processes for long CPU-bound work, such as training and validation.
+    """
+
+    def __init__(self, name: str, executor: Executor, max_workers: int):
+        """
+        Args:
+            name (str): Name of the executor, used in stats and logs.
+            executor (Executor): Underlying executor.
+            max_workers (int): Number of workers of the executor.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = executor
+        self._is_thread_pool = isinstance(executor, ThreadPoolExecutor)
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a function on the executor and wait for its result.
+        Thread executors run the function in a copy of the current context, like
+        asyncio.to_thread. Process executors need func and its arguments to be
+        picklable; the worker runs in the trace of the caller, and the stage
+        timings and spans it records are exported here.
+        Args:
+            func: Function to run.
+            *args, **kwargs: Arguments of the function.
+        Returns:
+            The result of the function.
+        """
+        name = getattr(func, "__name__", type(func).__name__)
+        with span(f"{self.name}:{name}", executor=self.name):
+            return await self._run(func, *args, **kwargs)
+
+    async def _run(self, func, *args, **kwargs):
+        if self._is_thread_pool:
+            call = functools.partial(
+                contextvars.copy_context().run, func, *args, **kwargs
+            )
+        else:
+            call = functools.partial(
+                capture_spans,
+                current_span_context(),
+                capture_stages,
+                func,
+                *args,
+                **kwargs,
+            )
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, call
+            )
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            if not self._is_thread_pool:
+                (result, observations), spans = result
+                replay_stages(observations)
+                export_spans(spans)
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Load of the executor. queue_depth is the number of submitted calls
+            waiting for a free worker.
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "active": min(self.in_flight, self.max_workers),
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _thread_executor(name: str, max_workers: int) -> ManagedExecutor:
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+    return ManagedExecutor(name, executor, max_workers)
+
+
+def _process_executor(name: str, max_workers: int) -> ManagedExecutor:
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    return ManagedExecutor(name, executor, max_workers)
+
+
+IO_EXECUTOR = _thread_executor("io", settings.IO_EXECUTOR_WORKERS)
+COMPUTE_EXECUTOR = _thread_executor(
+    "compute", settings.COMPUTE_EXECUTOR_WORKERS or os.cpu_count()
+)
+CPU_EXECUTOR = _process_executor("cpu", settings.CPU_EXECUTOR_WORKERS or os.cpu_count())
+
+EXECUTORS = {
+    executor.name: executor
+    for executor in (IO_EXECUTOR, COMPUTE_EXECUTOR, CPU_EXECUTOR)
+}
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking I/O call (MinIO, HTTP, disk) on the I/O thread pool."""
+    return await IO_EXECUTOR.run(func, *args, **kwargs)
+
+
+async def run_compute(func, *args, **kwargs):
+    """Run short CPU work on in-process objects on the compute thread pool."""
+    return await COMPUTE_EXECUTOR.run(func, *args, **kwargs)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run long CPU-bound work on the process pool."""
+    return await CPU_EXECUTOR.run(func, *args, **kwargs)
+
+
+async def run_dedicated(func, *args, **kwargs):
+    """
+    Run a blocking call on a new thread of its own. For calls that wait on work done
+    on the executors, such as the reader of an UploadPipe waiting for the writes of
+    the I/O pool: on a bounded pool, enough of them would take every worker and the
+    work they wait for would never run.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+    def settle(result, error) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target() -> None:
+        try:
+            result = call()
+        except BaseException as e:
+            loop.call_soon_threadsafe(settle, None, e)
+        else:
+            loop.call_soon_threadsafe(settle, result, None)
+
+    name = getattr(func, "__name__", type(func).__name__)
+    with span(f"dedicated:{name}"):
+        threading.Thread(target=target, name=f"dedicated-{name}", daemon=True).start()
+        return await future
+
+
+def get_executors_stats() -> dict:
+    """
+    Returns:
+        dict: Stats of every executor, by name.
+    """
+    return {name: executor.stats() for name, executor in EXECUTORS.items()}
+
+
+def shutdown_executors() -> None:
+    """Stop every executor, cancelling the calls that did not start yet."""
+    for executor in EXECUTORS.values():
+        logger.info(f"Shutting down {executor.name} executor")
+        executor.shutdown()
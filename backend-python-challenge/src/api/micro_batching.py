@@ -0,0 +1,219 @@
+import asyncio
+import functools
+import logging
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from api.executors import run_compute
+from api.model_cache import MODEL_CACHE
+from api.models.animal_data import AnimalData
+from config.settings import settings
+from machine_learning.predict import animals_to_features, predict_labels
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests for one model.
+
+    Requests are queued until max_wait_ms has passed since the first one or
+    max_batch_rows rows are waiting. The queued feature arrays are then stacked,
+    predicted with a single vectorized call on the compute executor, and the
+    labels are scattered back to the waiting callers.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_rows: int,
+        max_wait_ms: float,
+    ):
+        """
+        Args:
+            predict_fn (Callable): Function predicting the labels (or one row of
+                class probabilities per row) of a features array.
+            max_batch_rows (int): Number of waiting rows that triggers a batch.
+            max_wait_ms (float): Maximum time the first request of a batch waits.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+
+        self._pending: list[tuple[np.ndarray, asyncio.Future]] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Batches being predicted; the event loop only keeps weak references
+        self._running: set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    async def predict(self, data: List[AnimalData]) -> List[AnimalData]:
+        """
+        Predict the labels of a list of animals as part of a batch.
+        Args:
+            data (List[AnimalData]): Animals to predict.
+        Returns:
+            List[AnimalData]: The same animals with their predicted labels.
+        """
+        labels = await self.submit(await run_compute(animals_to_features, data))
+        for animal, label in zip(data, labels, strict=True):
+            animal.label = label
+        return data
+
+    async def submit(self, X: np.ndarray) -> np.ndarray:
+        """
+        Queue a features array and wait for its predictions.
+        Args:
+            X (np.ndarray): Features array.
+        Returns:
+            np.ndarray: Output of predict_fn for the rows of X, in the same order.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((X, future))
+        self._pending_rows += len(X)
+
+        if self._pending_rows >= self.max_batch_rows:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._dispatch)
+
+        return await future
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Number of batches, requests and rows, and the average fill ratio
+            of the batches (rows per batch relative to max_batch_rows).
+        """
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "avg_batch_requests": self.requests / self.batches if self.batches else 0,
+            "avg_fill_ratio": (
+                self.rows / (self.batches * self.max_batch_rows) if self.batches else 0
+            ),
+        }
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self._pending_rows = 0
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list[tuple[np.ndarray, asyncio.Future]]) -> None:
+        sizes = [len(X) for X, _ in batch]
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += sum(sizes)
+
+        try:
+            labels = await run_compute(
+                self.predict_fn, np.vstack([X for X, _ in batch])
+            )
+        except Exception as e:
+            logger.error(f"Error predicting batch of {sum(sizes)} rows: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), request_labels in zip(
+            batch, np.split(labels, np.cumsum(sizes)[:-1]), strict=True
+        ):
+            if not future.done():
+                future.set_result(request_labels)
+
+
+class MicroBatcherRegistry:
+    """
+    One MicroBatcher per loaded model. When a model is reloaded (for example after
+    being retrained), its batcher is replaced; requests already queued in the old
+    batcher are still predicted with the model they were submitted to. Batchers
+    are dropped when their model leaves the model cache, so they never keep an
+    evicted model in memory.
+    """
+
+    def __init__(self, max_batch_rows: int, max_wait_ms: float):
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self._batchers: dict[str, tuple[object, MicroBatcher]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, model_key: str, model, label_encoder, probabilities: bool = False
+    ) -> MicroBatcher:
+        """
+        Get the batcher of a model.
+        Args:
+            model_key (str): Model, in the format 'seed-number_of_datapoints'.
+            model: The loaded model.
+            label_encoder (LabelEncoder): Label encoder of the model.
+            probabilities (bool): Get the batcher returning the class probabilities
+                (model.predict_proba) instead of the decoded labels.
+        Returns:
+            MicroBatcher: The batcher of this exact model instance.
+        """
+        key = f"{model_key}:probabilities" if probabilities else model_key
+        with self._lock:
+            entry = self._batchers.get(key)
+            if entry is None or entry[0] is not model:
+                predict_fn = (
+                    model.predict_proba
+                    if probabilities
+                    else functools.partial(
+                        predict_labels, model=model, label_encoder=label_encoder
+                    )
+                )
+                batcher = MicroBatcher(
+                    predict_fn,
+                    max_batch_rows=self.max_batch_rows,
+                    max_wait_ms=self.max_wait_ms,
+                )
+                entry = (model, batcher)
+                self._batchers[key] = entry
+            return entry[1]
+
+    def discard_model(self, cache_key: str, value) -> None:
+        """
+        Drop the batchers of a model, see ModelCache.add_removal_listener.
+        Args:
+            cache_key (str): Object path of the model in the model cache.
+            value: The cached model and label encoder, or another cached value.
+        """
+        model = value[0] if isinstance(value, tuple) else value
+        with self._lock:
+            for key in [
+                key for key, (batched, _) in self._batchers.items() if batched is model
+            ]:
+                del self._batchers[key]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Stats of every batcher, by model.
+        """
+        with self._lock:
+            return {
+                key: batcher.stats() for key, (_, batcher) in self._batchers.items()
+            }
+
+
+MICRO_BATCHERS = MicroBatcherRegistry(
+    max_batch_rows=settings.PREDICT_BATCH_MAX_ROWS,
+    max_wait_ms=settings.PREDICT_BATCH_WAIT_MS,
+)
+MODEL_CACHE.add_removal_listener(MICRO_BATCHERS.discard_model)
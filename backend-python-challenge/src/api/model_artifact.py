@@ -0,0 +1,270 @@
+import io
+import json
+import logging
+import mmap
+import pickle
+import struct
+from datetime import datetime
+from typing import Any, BinaryIO, Optional
+
+from minio import Minio
+
+from api.bulk_payloads import FEATURE_COLUMNS, FEATURE_SCHEMA
+from api.model_cache import MODEL_CACHE
+from api.object_cache import OBJECT_CACHE, CachedObject
+from observability.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+# Artifact layout, every section starting at a multiple of ALIGNMENT bytes:
+#   MAGIC | manifest length (uint64, little endian) | manifest (JSON)
+#   pickle stream (protocol 5)
+#   out-of-band buffer 0 | buffer 1 | ...
+# Large NumPy arrays of the model (KNN training data, support vectors, IVF lists)
+# are written as out-of-band buffers, so a memory-mapped artifact is unpickled
+# without copying them and the pages are shared by every process mapping the file.
+MODEL_ARTIFACT_NAME = "model.artifact"
+LEGACY_MODEL_NAME = "model.pkl"
+# Distilled tree of the model, pickled with its label encoder like legacy models
+SURROGATE_MODEL_NAME = "surrogate.pkl"
+ARTIFACT_MAGIC = b"MPCMODEL"
+ARTIFACT_FORMAT_VERSION = 1
+ALIGNMENT = 64
+# Smaller buffers are kept inside the pickle stream
+MIN_OUT_OF_BAND_BYTES = 4096
+
+_HEADER = struct.Struct("<8sQ")
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+@stage_timer("pickle")
+def write_model_artifact(model, label_encoder, sink: BinaryIO) -> dict:
+    """
+    Serialize a model and its label encoder in the artifact format.
+    Args:
+        model: Trained model.
+        label_encoder (LabelEncoder): Label encoder of the target variable.
+        sink (BinaryIO): Writable file object, positioned at the start.
+    Returns:
+        dict: The manifest of the artifact.
+    """
+    buffers: list[pickle.PickleBuffer] = []
+
+    def keep_out_of_band(buffer: pickle.PickleBuffer) -> bool:
+        # A false value makes pickle store the buffer out-of-band
+        if buffer.raw().nbytes < MIN_OUT_OF_BAND_BYTES:
+            return True
+        buffers.append(buffer)
+        return False
+
+    payload = pickle.dumps(
+        {"model": model, "label_encoder": label_encoder},
+        protocol=5,
+        buffer_callback=keep_out_of_band,
+    )
+    raw_buffers = [buffer.raw() for buffer in buffers]
+
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "model_type": type(model).__name__,
+        "feature_columns": FEATURE_COLUMNS,
+        "feature_schema": {
+            column: str(dtype) for column, dtype in FEATURE_SCHEMA.items()
+        },
+        "classes": [str(label) for label in label_encoder.classes_],
+        "alignment": ALIGNMENT,
+        "pickle": None,
+        "buffers": [],
+    }
+
+    # Offsets depend on the manifest length, which depends on the offsets: lay
+    # the sections out until the manifest fits before the pickle stream, then pad it
+    pickle_offset = 0
+    while True:
+        manifest_bytes = json.dumps(manifest).encode("utf-8")
+        if _HEADER.size + len(manifest_bytes) <= pickle_offset:
+            break
+        offset = _HEADER.size + len(manifest_bytes)
+        pickle_offset = offset + _padding(offset)
+        manifest["pickle"] = {"offset": pickle_offset, "length": len(payload)}
+        offset = pickle_offset + len(payload)
+        manifest["buffers"] = []
+        for raw in raw_buffers:
+            offset += _padding(offset)
+            manifest["buffers"].append({"offset": offset, "length": raw.nbytes})
+            offset += raw.nbytes
+    manifest_bytes += b" " * (pickle_offset - _HEADER.size - len(manifest_bytes))
+
+    sink.write(_HEADER.pack(ARTIFACT_MAGIC, len(manifest_bytes)))
+    sink.write(manifest_bytes)
+    sink.write(payload)
+    position = manifest["pickle"]["offset"] + len(payload)
+    for raw, section in zip(raw_buffers, manifest["buffers"], strict=True):
+        sink.write(b"\0" * (section["offset"] - position))
+        sink.write(raw)
+        position = section["offset"] + section["length"]
+    return manifest
+
+
+def encode_model_artifact(model, label_encoder) -> io.BytesIO:
+    """
+    Args:
+        model: Trained model.
+        label_encoder (LabelEncoder): Label encoder of the target variable.
+    Returns:
+        io.BytesIO: In-memory artifact, positioned at the start.
+    """
+    buffer = io.BytesIO()
+    write_model_artifact(model, label_encoder, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def read_manifest(data) -> dict:
+    """
+    Args:
+        data: Content of the artifact (bytes, memoryview or mmap).
+    Returns:
+        dict: Its manifest.
+    Raises:
+        ValueError: If data is not an artifact of a supported version.
+    """
+    magic, manifest_length = _HEADER.unpack_from(data, 0)
+    if magic != ARTIFACT_MAGIC:
+        raise ValueError("Not a model artifact")
+    manifest = json.loads(
+        bytes(data[_HEADER.size : _HEADER.size + manifest_length]).decode("utf-8")
+    )
+    if manifest["format_version"] != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model artifact version {manifest['format_version']}"
+        )
+    if manifest["feature_columns"] != FEATURE_COLUMNS:
+        raise ValueError(
+            f"Model artifact expects features {manifest['feature_columns']}, "
+            f"this version provides {FEATURE_COLUMNS}"
+        )
+    return manifest
+
+
+@stage_timer("unpickle")
+def decode_model_artifact(data) -> tuple[Any, Any, dict]:
+    """
+    Deserialize an artifact. The out-of-band buffers are not copied: when data is
+    a memory map, the arrays of the model are read-only views of the mapped file.
+    Args:
+        data: Content of the artifact (bytes, memoryview or mmap).
+    Returns:
+        tuple: The model, its label encoder and the manifest.
+    """
+    manifest = read_manifest(data)
+    view = memoryview(data)
+    section = manifest["pickle"]
+    payload = view[section["offset"] : section["offset"] + section["length"]]
+    buffers = [
+        view[section["offset"] : section["offset"] + section["length"]]
+        for section in manifest["buffers"]
+    ]
+    loaded = pickle.loads(payload, buffers=buffers)
+    return loaded["model"], loaded["label_encoder"], manifest
+
+
+def read_model_file(f: BinaryIO) -> tuple[Any, Any]:
+    """
+    Deserialize an open model file: an artifact, memory-mapped, or a pickle of
+    the model and its label encoder (legacy models and surrogates).
+    Args:
+        f (BinaryIO): The file, opened in binary mode at its start.
+    Returns:
+        tuple: The model and its label encoder.
+    """
+    if f.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        model, label_encoder, _ = decode_model_artifact(mapped)
+        return model, label_encoder
+    f.seek(0)
+    with stage_timer("unpickle"):
+        loaded = pickle.load(f)
+    return loaded["model"], loaded["label_encoder"]
+
+
+def load_model_file(
+    minio_client: Optional[Minio], object_path: str, cached_object: CachedObject
+) -> tuple[Any, Any]:
+    """
+    Load a model from a copy already fetched into the local object cache, and
+    keep it in the model cache of the process. Worker processes receive the copy
+    fetched by the API instead of the pickled model, so every worker maps the
+    same file and deserializes the model once.
+    Args:
+        minio_client (Optional[Minio]): The MinIO client, to download the copy
+            again if it was evicted. None in worker processes.
+        object_path (str): Object path of the model.
+        cached_object (CachedObject): Its local copy.
+    Returns:
+        tuple: The model and its label encoder.
+    Raises:
+        FileNotFoundError: If the copy was evicted and there is no client.
+    """
+    cached = MODEL_CACHE.get(object_path, cached_object.etag)
+    if cached is not None:
+        return cached
+    cached_object, f = OBJECT_CACHE.open_file(minio_client, cached_object)
+    with f:
+        model, label_encoder = read_model_file(f)
+    MODEL_CACHE.put(
+        object_path, cached_object.etag, (model, label_encoder), cached_object.size
+    )
+    return model, label_encoder
+
+
+def load_model_artifact_from_minio(
+    minio_client: Minio, bucket: str, object_path: str
+) -> tuple[Any, Any]:
+    """
+    Load a model artifact, memory-mapped from the local object cache.
+    Loaded models are kept in the in-memory model cache, revalidated against the
+    ETag of the object like pickled models.
+    Args:
+        minio_client (Minio): The MinIO client.
+        bucket (str): Bucket of the artifact.
+        object_path (str): Object path of the artifact.
+    Returns:
+        tuple: The model and its label encoder.
+    Raises:
+        FileNotFoundError: If the artifact does not exist.
+    """
+    if not MODEL_CACHE.needs_revalidation(object_path):
+        cached = MODEL_CACHE.get(object_path)
+        if cached is not None:
+            return cached
+
+    try:
+        cached_object = OBJECT_CACHE.fetch(minio_client, bucket, object_path)
+    except Exception as e:
+        if "NoSuchKey" in str(e):
+            raise FileNotFoundError(f"Model artifact not found: {object_path}") from e
+        raise e
+
+    cached = MODEL_CACHE.get(object_path, cached_object.etag)
+    if cached is not None:
+        return cached
+
+    cached_object, f = OBJECT_CACHE.open_file(minio_client, cached_object)
+    with f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    model, label_encoder, manifest = decode_model_artifact(mapped)
+    logger.info(
+        f"Model artifact {object_path} mapped from {cached_object.path} "
+        f"({len(manifest['buffers'])} shared buffers)"
+    )
+
+    MODEL_CACHE.put(
+        object_path, cached_object.etag, (model, label_encoder), cached_object.size
+    )
+    return model, label_encoder
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """
+    Bounded, size-aware LRU cache of deserialized models.
+
+    Entries are keyed by the object path of the model inside the models bucket
+    (e.g. '42-1000/model.artifact'), so every model of a given
+    'seed-number_of_datapoints' lives under the same prefix. Each entry remembers
+    the ETag of the object it was loaded from and the size of its serialized
+    payload, which is used as an approximation of its memory footprint.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        max_bytes: int,
+        revalidate_seconds: float = 0.0,
+    ):
+        """
+        Args:
+            max_items (int): Maximum number of models kept in memory.
+            max_bytes (int): Maximum total serialized size of the cached models.
+            revalidate_seconds (float): Time during which an entry is trusted
+                without checking its ETag against MinIO again.
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        # Called with the key and value of every entry leaving the cache
+        self._removal_listeners: list[Callable[[str, Any], None]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, etag: Optional[str] = None) -> Optional[Any]:
+        """
+        Get a cached value, checking that it was loaded from the given ETag.
+        Args:
+            key (str): Object path of the model.
+            etag (Optional[str]): Current ETag of the object. If None, the entry is
+                returned without revalidation, and its validation time is kept so
+                frequent hits do not postpone the next ETag check.
+        Returns:
+            The cached value, or None if it is missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (etag is not None and entry["etag"] != etag):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            if etag is not None:
+                entry["validated_at"] = time.monotonic()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def needs_revalidation(self, key: str) -> bool:
+        """
+        Check whether the entry for a key must be revalidated against MinIO.
+        Args:
+            key (str): Object path of the model.
+        Returns:
+            bool: True if the key is not cached or its last validation is too old.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return True
+            return time.monotonic() - entry["validated_at"] > self.revalidate_seconds
+
+    def put(self, key: str, etag: str, value: Any, size: int) -> None:
+        """
+        Store a value, evicting the least recently used entries if needed.
+        Args:
+            key (str): Object path of the model.
+            etag (str): ETag of the object the value was loaded from.
+            value: Deserialized value to cache.
+            size (int): Serialized size of the value in bytes.
+        """
+        if size > self.max_bytes:
+            logger.info(f"Model {key} is larger than the cache, not caching it")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {
+                "etag": etag,
+                "value": value,
+                "size": size,
+                "validated_at": time.monotonic(),
+            }
+            self._current_bytes += size
+
+            while (
+                len(self._entries) > self.max_items
+                or self._current_bytes > self.max_bytes
+            ):
+                evicted_key, _ = next(iter(self._entries.items()))
+                self._remove(evicted_key)
+                self.evictions += 1
+                logger.info(f"Evicted model {evicted_key} from cache")
+
+    def add_removal_listener(self, listener: Callable[[str, Any], None]) -> None:
+        """
+        Register a function called with the key and value of every entry that
+        leaves the cache (evicted, invalidated, stale or replaced), so objects
+        derived from a cached model are released with it. Listeners are called
+        with the lock of the cache held and must not use the cache.
+        Args:
+            listener (Callable): Function called with the key and the value.
+        """
+        with self._lock:
+            self._removal_listeners.append(listener)
+
+    def invalidate(self, model_key: str) -> None:
+        """
+        Drop every cached entry of a model, e.g. after it has been retrained.
+        Args:
+            model_key (str): Model identifier in the format 'seed-number_of_datapoints'.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(f"{model_key}/")]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Counters and current occupancy of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "items": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._current_bytes -= entry["size"]
+        for listener in self._removal_listeners:
+            try:
+                listener(key, entry["value"])
+            except Exception as e:
+                logger.error(f"Error releasing model {key}: {str(e)}")
+
+
+MODEL_CACHE = ModelCache(
+    max_items=settings.MODEL_CACHE_MAX_ITEMS,
+    max_bytes=settings.MODEL_CACHE_MAX_BYTES,
+    revalidate_seconds=settings.MODEL_CACHE_REVALIDATE_SECONDS,
+)
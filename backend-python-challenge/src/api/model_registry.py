@@ -0,0 +1,343 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from api.model_artifact import LEGACY_MODEL_NAME, MODEL_ARTIFACT_NAME
+from api.models.model_registry import RegisteredModel
+from config.minio_config import BUCKET_MODELS
+from config.settings import settings
+from storage.object_store import ObjectNotFoundError, ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+# Manifest of the trained models, stored next to them in the models bucket. The
+# leading underscore keeps it apart from the 'seed-number_of_datapoints' prefixes.
+REGISTRY_OBJECT = "_registry.json"
+REGISTRY_FORMAT_VERSION = 1
+METRICS_NAME = "metrics.json"
+
+SORTABLE_FIELDS = {
+    "name",
+    "seed",
+    "number_of_datapoints",
+    "accuracy",
+    "precision",
+    "recall",
+    "f1",
+    "training_rows",
+    "training_seconds",
+    "artifact_bytes",
+    "created_at",
+}
+
+
+def parse_model_name(name: str) -> tuple[Optional[int], Optional[int]]:
+    """
+    Args:
+        name (str): Model name, 'seed-number_of_datapoints'.
+    Returns:
+        tuple: The seed and the number of data points, None if the name is not valid.
+    """
+    seed, _, number_of_datapoints = name.rpartition("-")
+    try:
+        return int(seed), int(number_of_datapoints)
+    except ValueError:
+        return None, None
+
+
+def filter_models(
+    models: list[RegisteredModel],
+    name: Optional[str] = None,
+    training_mode: Optional[str] = None,
+    min_accuracy: Optional[float] = None,
+) -> list[RegisteredModel]:
+    """
+    Args:
+        models (list[RegisteredModel]): Registered models.
+        name (Optional[str]): Substring the model name must contain.
+        training_mode (Optional[str]): Training mode the model must have.
+        min_accuracy (Optional[float]): Minimum accuracy of the model.
+    Returns:
+        list[RegisteredModel]: The matching models.
+    """
+    return [
+        model
+        for model in models
+        if (name is None or name in model.name)
+        and (training_mode is None or model.training_mode == training_mode)
+        and (
+            min_accuracy is None
+            or (model.accuracy is not None and model.accuracy >= min_accuracy)
+        )
+    ]
+
+
+def sort_models(models: list[RegisteredModel], sort: str) -> list[RegisteredModel]:
+    """
+    Args:
+        models (list[RegisteredModel]): Registered models.
+        sort (str): Field to sort by, prefixed with '-' for descending order.
+            Models without a value for the field always come last.
+    Returns:
+        list[RegisteredModel]: The sorted models.
+    Raises:
+        ValueError: If the field cannot be sorted by.
+    """
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in SORTABLE_FIELDS:
+        raise ValueError(
+            f"Cannot sort by '{field}', expected one of {sorted(SORTABLE_FIELDS)}"
+        )
+    present = [model for model in models if getattr(model, field) is not None]
+    missing = [model for model in models if getattr(model, field) is None]
+    present.sort(key=lambda model: getattr(model, field), reverse=descending)
+    return present + missing
+
+
+class ModelRegistry:
+    """
+    Index of the trained models, kept as a single JSON manifest in the models
+    bucket, so listing the models takes one small read instead of a scan of the
+    bucket and one metrics.json per model.
+
+    The manifest is cached in memory. After revalidate_seconds its ETag is
+    checked again and it is only downloaded if another worker changed it. When
+    the manifest does not exist yet (models trained by older versions), it is
+    rebuilt from the bucket once and written back.
+
+    Workers write the whole manifest, so a model registered by a worker can be
+    lost when another one writes at the same time, and a registration can fail
+    after the model is stored. The bucket stays the source of truth: every
+    revalidation lists its model prefixes (one request), adds the stored models
+    missing from the manifest and drops the entries of the models removed from
+    the bucket.
+    """
+
+    def __init__(self, revalidate_seconds: float = 5.0):
+        """
+        Args:
+            revalidate_seconds (float): Time during which the cached manifest is
+                trusted without checking its ETag.
+        """
+        self.revalidate_seconds = revalidate_seconds
+
+        self._models: Optional[dict[str, RegisteredModel]] = None
+        self._etag: Optional[str] = None
+        self._validated_at = 0.0
+        # Serializes the read-modify-write cycles of this worker
+        self._lock = asyncio.Lock()
+
+        self.reads = 0
+        self.revalidations = 0
+        self.rebuilds = 0
+        self.reconciliations = 0
+        self.writes = 0
+
+    async def list(self, object_store: ObjectStore) -> list[RegisteredModel]:
+        """
+        Args:
+            object_store (ObjectStore): Store of the models.
+        Returns:
+            list[RegisteredModel]: Every registered model, by name.
+        """
+        if (
+            self._models is None
+            or time.monotonic() - self._validated_at >= self.revalidate_seconds
+        ):
+            async with self._lock:
+                await self._refresh(object_store)
+        return sorted(self._models.values(), key=lambda model: model.name)
+
+    async def register(self, object_store: ObjectStore, model: RegisteredModel) -> None:
+        """
+        Add or replace a model in the manifest. Called once the model and its
+        metrics are stored, so the manifest never lists a model that cannot be
+        loaded.
+        Args:
+            object_store (ObjectStore): Store of the models.
+            model (RegisteredModel): Entry of the model.
+        """
+        async with self._lock:
+            # Always start from the latest manifest, other workers may have written
+            # it. Not reconciled: the model being registered is already stored
+            await self._revalidate(object_store)
+            models = dict(self._models)
+            models[model.name] = model
+            await self._write(object_store, models)
+        logger.info(f"Model {model.name} registered")
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Counters of the registry.
+        """
+        return {
+            "models": len(self._models) if self._models is not None else None,
+            "etag": self._etag,
+            "reads": self.reads,
+            "revalidations": self.revalidations,
+            "rebuilds": self.rebuilds,
+            "reconciliations": self.reconciliations,
+            "writes": self.writes,
+        }
+
+    async def _refresh(self, object_store: ObjectStore) -> None:
+        if (
+            self._models is not None
+            and time.monotonic() - self._validated_at < self.revalidate_seconds
+        ):
+            return
+        await self._revalidate(object_store)
+        await self._reconcile(object_store)
+
+    async def _revalidate(self, object_store: ObjectStore) -> None:
+        try:
+            # Stat before reading: if the manifest changes in between, the older
+            # ETag makes the next revalidation read it again
+            info = await object_store.stat(BUCKET_MODELS, REGISTRY_OBJECT)
+            if self._models is not None:
+                self.revalidations += 1
+                if info.etag == self._etag:
+                    self._validated_at = time.monotonic()
+                    return
+            data = await object_store.get(BUCKET_MODELS, REGISTRY_OBJECT)
+        except ObjectNotFoundError:
+            await self._write(object_store, await self._rebuild(object_store))
+            return
+
+        self.reads += 1
+        manifest = json.loads(data)
+        if manifest.get("format_version") != REGISTRY_FORMAT_VERSION:
+            logger.warning(
+                f"Unsupported model registry version {manifest.get('format_version')}, "
+                "rebuilding it"
+            )
+            await self._write(object_store, await self._rebuild(object_store))
+            return
+        self._models = {
+            entry["name"]: RegisteredModel(**entry) for entry in manifest["models"]
+        }
+        self._etag = info.etag
+        self._validated_at = time.monotonic()
+
+    async def _reconcile(self, object_store: ObjectStore) -> None:
+        """
+        Add the models stored in the bucket but missing from the manifest, and drop
+        the entries whose prefix is no longer in the bucket.
+        """
+        prefixes = {
+            info.name.rstrip("/"): info.name
+            for info in await object_store.list(BUCKET_MODELS, recursive=False)
+            if info.is_dir
+        }
+        missing = [
+            prefix for name, prefix in prefixes.items() if name not in self._models
+        ]
+        removed = sorted(name for name in self._models if name not in prefixes)
+        found = {}
+        if missing:
+            entries = await asyncio.gather(
+                *[self._entry_from_bucket(object_store, prefix) for prefix in missing]
+            )
+            found = {entry.name: entry for entry in entries if entry is not None}
+        if not found and not removed:
+            return
+        self.reconciliations += 1
+        if found:
+            logger.warning(
+                f"Models missing from the registry, adding them: {sorted(found)}"
+            )
+        if removed:
+            logger.warning(
+                f"Models no longer in the bucket, removing them from the registry: "
+                f"{removed}"
+            )
+        models = {
+            name: model for name, model in self._models.items() if name in prefixes
+        }
+        await self._write(object_store, {**models, **found})
+
+    async def _write(
+        self, object_store: ObjectStore, models: dict[str, RegisteredModel]
+    ) -> None:
+        manifest = {
+            "format_version": REGISTRY_FORMAT_VERSION,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "models": [models[name].model_dump(mode="json") for name in sorted(models)],
+        }
+        info = await object_store.put(
+            BUCKET_MODELS,
+            REGISTRY_OBJECT,
+            json.dumps(manifest).encode("utf-8"),
+            content_type="application/json",
+        )
+        self.writes += 1
+        self._models = models
+        self._etag = info.etag
+        self._validated_at = time.monotonic()
+
+    async def _rebuild(self, object_store: ObjectStore) -> dict[str, RegisteredModel]:
+        """Index the models already in the bucket, from their metrics and objects."""
+        self.rebuilds += 1
+        prefixes = [
+            info.name
+            for info in await object_store.list(BUCKET_MODELS, recursive=False)
+            if info.is_dir
+        ]
+        entries = await asyncio.gather(
+            *[self._entry_from_bucket(object_store, prefix) for prefix in prefixes]
+        )
+        models = {entry.name: entry for entry in entries if entry is not None}
+        logger.info(f"Model registry rebuilt with {len(models)} models")
+        return models
+
+    async def _entry_from_bucket(
+        self, object_store: ObjectStore, prefix: str
+    ) -> Optional[RegisteredModel]:
+        objects = {
+            info.name[len(prefix) :]: info
+            for info in await object_store.list(BUCKET_MODELS, prefix=prefix)
+        }
+        if MODEL_ARTIFACT_NAME in objects:
+            artifact_format, artifact = "artifact", objects[MODEL_ARTIFACT_NAME]
+        elif LEGACY_MODEL_NAME in objects:
+            artifact_format, artifact = "pickle", objects[LEGACY_MODEL_NAME]
+        else:
+            # Incomplete model, e.g. a training interrupted while storing it
+            return None
+
+        metrics = {}
+        if METRICS_NAME in objects:
+            try:
+                metrics = json.loads(
+                    await object_store.get(BUCKET_MODELS, prefix + METRICS_NAME)
+                )
+            except Exception as e:
+                logger.warning(f"Cannot read the metrics of {prefix}: {str(e)}")
+
+        name = prefix.rstrip("/")
+        seed, number_of_datapoints = parse_model_name(name)
+        return RegisteredModel(
+            name=name,
+            seed=seed,
+            number_of_datapoints=number_of_datapoints,
+            accuracy=metrics.get("accuracy"),
+            precision=metrics.get("precision"),
+            recall=metrics.get("recall"),
+            f1=metrics.get("f1"),
+            training_mode=metrics.get("training_mode"),
+            training_rows=metrics.get("training_rows"),
+            artifact_format=artifact_format,
+            artifact_bytes=artifact.size,
+            created_at=artifact.last_modified,
+        )
+
+
+MODEL_REGISTRY = ModelRegistry(
+    revalidate_seconds=settings.MODEL_REGISTRY_REVALIDATE_SECONDS,
+)
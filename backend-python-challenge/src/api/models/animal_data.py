@@ -1,6 +1,6 @@
 from api.models.synthetic_data import SyntheticDataParams
 from pydantic import BaseModel
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 
 class AnimalData(BaseModel):
@@ -10,10 +10,13 @@ class AnimalData(BaseModel):
     has_wings: bool
     has_tail: bool
     label: Optional[str] = None  # Optional label for the animal data
+    # Probability of each class, when requested from /predict
+    probabilities: Optional[Dict[str, float]] = None
 
 
 class Prediction(BaseModel):
     date: str  # Date of the prediction
+    model: Optional[str] = None  # Model used, as 'seed-number_of_datapoints'
     animal_data: List[AnimalData]  # List of animal data for the prediction
 
 
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RegisteredModel(BaseModel):
+    name: str  # 'seed-number_of_datapoints', the prefix of the model in the bucket
+    seed: Optional[int] = None
+    number_of_datapoints: Optional[int] = None
+    accuracy: Optional[float] = None
+    precision: Optional[float] = None
+    recall: Optional[float] = None
+    f1: Optional[float] = None
+    training_mode: Optional[str] = None
+    training_rows: Optional[int] = None
+    training_seconds: Optional[float] = None
+    artifact_format: Optional[str] = None  # 'artifact' or 'pickle'
+    artifact_bytes: Optional[int] = None
+    created_at: Optional[datetime] = None
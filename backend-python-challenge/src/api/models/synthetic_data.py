@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, List, Optional
 
 
@@ -10,3 +10,5 @@ class SyntheticDataParams(BaseModel):
 class ValidateRequest(BaseModel):
     model: SyntheticDataParams
     data: SyntheticDataParams
+    # Bootstrap resamples for confidence intervals of the metrics, 0 to skip them
+    bootstrap: int = Field(0, ge=0, le=10_000)
@@ -0,0 +1,42 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class TrainingJob(BaseModel):
+    id: str
+    seed: int
+    number_of_datapoints: int
+    status: JobStatus = JobStatus.PENDING
+    stage: str = "queued"  # Current step of the training pipeline
+    progress: float = 0.0  # Approximate progress between 0 and 1
+    cancel_requested: bool = False
+    warm_start: bool = False  # Reuse the hyperparameters of a smaller model
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None  # Metrics of the trained model
+    error: Optional[str] = None
+    trace_id: Optional[str] = None  # Trace of the job, when it is sampled
+
+    @property
+    def model_key(self) -> str:
+        return f"{self.seed}-{self.number_of_datapoints}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (
+            JobStatus.COMPLETED,
+            JobStatus.FAILED,
+            JobStatus.CANCELLED,
+        )
@@ -0,0 +1,346 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+from urllib.parse import quote, unquote
+
+from minio import Minio
+
+from config.settings import settings
+from observability.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+def _is_missing_object(e: BaseException) -> bool:
+    return "NoSuchKey" in str(e)
+
+
+@dataclass
+class CachedObject:
+    """Local copy of a MinIO object."""
+
+    bucket: str
+    object_name: str
+    etag: str
+    path: str
+    size: int
+    validated_at: float = 0.0
+
+
+class ObjectCache:
+    """
+    Read-through disk cache of MinIO objects.
+
+    Objects are stored as '<directory>/<bucket>/<quoted object name>/<etag>', so a
+    new version of an object never overwrites a file another process may be
+    reading or have memory-mapped. An entry is trusted for revalidate_seconds;
+    after that its ETag is compared with stat_object and the object is downloaded
+    again only if it changed. Objects known to be immutable are never revalidated.
+
+    Concurrent reads of the same missing object wait for a single download. The
+    total size of the files is bounded by max_bytes, evicting the least recently
+    used objects. Files already in the directory (from a previous run or another
+    worker) are picked up at startup.
+
+    A fetched file can be evicted, by this process or by another worker sharing
+    the directory, before the caller opens it: open it with open_file, which
+    downloads it again in that case. An open file stays readable after eviction.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, revalidate_seconds: float = 0.0):
+        """
+        Args:
+            directory (str): Directory of the cached files.
+            max_bytes (int): Maximum total size of the cached files.
+            revalidate_seconds (float): Time during which an entry is trusted
+                without checking its ETag against MinIO again.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+
+        self._entries: OrderedDict[str, CachedObject] = OrderedDict()
+        self._downloads: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.downloaded_bytes = 0
+
+        self._load_existing_files()
+
+    def fetch(
+        self,
+        minio_client: Minio,
+        bucket: str,
+        object_name: str,
+        immutable: bool = False,
+    ) -> CachedObject:
+        """
+        Get an up-to-date local copy of an object, downloading it if needed.
+        Args:
+            minio_client (Minio): The MinIO client.
+            bucket (str): Bucket of the object.
+            object_name (str): Name of the object.
+            immutable (bool): The object is never overwritten, a cached copy is
+                used without revalidation.
+        Returns:
+            CachedObject: The local copy.
+        Raises:
+            S3Error: If the object does not exist ('NoSuchKey') or cannot be read.
+        """
+        key = f"{bucket}/{object_name}"
+        entry = self._get_entry(key)
+        if entry is not None:
+            trusted = immutable or (
+                time.monotonic() - entry.validated_at < self.revalidate_seconds
+            )
+            if trusted:
+                return self._hit(key, entry)
+
+            etag = minio_client.stat_object(bucket, object_name).etag
+            with self._lock:
+                self.revalidations += 1
+            if etag == entry.etag and os.path.exists(entry.path):
+                entry.validated_at = time.monotonic()
+                return self._hit(key, entry)
+
+        return self._download_coalesced(minio_client, bucket, object_name, key)
+
+    def read(
+        self,
+        minio_client: Minio,
+        bucket: str,
+        object_name: str,
+        immutable: bool = False,
+    ) -> bytes:
+        """
+        Read the content of an object through the cache.
+        Args:
+            minio_client (Minio): The MinIO client.
+            bucket (str): Bucket of the object.
+            object_name (str): Name of the object.
+            immutable (bool): The object is never overwritten.
+        Returns:
+            bytes: Content of the object.
+        """
+        cached = self.fetch(minio_client, bucket, object_name, immutable=immutable)
+        _, f = self.open_file(minio_client, cached)
+        with f:
+            return f.read()
+
+    def open_file(
+        self, minio_client: Optional[Minio], cached: CachedObject
+    ) -> tuple[CachedObject, BinaryIO]:
+        """
+        Open the local copy of a fetched object, downloading it again if it was
+        evicted since the fetch.
+        Args:
+            minio_client (Optional[Minio]): The MinIO client. None in processes
+                without a client, where an evicted copy cannot be fetched again.
+            cached (CachedObject): The fetched copy.
+        Returns:
+            tuple: The copy that was opened (cached, or the new download) and the
+            file, opened in binary mode, to close.
+        Raises:
+            FileNotFoundError: If the copy was evicted and there is no client.
+        """
+        try:
+            return cached, open(cached.path, "rb")
+        except FileNotFoundError as e:
+            if minio_client is None:
+                raise FileNotFoundError(
+                    f"Local copy of {cached.bucket}/{cached.object_name} was "
+                    "evicted and cannot be fetched again without a MinIO client"
+                ) from e
+            logger.info(
+                f"{cached.bucket}/{cached.object_name} evicted, fetching it again"
+            )
+        # The missing file drops the entry, so this downloads the latest version
+        cached = self.fetch(minio_client, cached.bucket, cached.object_name)
+        return cached, open(cached.path, "rb")
+
+    def invalidate(self, bucket: str, prefix: str = "") -> None:
+        """
+        Forget the cached objects of a bucket whose name starts with prefix. The
+        next read revalidates them.
+        Args:
+            bucket (str): Bucket of the objects.
+            prefix (str): Prefix of the object names.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(f"{bucket}/{prefix}")]:
+                self._entries[key].validated_at = 0.0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Counters and occupancy of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "downloaded_bytes": self.downloaded_bytes,
+                "items": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "in_flight": len(self._downloads),
+            }
+
+    def _get_entry(self, key: str) -> Optional[CachedObject]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not os.path.exists(entry.path):
+                # Evicted by another worker sharing the directory
+                self._remove(key, delete_file=False)
+                return None
+            return entry
+
+    def _hit(self, key: str, entry: CachedObject) -> CachedObject:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def _download_coalesced(
+        self, minio_client: Minio, bucket: str, object_name: str, key: str
+    ) -> CachedObject:
+        with self._lock:
+            future = self._downloads.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._downloads[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            entry = self._download(minio_client, bucket, object_name)
+            self._add(key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._downloads[key]
+
+    def _download(
+        self, minio_client: Minio, bucket: str, object_name: str
+    ) -> CachedObject:
+        directory = os.path.join(self.directory, bucket, quote(object_name, safe=""))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            with stage_timer("minio_get", misses=_is_missing_object):
+                stat = minio_client.fget_object(bucket, object_name, tmp_path)
+            etag = stat.etag
+            path = os.path.join(directory, etag)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self.downloaded_bytes += size
+        logger.info(f"Cached {bucket}/{object_name} ({size} bytes)")
+        return CachedObject(
+            bucket=bucket,
+            object_name=object_name,
+            etag=etag,
+            path=path,
+            size=size,
+            validated_at=time.monotonic(),
+        )
+
+    def _add(self, key: str, entry: CachedObject) -> None:
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                # Older version of the object; processes that mapped it keep their
+                # pages until they unmap it
+                self._remove(key, delete_file=previous.path != entry.path)
+            self._entries[key] = entry
+            self._current_bytes += entry.size
+
+            while self._current_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                if oldest == key:
+                    break
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str, delete_file: bool = True) -> None:
+        entry = self._entries.pop(key)
+        self._current_bytes -= entry.size
+        if delete_file:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _load_existing_files(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        files = []
+        for bucket in os.listdir(self.directory):
+            bucket_dir = os.path.join(self.directory, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for quoted_name in os.listdir(bucket_dir):
+                object_dir = os.path.join(bucket_dir, quoted_name)
+                for etag in os.listdir(object_dir):
+                    # Unfinished downloads
+                    if etag.endswith((".tmp", ".part.minio")):
+                        continue
+                    path = os.path.join(object_dir, etag)
+                    stat = os.stat(path)
+                    files.append(
+                        (
+                            stat.st_atime,
+                            bucket,
+                            unquote(quoted_name),
+                            etag,
+                            path,
+                            stat.st_size,
+                        )
+                    )
+
+        # Least recently used first; entries are revalidated on their first read
+        for _, bucket, object_name, etag, path, size in sorted(files):
+            self._add(
+                f"{bucket}/{object_name}",
+                CachedObject(bucket, object_name, etag, path, size),
+            )
+        logger.info(
+            f"Object cache loaded {len(self._entries)} files from {self.directory}"
+        )
+
+
+OBJECT_CACHE = ObjectCache(
+    directory=settings.OBJECT_CACHE_DIR,
+    max_bytes=settings.OBJECT_CACHE_MAX_BYTES,
+    revalidate_seconds=settings.OBJECT_CACHE_REVALIDATE_SECONDS,
+)
@@ -0,0 +1,106 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from config.minio_config import BUCKET_PREDICTIONS
+from storage.object_store import ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+# Predictions are partitioned by day. A day partition holds Parquet files of the
+# prediction log ('2025-06-01/part-....parquet', see api.prediction_log) and the
+# per-prediction files written by older versions
+# ('2025-06-01/12-30-05-123456-1a2b3c4d/prediction.data'). The oldest versions
+# wrote one top-level prefix per prediction: '2025-06-01_12-30-05/prediction.data'.
+# Every layout is read.
+PARTITION_FORMAT = "%Y-%m-%d"
+LEGACY_PREFIX_FORMAT = "%Y-%m-%d_%H-%M-%S"
+TIME_FORMAT = "%H-%M-%S-%f"
+
+# Above this number of days, partitions are found by listing the bucket root
+# instead of being enumerated one by one
+MAX_ENUMERATED_PARTITIONS = 366
+
+
+def parse_prediction_time(object_name: str) -> Optional[datetime]:
+    """
+    Get the time of a prediction from its object name, in either layout.
+    Args:
+        object_name (str): Object name of the prediction.
+    Returns:
+        Optional[datetime]: Time of the prediction, or None if the name is not valid.
+    """
+    parts = object_name.split("/")
+    try:
+        if len(parts) >= 3:
+            return datetime.strptime(
+                f"{parts[0]}/{parts[1][:15]}", f"{PARTITION_FORMAT}/{TIME_FORMAT}"
+            )
+        return datetime.strptime(parts[0], LEGACY_PREFIX_FORMAT)
+    except ValueError:
+        return None
+
+
+def _parse_partition_date(prefix: str) -> Optional[date]:
+    try:
+        return datetime.strptime(prefix.rstrip("/")[:10], PARTITION_FORMAT).date()
+    except ValueError:
+        return None
+
+
+async def list_partition_prefixes(
+    object_store: ObjectStore, start: Optional[date], end: Optional[date]
+) -> list[str]:
+    """
+    Get the prefixes to list to find the predictions between two dates.
+    When both dates are given, the day prefixes are enumerated without touching
+    MinIO; otherwise the bucket root is listed (non recursively) and filtered.
+    Args:
+        object_store (ObjectStore): Store of the predictions.
+        start (Optional[date]): First day, inclusive.
+        end (Optional[date]): Last day, inclusive.
+    Returns:
+        list[str]: Prefixes covering the requested days, in chronological order.
+    """
+    if start and end:
+        days = (end - start).days + 1
+        if days <= 0:
+            return []
+        if days <= MAX_ENUMERATED_PARTITIONS:
+            prefixes = []
+            for offset in range(days):
+                day = (start + timedelta(days=offset)).strftime(PARTITION_FORMAT)
+                # Day partition and legacy per-prediction prefixes of the day
+                prefixes.extend([f"{day}/", f"{day}_"])
+            return prefixes
+
+    prefixes = []
+    for obj in await object_store.list(BUCKET_PREDICTIONS, prefix="", recursive=False):
+        day = _parse_partition_date(obj.name)
+        if day is None:
+            continue
+        if start and day < start:
+            continue
+        if end and day > end:
+            continue
+        prefixes.append(obj.name)
+    return sorted(prefixes)
+
+
+async def list_prediction_objects(
+    object_store: ObjectStore, start: Optional[date], end: Optional[date]
+) -> list[str]:
+    """
+    List the prediction objects between two dates, only touching the matching
+    partitions. The partitions are listed concurrently.
+    Args:
+        object_store (ObjectStore): Store of the predictions.
+        start (Optional[date]): First day, inclusive.
+        end (Optional[date]): Last day, inclusive.
+    Returns:
+        list[str]: Object names of the prediction files and prediction log files.
+    """
+    prefixes = await list_partition_prefixes(object_store, start, end)
+    objects = await object_store.list_many(BUCKET_PREDICTIONS, prefixes, recursive=True)
+    return [obj.name for obj in objects]
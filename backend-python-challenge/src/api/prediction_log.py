@@ -0,0 +1,531 @@
+import asyncio
+import bisect
+import fcntl
+import io
+import json
+import logging
+import os
+import socket
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import IO, List, Optional
+
+import polars as ps
+from minio import Minio
+
+from api.executors import run_compute
+from api.models.animal_data import AnimalData
+from api.object_cache import OBJECT_CACHE
+from api.prediction_history import PARTITION_FORMAT, TIME_FORMAT
+from storage.object_store import ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+PREDICTION_LOG_SCHEMA = {
+    "request_id": ps.String,
+    "model": ps.String,
+    "timestamp": ps.Datetime("us"),
+    "height": ps.Float64,
+    "weight": ps.Float64,
+    "walks_on_n_legs": ps.Int64,
+    "has_wings": ps.Boolean,
+    "has_tail": ps.Boolean,
+    "label": ps.String,
+}
+
+PART_PREFIX = "part-"
+COMPACTED_PREFIX = "compacted-"
+LOG_SUFFIX = ".parquet"
+MANIFEST_PREFIX = "_manifest-"
+MANIFEST_SUFFIX = ".json"
+
+
+@dataclass
+class LogFileEntry:
+    """A Parquet file of the prediction log, as recorded in a manifest."""
+
+    name: str
+    rows: int
+    requests: int
+    # Timestamps of the first and last request of the file
+    start: datetime
+    end: datetime
+
+    def to_json(self) -> dict:
+        return {
+            **asdict(self),
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LogFileEntry":
+        return cls(
+            name=data["name"],
+            rows=data["rows"],
+            requests=data["requests"],
+            start=datetime.fromisoformat(data["start"]),
+            end=datetime.fromisoformat(data["end"]),
+        )
+
+    @classmethod
+    def from_frame(cls, name: str, df: ps.DataFrame) -> "LogFileEntry":
+        return cls(
+            name=name,
+            rows=df.height,
+            requests=df["request_id"].n_unique(),
+            start=df["timestamp"].min(),
+            end=df["timestamp"].max(),
+        )
+
+
+def manifest_name(partition: str, writer_id: str) -> str:
+    return f"{partition}/{MANIFEST_PREFIX}{writer_id}{MANIFEST_SUFFIX}"
+
+
+def is_manifest(object_name: str) -> bool:
+    """
+    Args:
+        object_name (str): Object name in the predictions bucket.
+    Returns:
+        bool: True if the object is the manifest of a writer in a day partition.
+    """
+    return object_name.rsplit("/", 1)[-1].startswith(MANIFEST_PREFIX)
+
+
+def encode_manifest(entries: list[LogFileEntry]) -> bytes:
+    return json.dumps({"files": [entry.to_json() for entry in entries]}).encode()
+
+
+def decode_manifest(data: bytes) -> list[LogFileEntry]:
+    return [LogFileEntry.from_json(entry) for entry in json.loads(data)["files"]]
+
+
+def claim_writer_id(lock_directory: str) -> tuple[str, IO]:
+    """
+    Get a writer id that a restarted process reuses: '<host name>-<slot>', with the
+    lowest slot whose lock file is not held by another live process of the host.
+    Args:
+        lock_directory (str): Directory of the lock files.
+    Returns:
+        tuple: The writer id, and the open lock file to keep while writing.
+    """
+    os.makedirs(lock_directory, exist_ok=True)
+    slot = 0
+    while True:
+        lock_file = open(os.path.join(lock_directory, f"writer-{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return f"{socket.gethostname()}-{slot}", lock_file
+        except BlockingIOError:
+            lock_file.close()
+            slot += 1
+
+
+def is_prediction_log(object_name: str) -> bool:
+    """
+    Args:
+        object_name (str): Object name in the predictions bucket.
+    Returns:
+        bool: True if the object is a Parquet file of the prediction log.
+    """
+    return object_name.endswith(LOG_SUFFIX)
+
+
+def log_file_writer(object_name: str) -> str:
+    """
+    Args:
+        object_name (str): Name of a Parquet file of the prediction log.
+    Returns:
+        str: Id of the writer of the file.
+    """
+    base = object_name.rsplit("/", 1)[-1].removesuffix(LOG_SUFFIX)
+    for prefix in (PART_PREFIX, COMPACTED_PREFIX):
+        base = base.removeprefix(prefix)
+    # '<writer>-<hours>-<minutes>-<seconds>-<microseconds>-<id>'
+    return base.rsplit("-", 5)[0]
+
+
+def select_page_files(
+    entries: list[LogFileEntry], offset: int, limit: int
+) -> tuple[list[LogFileEntry], int]:
+    """
+    Find the files holding a page of requests, in chronological order, from the
+    request counts and time ranges of the manifests. The position of the requests
+    of a file is bounded by the requests of the files that end before it starts,
+    and of those that start after it ends.
+    Args:
+        entries (list[LogFileEntry]): Every file of the period.
+        offset (int): Number of requests before the page.
+        limit (int): Number of requests of the page.
+    Returns:
+        tuple: The files that may hold requests of the page, and the number of
+        requests of the other files that come before the page.
+    """
+    by_end = sorted(entries, key=lambda entry: entry.end)
+    ends = [entry.end for entry in by_end]
+    requests_ending = [0]
+    for entry in by_end:
+        requests_ending.append(requests_ending[-1] + entry.requests)
+    by_start = sorted(entries, key=lambda entry: entry.start)
+    starts = [entry.start for entry in by_start]
+    requests_starting = [0]
+    for entry in by_start:
+        requests_starting.append(requests_starting[-1] + entry.requests)
+
+    selected, skipped_before = [], 0
+    for entry in entries:
+        first = requests_ending[bisect.bisect_left(ends, entry.start)]
+        last = requests_starting[bisect.bisect_right(starts, entry.end)] - 1
+        if last < offset:
+            skipped_before += entry.requests
+        elif first < offset + limit:
+            selected.append(entry)
+    return selected, skipped_before
+
+
+def load_prediction_log(minio_client: Minio, bucket: str, object_name: str):
+    """
+    Read a Parquet file of the prediction log through the local object cache. Log
+    files are never overwritten, so cached copies are not revalidated.
+    Args:
+        minio_client (Minio): The MinIO client.
+        bucket (str): Bucket of the predictions.
+        object_name (str): Name of the log file.
+    Returns:
+        ps.DataFrame: Logged predictions, one row per animal.
+    """
+    return ps.read_parquet(
+        OBJECT_CACHE.read(minio_client, bucket, object_name, immutable=True)
+    )
+
+
+class PredictionLogWriter:
+    """
+    Asynchronous, append-only log of predictions.
+
+    Predictions are buffered in memory and written to the predictions bucket as
+    zstd-compressed Parquet files when the buffer reaches flush_rows rows or every
+    flush_seconds, so the predict endpoint never waits for MinIO. Each flush writes
+    one file per day partition of its predictions:
+    '2025-06-01/part-<writer>-12-30-05-123456-<id>.parquet'.
+
+    Every writer keeps a manifest per day partition,
+    '2025-06-01/_manifest-<writer>.json', listing its files with their number of
+    rows and requests and their time range. Readers only read the files listed in
+    the manifests, and use the counts to read only the files of the requested page.
+
+    Periodically, the part files of this writer are merged, one row group per
+    file, into a single 'compacted-' file per day. The merged file replaces its
+    parts in the manifest in a single write, before the parts are deleted, so
+    readers never see a prediction twice. Each writer only writes its own
+    manifest and files, so several API workers can share the bucket safely. The
+    writer id is the host name and a slot held with a lock file, so a restarted
+    process takes the id, and the parts, of the process it replaces.
+    """
+
+    def __init__(
+        self,
+        object_store: ObjectStore,
+        bucket: str,
+        flush_rows: int = 10_000,
+        flush_seconds: float = 5.0,
+        max_buffered_rows: int = 1_000_000,
+        compaction_seconds: float = 600.0,
+        compaction_min_files: int = 8,
+        writer_id: Optional[str] = None,
+        lock_directory: str = "/tmp/mpc-prediction-log",
+    ):
+        """
+        Args:
+            object_store (ObjectStore): Store of the log files.
+            bucket (str): Bucket where the log is stored.
+            flush_rows (int): Number of buffered rows that triggers a flush.
+            flush_seconds (float): Maximum time rows stay in the buffer.
+            max_buffered_rows (int): Rows kept when MinIO is unavailable; the oldest
+                rows are dropped beyond this limit.
+            compaction_seconds (float): Interval between compactions.
+            compaction_min_files (int): Minimum number of files of a day partition
+                to compact it.
+            writer_id (Optional[str]): Id of the writer, claimed with a lock file
+                in lock_directory by default.
+            lock_directory (str): Directory of the writer id lock files.
+        """
+        self.object_store = object_store
+        self.bucket = bucket
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_buffered_rows = max_buffered_rows
+        self.compaction_seconds = compaction_seconds
+        self.compaction_min_files = compaction_min_files
+        self._lock_file: Optional[IO] = None
+        if writer_id is None:
+            writer_id, self._lock_file = claim_writer_id(lock_directory)
+        self.writer_id = writer_id
+
+        # Buffered predictions, one DataFrame per logged request
+        self._buffer: list[ps.DataFrame] = []
+        self._buffered_rows = 0
+        # Manifest of this writer, by day partition, loaded on first use
+        self._manifests: dict[str, list[LogFileEntry]] = {}
+        # Day partitions this writer may have files to compact in; a restarted
+        # writer may have left parts in the previous day too
+        today = datetime.now()
+        self._dirty_partitions = {
+            day.strftime(PARTITION_FORMAT) for day in (today, today - timedelta(days=1))
+        }
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+
+        self.flushed_files = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.compactions = 0
+
+    def append(self, model_key: str, animals: List[AnimalData]) -> None:
+        """
+        Add the result of a prediction to the log. Never blocks.
+        Args:
+            model_key (str): Model used, in the format 'seed-number_of_datapoints'.
+            animals (List[AnimalData]): Predicted animals.
+        """
+        self.append_frame(
+            model_key,
+            ps.DataFrame(
+                [animal.model_dump(exclude={"probabilities"}) for animal in animals]
+            ),
+        )
+
+    def append_frame(self, model_key: str, df: ps.DataFrame) -> None:
+        """
+        Add the result of a bulk prediction to the log. Never blocks.
+        Args:
+            model_key (str): Model used, in the format 'seed-number_of_datapoints'.
+            df (ps.DataFrame): Features and predicted label of the animals.
+        """
+        if df.is_empty():
+            return
+        df = df.with_columns(
+            ps.lit(uuid.uuid4().hex).alias("request_id"),
+            ps.lit(model_key).alias("model"),
+            ps.lit(datetime.now()).alias("timestamp"),
+        )
+        self._buffer.append(
+            df.select(list(PREDICTION_LOG_SCHEMA)).cast(PREDICTION_LOG_SCHEMA)
+        )
+        self._buffered_rows += df.height
+
+        if self._buffered_rows >= self.flush_rows:
+            self._flush_requested.set()
+
+    def start(self) -> None:
+        """Start the background flush and compaction tasks."""
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._compaction_loop()),
+        ]
+
+    async def stop(self) -> None:
+        """Stop the background tasks and flush the remaining predictions."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def flush(self) -> None:
+        """Write the buffered predictions as a new Parquet file per day."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            frames, self._buffer = self._buffer, []
+            self._buffered_rows = 0
+
+            # Every frame is a single request, logged with a single timestamp
+            frames_by_day: dict[str, list[ps.DataFrame]] = {}
+            for frame in frames:
+                day = frame["timestamp"][0].strftime(PARTITION_FORMAT)
+                frames_by_day.setdefault(day, []).append(frame)
+
+            failed: list[ps.DataFrame] = []
+            for partition, day_frames in sorted(frames_by_day.items()):
+                try:
+                    await self._write_part(partition, day_frames)
+                    self.flushed_files += 1
+                    self.flushed_rows += sum(frame.height for frame in day_frames)
+                except Exception as e:
+                    logger.error(f"Error flushing prediction log {partition}: {str(e)}")
+                    failed.extend(day_frames)
+
+            if failed:
+                # Keep the frames for the next flush, bounded to avoid growing forever
+                self._buffer = failed + self._buffer
+                self._buffered_rows = sum(frame.height for frame in self._buffer)
+                dropped = 0
+                while self._buffered_rows > self.max_buffered_rows:
+                    frame = self._buffer.pop(0)
+                    self._buffered_rows -= frame.height
+                    dropped += frame.height
+                if dropped:
+                    self.dropped_rows += dropped
+                    logger.error(f"Dropped {dropped} predictions from the log")
+
+    async def compact(self) -> None:
+        """Merge the small files written by this writer, per day partition."""
+        for partition in sorted(self._dirty_partitions):
+            try:
+                # Flushes also write the manifest
+                async with self._flush_lock:
+                    entries = await self._load_manifest(partition)
+                    await self._remove_unlisted_files(partition, entries)
+                    # Nothing else is written to past partitions, merge their
+                    # remaining parts once and forget them
+                    past = partition != datetime.now().strftime(PARTITION_FORMAT)
+                    if len(entries) >= self.compaction_min_files or (
+                        past and len(entries) > 1
+                    ):
+                        await self._compact_partition(partition, entries)
+                        self.compactions += 1
+                    if past:
+                        self._dirty_partitions.discard(partition)
+            except Exception as e:
+                logger.error(f"Error compacting prediction log {partition}: {str(e)}")
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Counters of the writer.
+        """
+        return {
+            "buffered_rows": self._buffered_rows,
+            "flushed_files": self.flushed_files,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "compactions": self.compactions,
+        }
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), timeout=self.flush_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def _compaction_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.compaction_seconds)
+            await self.compact()
+
+    def _object_name(self, prefix: str, timestamp: datetime) -> str:
+        return (
+            f"{timestamp.strftime(PARTITION_FORMAT)}/{prefix}{self.writer_id}-"
+            f"{timestamp.strftime(TIME_FORMAT)}-{uuid.uuid4().hex[:8]}{LOG_SUFFIX}"
+        )
+
+    async def _put_parquet(self, object_name: str, df: ps.DataFrame, **kwargs) -> None:
+        buffer = io.BytesIO()
+        await run_compute(df.write_parquet, buffer, compression="zstd", **kwargs)
+        await self.object_store.put(
+            self.bucket,
+            object_name,
+            buffer.getvalue(),
+            content_type="application/vnd.apache.parquet",
+        )
+
+    async def _load_manifest(self, partition: str) -> list[LogFileEntry]:
+        entries = self._manifests.get(partition)
+        if entries is None:
+            try:
+                entries = decode_manifest(
+                    await self.object_store.get(
+                        self.bucket, manifest_name(partition, self.writer_id)
+                    )
+                )
+            except Exception as e:
+                if "NoSuchKey" not in str(e):
+                    raise e
+                entries = []
+            self._manifests[partition] = entries
+        return entries
+
+    async def _save_manifest(self, partition: str, entries: list[LogFileEntry]) -> None:
+        await self.object_store.put(
+            self.bucket,
+            manifest_name(partition, self.writer_id),
+            encode_manifest(entries),
+            content_type="application/json",
+        )
+        self._manifests[partition] = entries
+
+    async def _write_part(self, partition: str, frames: list[ps.DataFrame]) -> None:
+        df = ps.concat(frames)
+        entries = await self._load_manifest(partition)
+        object_name = self._object_name(PART_PREFIX, df["timestamp"][0])
+        await self._put_parquet(object_name, df)
+        # A part missing from the manifest is never read, and deleted by compact
+        await self._save_manifest(
+            partition, entries + [LogFileEntry.from_frame(object_name, df)]
+        )
+        self._dirty_partitions.add(partition)
+
+    async def _remove_unlisted_files(
+        self, partition: str, entries: list[LogFileEntry]
+    ) -> None:
+        """
+        Delete the files of this writer missing from its manifest: parts whose
+        manifest update failed, or parts of a compaction whose deletion failed.
+        """
+        objects = await self.object_store.list_many(
+            self.bucket,
+            [
+                f"{partition}/{prefix}{self.writer_id}-"
+                for prefix in (COMPACTED_PREFIX, PART_PREFIX)
+            ],
+        )
+        listed = {entry.name for entry in entries}
+        await asyncio.gather(
+            *[
+                self.object_store.remove(self.bucket, obj.name)
+                for obj in objects
+                if obj.name not in listed
+            ]
+        )
+
+    async def _compact_partition(
+        self, partition: str, entries: list[LogFileEntry]
+    ) -> None:
+        object_names = [entry.name for entry in entries]
+        # Parts are deleted right after, they are not read through the object cache
+        contents = await self.object_store.fetch_many(self.bucket, object_names)
+        df = await run_compute(
+            lambda: ps.concat(
+                [ps.read_parquet(content) for content in contents],
+                how="vertical_relaxed",
+            ).sort("timestamp")
+        )
+        compacted_name = self._object_name(COMPACTED_PREFIX, df["timestamp"][0])
+        await self._put_parquet(compacted_name, df, row_group_size=self.flush_rows)
+
+        # Readers switch to the merged file with the manifest; one that listed the
+        # parts just before reads the manifest again if a part is gone
+        await self._save_manifest(
+            partition, [LogFileEntry.from_frame(compacted_name, df)]
+        )
+        await asyncio.gather(
+            *[
+                self.object_store.remove(self.bucket, object_name)
+                for object_name in object_names
+            ]
+        )
+        logger.info(
+            f"Compacted {len(object_names)} prediction log files of {partition}"
+        )
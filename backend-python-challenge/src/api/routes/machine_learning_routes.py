@@ -1,14 +1,26 @@
 from datetime import date
 from sqlite3 import Date
 from typing import Optional
-from api.controllers.get_all_models_controller import get_all_models
+from api.controllers.get_all_models_controller import (
+    get_all_models,
+    get_model_cache_stats,
+    get_model_registry_stats,
+)
 from api.controllers.get_predictions_controller import get_predictions_by_time_period
+from api.controllers.jobs_controller import (
+    cancel_job_controller,
+    get_all_jobs_controller,
+    get_job_controller,
+)
 from api.models.animal_data import PredictRequest
-from api.models.synthetic_data import ValidateRequest
+from api.models.synthetic_data import SyntheticDataParams, ValidateRequest
 from fastapi import APIRouter, Query, Request
 
 from api.controllers.validate_controller import validate_controller
-from api.controllers.predict_controller import predict_controller
+from api.controllers.predict_controller import (
+    predict_bulk_controller,
+    predict_controller,
+)
 from api.controllers.train_controller import train_model_controller
 
 
@@ -16,8 +28,28 @@ router = APIRouter(prefix="/api/v1/mpc", tags=["machine-learning"])
 
 
 @router.get("/models")
-async def get_models(request: Request):
-    return await get_all_models(request)
+async def get_models(
+    request: Request,
+    name: Optional[str] = Query(None),
+    training_mode: Optional[str] = Query(None),
+    min_accuracy: Optional[float] = Query(None, ge=0, le=1),
+    sort: str = Query("name"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    return await get_all_models(
+        request, name, training_mode, min_accuracy, sort, limit, offset
+    )
+
+
+@router.get("/models/cache")
+async def get_models_cache(request: Request):
+    return await get_model_cache_stats(request)
+
+
+@router.get("/models/registry")
+async def get_models_registry(request: Request):
+    return await get_model_registry_stats(request)
 
 
 @router.get("/predictions")
@@ -25,22 +57,63 @@ async def get_predictions(
     request: Request,
     start: Optional[date] = Query(None),
     end: Optional[date] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
 ):
-    return await get_predictions_by_time_period(request, start, end)
+    return await get_predictions_by_time_period(request, start, end, limit, offset)
 
 
 @router.post("/train")
 async def train_model(
-    request: Request, seed: int = 42, number_of_datapoints: int = 1000
+    request: Request,
+    seed: int = 42,
+    number_of_datapoints: int = 1000,
+    warm_start: Optional[bool] = None,
 ):
-    return await train_model_controller(request, seed, number_of_datapoints)
+    return await train_model_controller(request, seed, number_of_datapoints, warm_start)
+
+
+@router.get("/jobs")
+async def get_jobs(request: Request):
+    return await get_all_jobs_controller(request)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    return await get_job_controller(request, job_id)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    return await cancel_job_controller(request, job_id)
 
 
 @router.post("/validate")
 async def validate(request: Request, payload: ValidateRequest):
-    return await validate_controller(request, payload.model, payload.data)
+    return await validate_controller(
+        request, payload.model, payload.data, payload.bootstrap
+    )
 
 
 @router.post("/predict")
-async def predict(request: Request, payload: PredictRequest):
-    return await predict_controller(request, payload.model, payload.data)
+async def predict(
+    request: Request,
+    payload: PredictRequest,
+    mode: str = Query("full", pattern="^(full|fast)$"),
+    probabilities: bool = Query(False),
+):
+    return await predict_controller(
+        request, payload.model, payload.data, mode, probabilities
+    )
+
+
+@router.post("/predict/bulk")
+async def predict_bulk(
+    request: Request,
+    seed: int = Query(...),
+    number_of_datapoints: int = Query(...),
+    output: str = Query("json", pattern="^(json|arrow)$"),
+    mode: str = Query("full", pattern="^(full|fast)$"),
+):
+    model = SyntheticDataParams(seed=seed, number_of_datapoints=number_of_datapoints)
+    return await predict_bulk_controller(request, model, output, mode)
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+
+from api.controllers.system_controller import (
+    get_dataset_generations_stats_controller,
+    get_executors_stats_controller,
+    get_metrics_controller,
+    get_micro_batching_stats_controller,
+    get_object_cache_stats_controller,
+    get_object_store_stats_controller,
+    get_prediction_log_stats_controller,
+    get_traces_controller,
+)
+
+router = APIRouter(prefix="/api/v1/system", tags=["system"])
+# Scraped by Prometheus at its conventional path
+metrics_router = APIRouter(tags=["system"])
+
+
+@metrics_router.get("/metrics")
+async def get_metrics(request: Request):
+    return await get_metrics_controller(request)
+
+
+@router.get("/executors")
+async def get_executors(request: Request):
+    return await get_executors_stats_controller(request)
+
+
+@router.get("/prediction-log")
+async def get_prediction_log(request: Request):
+    return await get_prediction_log_stats_controller(request)
+
+
+@router.get("/micro-batching")
+async def get_micro_batching(request: Request):
+    return await get_micro_batching_stats_controller(request)
+
+
+@router.get("/object-cache")
+async def get_object_cache(request: Request):
+    return await get_object_cache_stats_controller(request)
+
+
+@router.get("/object-store")
+async def get_object_store(request: Request):
+    return await get_object_store_stats_controller(request)
+
+
+@router.get("/dataset-generations")
+async def get_dataset_generations(request: Request):
+    return await get_dataset_generations_stats_controller(request)
+
+
+@router.get("/traces")
+async def get_traces(
+    request: Request,
+    limit: int = Query(20, ge=1, le=1000),
+    trace_id: Optional[str] = Query(None),
+):
+    return await get_traces_controller(request, limit, trace_id)
@@ -0,0 +1,263 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from minio import Minio
+
+from api.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the
+    function in its own task and every caller, the first one included, awaits its
+    result (or its exception) instead of running it again.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Args:
+            key (str): Key of the call.
+            func (Callable): Coroutine function to run if no call with the same
+                key is in flight.
+        Returns:
+            The result of the call.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded, so a cancelled caller does not cancel the shared call for the
+        # others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Retrieve it, so a call whose callers are gone does not log a warning
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Counters of the calls.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+class LeaseLostError(RuntimeError):
+    """The lease was taken over by another worker while its work was running."""
+
+
+class MinioLease:
+    """
+    Lock shared by the API workers, held as a small lease object in MinIO.
+
+    The lease holds its owner and an expiration time, renewed while the lock is
+    held, so the lock of a crashed worker is taken over after ttl_seconds. The
+    MinIO client cannot make conditional writes; two workers finding the lease
+    free at the same time both write it, wait settle_seconds and read it back,
+    and only the one whose write was kept holds the lock.
+
+    Every renewal reads the lease back first. If another worker owns it (this
+    worker stalled past the expiration), or it could not be renewed before
+    expiring, the lease is lost: renewals stop and the task holding the lease
+    is cancelled, see minio_lock.
+    """
+
+    def __init__(
+        self,
+        minio_client: Minio,
+        bucket: str,
+        object_name: str,
+        ttl_seconds: float = 60.0,
+        poll_seconds: float = 1.0,
+        settle_seconds: float = 0.5,
+    ):
+        """
+        Args:
+            minio_client (Minio): The MinIO client.
+            bucket (str): Bucket of the lease object.
+            object_name (str): Name of the lease object.
+            ttl_seconds (float): Time after which a lease that is not renewed expires.
+            poll_seconds (float): Interval between two checks of a held lease.
+            settle_seconds (float): Delay between writing the lease and checking
+                that it was not overwritten by another worker.
+        """
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.object_name = object_name
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Owner that took the lease over, set when the lease is lost
+        self.lost_to: Optional[str] = None
+        self._renewal: Optional[asyncio.Task] = None
+        self._holder: Optional[asyncio.Task] = None
+        self._expires_at = 0.0
+
+    async def acquire(self, timeout_seconds: float) -> bool:
+        """
+        Wait until the lease is held by this worker.
+        Args:
+            timeout_seconds (float): Maximum waiting time.
+        Returns:
+            bool: True if the lease was acquired, False on timeout.
+        """
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            holder = await run_io(self._read)
+            if holder is None or holder["expires_at"] < time.time():
+                self._expires_at = await run_io(self._write)
+                await asyncio.sleep(self.settle_seconds)
+                holder = await run_io(self._read)
+                if holder is not None and holder["owner"] == self.owner:
+                    self._holder = asyncio.current_task()
+                    self._renewal = asyncio.create_task(self._renew())
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.poll_seconds)
+
+    async def release(self) -> None:
+        """Stop renewing the lease and remove it if it is still held."""
+        if self._renewal is not None:
+            self._renewal.cancel()
+            await asyncio.gather(self._renewal, return_exceptions=True)
+            self._renewal = None
+        try:
+            holder = await run_io(self._read)
+            if holder is not None and holder["owner"] == self.owner:
+                await run_io(
+                    self.minio_client.remove_object, self.bucket, self.object_name
+                )
+        except Exception as e:
+            # The lease expires by itself
+            logger.warning(f"Error releasing lease {self.object_name}: {str(e)}")
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
+            try:
+                holder = await run_io(self._read)
+                owner = holder["owner"] if holder is not None else None
+                if owner != self.owner:
+                    self._lose(owner or "nobody, it expired")
+                    return
+                self._expires_at = await run_io(self._write)
+            except Exception as e:
+                logger.warning(f"Error renewing lease {self.object_name}: {str(e)}")
+                if time.time() >= self._expires_at:
+                    self._lose("unknown, it expired before being renewed")
+                    return
+
+    def _lose(self, owner: str) -> None:
+        logger.error(
+            f"Lease {self.object_name} lost, now held by {owner}: aborting its work"
+        )
+        self.lost_to = owner
+        if self._holder is not None:
+            self._holder.cancel()
+
+    def _read(self) -> Optional[dict]:
+        try:
+            response = self.minio_client.get_object(self.bucket, self.object_name)
+        except Exception as e:
+            if "NoSuchKey" in str(e):
+                return None
+            raise e
+        try:
+            return json.loads(response.read())
+        except ValueError:
+            # Unreadable lease, treat it as expired
+            return None
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _write(self) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        data = json.dumps({"owner": self.owner, "expires_at": expires_at}).encode(
+            "utf-8"
+        )
+        self.minio_client.put_object(
+            self.bucket,
+            self.object_name,
+            io.BytesIO(data),
+            len(data),
+            content_type="application/json",
+        )
+        return expires_at
+
+
+@asynccontextmanager
+async def minio_lock(
+    minio_client: Minio,
+    bucket: str,
+    object_name: str,
+    timeout_seconds: float,
+    **kwargs,
+):
+    """
+    Hold a MinioLease for the duration of the block.
+    Args:
+        minio_client (Minio): The MinIO client.
+        bucket (str): Bucket of the lease object.
+        object_name (str): Name of the lease object.
+        timeout_seconds (float): Maximum waiting time for the lease.
+        **kwargs: Other arguments of MinioLease.
+    Yields:
+        bool: True if the lease is held; False if the wait timed out, in which
+        case the block runs without it.
+    Raises:
+        LeaseLostError: If another worker took the lease over while the block was
+            running; the block is cancelled at its current await.
+    """
+    lease = MinioLease(minio_client, bucket, object_name, **kwargs)
+    acquired = await lease.acquire(timeout_seconds)
+    if not acquired:
+        logger.warning(
+            f"Timed out waiting for lease {object_name}, continuing without it"
+        )
+    try:
+        yield acquired
+    except asyncio.CancelledError as e:
+        if lease.lost_to is None:
+            raise
+        raise LeaseLostError(
+            f"Lease {object_name} taken over by {lease.lost_to}, work aborted"
+        ) from e
+    finally:
+        if acquired:
+            await lease.release()
+
+
+# Generations of datasets in flight in this worker, keyed by 'seed-number_of_datapoints'
+DATASET_GENERATIONS = SingleFlight()
@@ -0,0 +1,244 @@
+import codecs
+import json
+import logging
+import queue
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_json_array(
+    byte_chunks: AsyncIterator[bytes],
+) -> AsyncIterator[object]:
+    """
+    Incrementally parses a JSON array, yielding its elements as soon as they are
+    complete. Only the current unparsed tail of the document is kept in memory.
+    Args:
+        byte_chunks (AsyncIterator[bytes]): Raw chunks of the JSON document.
+    Yields:
+        The decoded elements of the array.
+    Raises:
+        ValueError: If the document is not a well formed JSON array.
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    finished = False
+
+    async for chunk in byte_chunks:
+        buffer += utf8_decoder.decode(chunk)
+        position = 0
+
+        while not finished:
+            # Skip whitespace and element separators
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+
+            if buffer[position] == "]":
+                finished = True
+                position += 1
+                break
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Incomplete element, wait for more data
+                break
+            # The decoder stops early on a number cut by the end of the chunk
+            # ("12." decodes as 12), an element is only complete once the
+            # separator that follows it has been received
+            separator = end
+            while separator < len(buffer) and buffer[separator] in " \t\r\n":
+                separator += 1
+            if separator == len(buffer) or buffer[separator] not in ",]":
+                break
+            position = end
+            yield item
+
+        buffer = buffer[position:]
+
+    buffer += utf8_decoder.decode(b"", final=True)
+    if not finished or buffer.strip():
+        raise ValueError("Unexpected end of JSON array")
+
+
+async def iter_json_array_batches(
+    byte_chunks: AsyncIterator[bytes], batch_size: int
+) -> AsyncIterator[list]:
+    """
+    Groups the elements of a streamed JSON array in lists of at most batch_size.
+    Args:
+        byte_chunks (AsyncIterator[bytes]): Raw chunks of the JSON document.
+        batch_size (int): Maximum number of elements per batch.
+    Yields:
+        list: Consecutive batches of decoded elements.
+    """
+    batch = []
+    async for item in iter_json_array(byte_chunks):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class UploadPipe:
+    """
+    Bounded, thread-safe byte pipe between a producer thread that encodes data and
+    the MinIO client, which reads it as a stream of unknown length and uploads it
+    with a multipart upload.
+
+    Writes are grouped in blocks of block_size bytes and at most max_blocks blocks
+    are buffered, so writers block (instead of growing memory) when the upload is
+    slower than the encoding.
+    """
+
+    _EOF = object()
+
+    def __init__(self, block_size: int = 1024 * 1024, max_blocks: int = 8):
+        """
+        Args:
+            block_size (int): Size of the blocks handed over to the reader.
+            max_blocks (int): Maximum number of blocks buffered in the pipe.
+        """
+        self.block_size = block_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_blocks)
+        self._pending = bytearray()
+        self._current = memoryview(b"")
+        self._position = 0
+        self._reader_error: Optional[BaseException] = None
+        self._eof = False
+
+    # Writer side
+
+    def write(self, data) -> int:
+        """
+        Append data to the pipe, blocking while it is full.
+        Args:
+            data (bytes-like): Data to write.
+        Returns:
+            int: Number of bytes written.
+        """
+        self._pending += data
+        self._position += len(data)
+        while len(self._pending) >= self.block_size:
+            self._put(bytes(self._pending[: self.block_size]))
+            del self._pending[: self.block_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        """Flush the buffered data and signal the end of the stream to the reader."""
+        if self._pending:
+            self._put(bytes(self._pending))
+            self._pending.clear()
+        self._put(self._EOF)
+
+    def abort(self, error: BaseException) -> None:
+        """
+        Signal the reader that the stream failed, so the upload is aborted.
+        Args:
+            error (BaseException): Error raised by the producer.
+        """
+        self._pending.clear()
+        self._put(error, raise_on_reader_error=False)
+
+    def _put(self, item, raise_on_reader_error: bool = True) -> None:
+        while True:
+            if self._reader_error is not None:
+                if raise_on_reader_error:
+                    raise RuntimeError("Upload failed") from self._reader_error
+                return
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    # Reader side
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to size bytes, blocking until data is available.
+        Args:
+            size (int): Maximum number of bytes to return.
+        Returns:
+            bytes: The data read, or b'' at the end of the stream.
+        """
+        if not self._current and not self._eof:
+            item = self._queue.get()
+            if item is self._EOF:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise RuntimeError("Upload stream aborted by producer") from item
+            else:
+                self._current = memoryview(item)
+
+        if size is None or size < 0:
+            size = len(self._current)
+        data = bytes(self._current[:size])
+        self._current = self._current[size:]
+        return data
+
+    def set_reader_error(self, error: BaseException) -> None:
+        """
+        Signal the writer that the upload failed, so writes stop blocking.
+        Args:
+            error (BaseException): Error raised while uploading.
+        """
+        self._reader_error = error
+
+
+def upload_pipe_to_minio(
+    minio_client,
+    bucket: str,
+    object_name: str,
+    pipe: UploadPipe,
+    content_type: str,
+    part_size: int,
+):
+    """
+    Uploads the content of a pipe to MinIO with a multipart upload. Meant to run in
+    a worker thread while another thread writes into the pipe.
+    Args:
+        minio_client (Minio): MinIO client instance.
+        bucket (str): Destination bucket.
+        object_name (str): Destination object name.
+        pipe (UploadPipe): Pipe to read the data from.
+        content_type (str): Content type of the object.
+        part_size (int): Size of each multipart part, at least 5 MiB.
+    Returns:
+        The result of the upload.
+    """
+    try:
+        return minio_client.put_object(
+            bucket,
+            object_name,
+            pipe,
+            length=-1,
+            part_size=part_size,
+            content_type=content_type,
+        )
+    except BaseException as e:
+        pipe.set_reader_error(e)
+        raise
@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from minio import Minio
+
+from api.executors import run_cpu, run_io
+from api.model_artifact import MODEL_ARTIFACT_NAME
+from api.model_registry import METRICS_NAME, MODEL_REGISTRY
+from api.models.model_registry import RegisteredModel
+from api.models.training_job import JobStatus, TrainingJob
+from api.utils import (
+    get_data_from_minio_by_seed_and_number_datapoints,
+    store_trained_model,
+)
+from config.minio_config import BUCKET_DATA, BUCKET_MODELS
+from config.settings import settings
+from machine_learning.classify import (
+    classify_data_using_hard_voting,
+    classify_data_using_subsampling,
+)
+from machine_learning.search import is_valid_best_params
+from machine_learning.surrogate import distill_model
+from observability.metrics import observe_stage
+from observability.tracing import Span, start_span
+from storage.object_store import ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+# Approximate progress reported when each stage of a job starts
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "fetching_data": 0.1,
+    "training": 0.3,
+    "distilling": 0.8,
+    "storing": 0.9,
+    "done": 1.0,
+}
+
+
+def use_subsampling(number_of_rows: int) -> bool:
+    """
+    Args:
+        number_of_rows (int): Number of rows of the training data.
+    Returns:
+        bool: True if the model should be trained in subsample mode, according to
+        the TRAINING_MODE setting.
+    """
+    if settings.TRAINING_MODE == "subsample":
+        return True
+    if settings.TRAINING_MODE == "auto":
+        return number_of_rows > settings.TRAINING_SUBSAMPLE_MIN_ROWS
+    return False
+
+
+class TrainingJobManager:
+    """
+    Runs model trainings in the background.
+
+    Jobs are executed as asyncio tasks: data fetching and storing run on the I/O
+    executor while the training itself runs on the CPU process pool, so it never
+    blocks the API. At most max_concurrent_jobs jobs run at the
+    same time; the rest wait in the queue. Submitting a model that already has an
+    active job returns that job instead of creating a new one.
+    """
+
+    def __init__(
+        self,
+        minio_client: Minio,
+        object_store: ObjectStore,
+        max_concurrent_jobs: int = 1,
+        max_finished_jobs: int = 100,
+    ):
+        """
+        Args:
+            minio_client (Minio): MinIO client used to read data and store models.
+            object_store (ObjectStore): Store of the model registry.
+            max_concurrent_jobs (int): Maximum number of trainings running at once.
+            max_finished_jobs (int): Number of finished jobs kept for status queries.
+        """
+        self.minio_client = minio_client
+        self.object_store = object_store
+        self.max_finished_jobs = max_finished_jobs
+
+        self._jobs: dict[str, TrainingJob] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._active_by_model: dict[str, str] = {}
+        # Current stage of the running jobs, when it started and its span
+        self._stage_started: dict[str, tuple[str, float, Optional[Span]]] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+
+    def submit(
+        self,
+        seed: int,
+        number_of_datapoints: int,
+        warm_start: Optional[bool] = None,
+    ) -> TrainingJob:
+        """
+        Submit a training job, or return the active job for the same model.
+        Args:
+            seed (int): Seed for random number generation.
+            number_of_datapoints (int): Number of data points to generate.
+            warm_start (Optional[bool]): Reuse the hyperparameters of a smaller
+                model of the same seed. Defaults to the TRAINING_WARM_START setting.
+        Returns:
+            TrainingJob: The submitted (or already active) job.
+        """
+        model_key = f"{seed}-{number_of_datapoints}"
+        active_job_id = self._active_by_model.get(model_key)
+        if active_job_id is not None:
+            logger.info(f"Training of {model_key} already in progress: {active_job_id}")
+            return self._jobs[active_job_id]
+
+        job = TrainingJob(
+            id=uuid.uuid4().hex,
+            seed=seed,
+            number_of_datapoints=number_of_datapoints,
+            warm_start=(
+                settings.TRAINING_WARM_START if warm_start is None else warm_start
+            ),
+            created_at=datetime.now(),
+        )
+        self._jobs[job.id] = job
+        self._active_by_model[model_key] = job.id
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        self._prune_finished_jobs()
+
+        logger.info(f"Training job {job.id} submitted for {model_key}")
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        """
+        Args:
+            job_id (str): Id of the job.
+        Returns:
+            Optional[TrainingJob]: The job, or None if it does not exist.
+        """
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[TrainingJob]:
+        """
+        Returns:
+            list[TrainingJob]: Known jobs, most recent first.
+        """
+        return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        """
+        Request the cancellation of a job.
+        Queued jobs are cancelled immediately. A training already running on the
+        process pool cannot be interrupted, so its result is discarded instead of
+        being stored.
+        Args:
+            job_id (str): Id of the job.
+        Returns:
+            Optional[TrainingJob]: The job, or None if it does not exist.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.is_finished:
+            return job
+
+        job.cancel_requested = True
+        if job.status == JobStatus.PENDING:
+            self._tasks[job_id].cancel()
+        logger.info(f"Cancellation requested for training job {job_id}")
+        return job
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Number of known jobs, by status.
+        """
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self._jobs.values():
+            counts[job.status.value] += 1
+        return counts
+
+    async def shutdown(self) -> None:
+        """Cancel the unfinished jobs."""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _run(self, job: TrainingJob) -> None:
+        # Part of the trace of the /train request that submitted the job, if any
+        span = start_span(
+            "training_job",
+            root=True,
+            job_id=job.id,
+            seed=job.seed,
+            number_of_datapoints=job.number_of_datapoints,
+        )
+        if span is not None and span.context.sampled:
+            job.trace_id = span.context.trace_id
+        try:
+            async with self._semaphore:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now()
+
+                self._set_stage(job, "fetching_data")
+                dataframe = await get_data_from_minio_by_seed_and_number_datapoints(
+                    job.seed, job.number_of_datapoints, self.minio_client, BUCKET_DATA
+                )
+                self._raise_if_cancel_requested(job)
+
+                self._set_stage(job, "training")
+                warm_start_from, best_params = await self._find_warm_start(job)
+                training_start = time.perf_counter()
+                if use_subsampling(len(dataframe)):
+                    results, label_encoder = await run_cpu(
+                        classify_data_using_subsampling,
+                        dataframe,
+                        search_rows=settings.TRAINING_SEARCH_ROWS,
+                        knn_rows=settings.TRAINING_KNN_ROWS,
+                        fidelity_rows=settings.TRAINING_FIDELITY_ROWS,
+                        halving=settings.TRAINING_SEARCH_HALVING,
+                        best_params=best_params,
+                        voting=settings.TRAINING_VOTING,
+                    )
+                else:
+                    results, label_encoder = await run_cpu(
+                        classify_data_using_hard_voting,
+                        dataframe,
+                        halving=settings.TRAINING_SEARCH_HALVING,
+                        best_params=best_params,
+                        voting=settings.TRAINING_VOTING,
+                    )
+                results.warm_start_from = warm_start_from
+                training_seconds = time.perf_counter() - training_start
+                self._raise_if_cancel_requested(job)
+
+                if settings.TRAINING_DISTILL:
+                    self._set_stage(job, "distilling")
+                    try:
+                        results.surrogate_model, results.surrogate = await run_cpu(
+                            distill_model,
+                            dataframe,
+                            results.model,
+                            max_depth=settings.TRAINING_DISTILL_MAX_DEPTH,
+                            min_agreement=settings.TRAINING_DISTILL_MIN_AGREEMENT,
+                            max_rows=settings.TRAINING_DISTILL_ROWS,
+                        )
+                    except Exception as e:
+                        # The fast path is optional, the model is stored without it
+                        logger.warning(
+                            f"Training job {job.id}: distillation failed: {str(e)}"
+                        )
+                del dataframe
+                self._raise_if_cancel_requested(job)
+
+                self._set_stage(job, "storing")
+                metrics = await run_io(
+                    store_trained_model,
+                    self.minio_client,
+                    job.seed,
+                    job.number_of_datapoints,
+                    results,
+                    label_encoder,
+                )
+                job.result = {"metrics": metrics}
+                try:
+                    await self._register(job, metrics, training_seconds)
+                except Exception as e:
+                    # The model is stored, the registry adds it when it reconciles
+                    logger.error(
+                        f"Training job {job.id}: cannot register the model: {str(e)}"
+                    )
+
+                self._set_stage(job, "done")
+                job.status = JobStatus.COMPLETED
+                logger.info(f"Training job {job.id} completed")
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            logger.info(f"Training job {job.id} cancelled")
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            logger.error(f"Training job {job.id} failed: {str(e)}")
+        finally:
+            job.finished_at = datetime.now()
+            self._end_stage(job, failed=job.status == JobStatus.FAILED)
+            self._active_by_model.pop(job.model_key, None)
+            self._tasks.pop(job.id, None)
+            if span is not None:
+                span.set_attribute("status", job.status.value)
+                span.error = job.error
+                span.end()
+
+    async def _find_warm_start(
+        self, job: TrainingJob
+    ) -> tuple[Optional[str], Optional[dict]]:
+        """
+        Find the hyperparameters of the largest registered model of the same seed
+        trained on fewer data points. The data of a seed is drawn from the same
+        distribution, so they remain a good choice for the larger dataset and the
+        hyperparameter search, the most expensive step, can be skipped.
+        Args:
+            job (TrainingJob): The job.
+        Returns:
+            tuple: Name of the previous model and its hyperparameters, or
+            (None, None) to search them.
+        """
+        if not job.warm_start:
+            return None, None
+        try:
+            models = await MODEL_REGISTRY.list(self.object_store)
+        except Exception as e:
+            logger.warning(f"Cannot read the model registry: {str(e)}")
+            return None, None
+
+        min_datapoints = (
+            job.number_of_datapoints * settings.TRAINING_WARM_START_MIN_RATIO
+        )
+        candidates = sorted(
+            (
+                model
+                for model in models
+                if model.seed == job.seed
+                and model.number_of_datapoints is not None
+                and min_datapoints
+                <= model.number_of_datapoints
+                < job.number_of_datapoints
+            ),
+            key=lambda model: model.number_of_datapoints,
+            reverse=True,
+        )
+        for model in candidates:
+            try:
+                metrics = json.loads(
+                    await self.object_store.get(
+                        BUCKET_MODELS, f"{model.name}/{METRICS_NAME}"
+                    )
+                )
+            except Exception as e:
+                logger.warning(f"Cannot read the metrics of {model.name}: {str(e)}")
+                continue
+            if metrics.get("warm_start_from"):
+                # Its hyperparameters were searched for an even smaller dataset
+                continue
+            best_params = metrics.get("best_params")
+            if is_valid_best_params(best_params):
+                logger.info(
+                    f"Training job {job.id}: "
+                    f"reusing the hyperparameters of {model.name}"
+                )
+                return model.name, best_params
+        return None, None
+
+    async def _register(
+        self, job: TrainingJob, metrics: dict, training_seconds: float
+    ) -> None:
+        artifact = await self.object_store.stat(
+            BUCKET_MODELS, f"{job.model_key}/{MODEL_ARTIFACT_NAME}"
+        )
+        await MODEL_REGISTRY.register(
+            self.object_store,
+            RegisteredModel(
+                name=job.model_key,
+                seed=job.seed,
+                number_of_datapoints=job.number_of_datapoints,
+                accuracy=metrics["accuracy"],
+                precision=metrics["precision"],
+                recall=metrics["recall"],
+                f1=metrics["f1"],
+                training_mode=metrics["training_mode"],
+                training_rows=metrics["training_rows"],
+                training_seconds=round(training_seconds, 3),
+                artifact_format="artifact",
+                artifact_bytes=artifact.size,
+                created_at=artifact.last_modified or datetime.now(timezone.utc),
+            ),
+        )
+
+    def _set_stage(self, job: TrainingJob, stage: str) -> None:
+        self._end_stage(job)
+        if stage != "done":
+            self._stage_started[job.id] = (
+                stage,
+                time.perf_counter(),
+                start_span(f"training_{stage}"),
+            )
+        job.stage = stage
+        job.progress = STAGE_PROGRESS[stage]
+        logger.info(f"Training job {job.id}: {stage}")
+
+    def _end_stage(self, job: TrainingJob, failed: bool = False) -> None:
+        started = self._stage_started.pop(job.id, None)
+        if started is not None:
+            stage, start, span = started
+            observe_stage(f"training_{stage}", time.perf_counter() - start, failed)
+            if span is not None:
+                span.error = job.error if failed else None
+                span.end()
+
+    def _raise_if_cancel_requested(self, job: TrainingJob) -> None:
+        if job.cancel_requested:
+            raise asyncio.CancelledError()
+
+    def _prune_finished_jobs(self) -> None:
+        finished = [job for job in self.list() if job.is_finished]
+        for job in finished[self.max_finished_jobs :]:
+            del self._jobs[job.id]
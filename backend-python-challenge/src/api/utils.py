@@ -1,16 +1,54 @@
-from io import BytesIO
-from typing import List
 from api.controllers.animals_controller import process_and_store_data
-from api.models.animal_data import AnimalData
+from api.dataset_formats import decode_dataset
+from api.executors import run_io
+from api.model_artifact import (
+    LEGACY_MODEL_NAME,
+    MODEL_ARTIFACT_NAME,
+    SURROGATE_MODEL_NAME,
+    encode_model_artifact,
+    load_model_artifact_from_minio,
+)
+from api.model_cache import MODEL_CACHE
+from api.object_cache import OBJECT_CACHE, CachedObject
+from api.single_flight import DATASET_GENERATIONS, minio_lock
+from config.minio_config import BUCKET_MODELS
+from config.settings import settings
+from machine_learning.models.analysis_result import AnalysisResult
 from minio import Minio
+from observability.metrics import stage_timer
+from observability.tracing import span
 import polars as ps
 import pickle
 import logging
-from datetime import datetime
+import json
+import io
+import time
 
 logger = logging.getLogger(__name__)
 
 
+# Leases of the datasets being generated, in the data bucket
+DATASET_LOCK_PREFIX = "_locks/"
+
+
+def read_dataset_from_minio(
+    minio_client: Minio, bucket_data: str, object_path: str
+) -> ps.DataFrame:
+    """
+    Reads and decodes a stored dataset from MinIO.
+
+    Args:
+        minio_client (Minio): The MinIO client instance.
+        bucket_data (str): The name of the MinIO bucket for data storage.
+        object_path (str): Path to the dataset within the bucket.
+
+    Returns:
+        ps.DataFrame: The stored dataset.
+    """
+    return decode_dataset(OBJECT_CACHE.read(minio_client, bucket_data, object_path))
+
+
+@span("get_data")
 async def get_data_from_minio_by_seed_and_number_datapoints(
     seed: int, number_of_datapoints: int, minio_client, bucket_data: str
 ) -> ps.DataFrame:
@@ -30,16 +68,21 @@ async def get_data_from_minio_by_seed_and_number_datapoints(
     object_path = f"{seed}-{number_of_datapoints}/animal_data.data"
     dataframe: ps.DataFrame = None
     try:
-        data = minio_client.get_object(bucket_data, object_path)
-        response_bytes = BytesIO(data.read())
-        dataframe = ps.read_csv(response_bytes)
+        dataframe = await run_io(
+            read_dataset_from_minio, minio_client, bucket_data, object_path
+        )
         logger.info(f"Data found in MinIO: {object_path}")
 
     except Exception as e:
         if "NoSuchKey" in str(e):
             logger.warning("Data not found in MinIO, generating new data...")
-            dataframe = await process_and_store_data(
-                minio_client, seed, number_of_datapoints
+            await generate_dataset_once(
+                minio_client, seed, number_of_datapoints, bucket_data, object_path
+            )
+            # The dataset is streamed to MinIO while it is generated, read it back
+            # in its compact stored form
+            dataframe = await run_io(
+                read_dataset_from_minio, minio_client, bucket_data, object_path
             )
         else:
             logger.error(f"Error fetching data from MinIO: {str(e)}")
@@ -47,11 +90,56 @@ async def get_data_from_minio_by_seed_and_number_datapoints(
     return dataframe
 
 
+async def generate_dataset_once(
+    minio_client: Minio,
+    seed: int,
+    number_of_datapoints: int,
+    bucket_data: str,
+    object_path: str,
+) -> None:
+    """
+    Generate and store a missing dataset, once for all the concurrent callers.
+    Callers of this worker share a single generation; across workers, a lease
+    object in MinIO lets one worker generate the dataset while the others wait
+    for it to be stored.
+    Args:
+        minio_client (Minio): The MinIO client.
+        seed (int): The seed for generating data.
+        number_of_datapoints (int): The number of datapoints to generate.
+        bucket_data (str): Bucket of the datasets.
+        object_path (str): Object path of the dataset.
+    """
+    key = f"{seed}-{number_of_datapoints}"
+
+    async def generate() -> None:
+        async with minio_lock(
+            minio_client,
+            bucket_data,
+            f"{DATASET_LOCK_PREFIX}{key}.lock",
+            timeout_seconds=settings.DATASET_LOCK_TIMEOUT_SECONDS,
+            ttl_seconds=settings.DATASET_LOCK_TTL_SECONDS,
+        ):
+            # Another worker may have stored it while this one was waiting
+            try:
+                await run_io(minio_client.stat_object, bucket_data, object_path)
+                logger.info(f"Data generated by another worker: {object_path}")
+                return
+            except Exception as e:
+                if "NoSuchKey" not in str(e):
+                    raise e
+            await process_and_store_data(minio_client, seed, number_of_datapoints)
+
+    await DATASET_GENERATIONS.do(key, generate)
+
+
 def get_model_deserialized_from_minio(
     minio_client: Minio, bucket: str, object_path: str
 ):
     """
     Deserialize a model from MinIO.
+    The pickle is read from the local object cache and the deserialized models are
+    kept in an in-memory LRU cache, both revalidated against the ETag of the object
+    so overwritten models are reloaded.
 
     Args:
         minio_client (Minio): Configured MinIO client.
@@ -63,13 +151,25 @@ def get_model_deserialized_from_minio(
     """
 
     try:
-        response_obj = minio_client.get_object(bucket, object_path)
-        model_bytes = response_obj.read()
+        if not MODEL_CACHE.needs_revalidation(object_path):
+            cached = MODEL_CACHE.get(object_path)
+            if cached is not None:
+                return cached
 
-        loaded = pickle.loads(model_bytes)
+        cached_object = OBJECT_CACHE.fetch(minio_client, bucket, object_path)
+        cached = MODEL_CACHE.get(object_path, cached_object.etag)
+        if cached is not None:
+            return cached
+
+        cached_object, f = OBJECT_CACHE.open_file(minio_client, cached_object)
+        with f, stage_timer("unpickle"):
+            loaded = pickle.load(f)
         model = loaded["model"]
         label_encoder = loaded["label_encoder"]
 
+        MODEL_CACHE.put(
+            object_path, cached_object.etag, (model, label_encoder), cached_object.size
+        )
         return model, label_encoder
     except Exception as e:
         if "NoSuchKey" in str(e):
@@ -80,34 +180,199 @@ def get_model_deserialized_from_minio(
             raise e
 
 
-def save_prediction_to_minio(
-    minio_client: Minio, bucket: str, model, result: List[AnimalData]
-):
+# Model objects found missing, by object path, with the time of the lookup: the
+# artifact of models trained by older versions, the surrogate of models without
+# one. They are looked up again after the revalidation delay of the model cache,
+# since retraining the model in another worker may write them
+_MISSING_MODEL_OBJECTS: dict[str, float] = {}
+
+
+def _known_missing(object_path: str) -> bool:
+    checked_at = _MISSING_MODEL_OBJECTS.get(object_path)
+    return (
+        checked_at is not None
+        and time.monotonic() - checked_at <= MODEL_CACHE.revalidate_seconds
+    )
+
+
+def get_model_from_minio(minio_client: Minio, bucket: str, model_key: str):
+    """
+    Load a model, memory-mapping its artifact if it has one, or unpickling the
+    model.pkl written by older versions otherwise. A missing artifact is
+    remembered, so loading a legacy model does not fail a lookup every time.
+    Args:
+        minio_client (Minio): Configured MinIO client.
+        bucket (str): Bucket where the model is stored.
+        model_key (str): Model, in the format 'seed-number_of_datapoints'.
+    Returns:
+        tuple: The model and its label encoder.
+    Raises:
+        FileNotFoundError: If the model does not exist in either format.
+    """
+    artifact_path = f"{model_key}/{MODEL_ARTIFACT_NAME}"
+    if not _known_missing(artifact_path):
+        try:
+            model = load_model_artifact_from_minio(minio_client, bucket, artifact_path)
+            _MISSING_MODEL_OBJECTS.pop(artifact_path, None)
+            return model
+        except FileNotFoundError:
+            _MISSING_MODEL_OBJECTS[artifact_path] = time.monotonic()
+    return get_model_deserialized_from_minio(
+        minio_client, bucket, f"{model_key}/{LEGACY_MODEL_NAME}"
+    )
+
+
+def get_model_file_from_minio(
+    minio_client: Minio, bucket: str, model_key: str
+) -> tuple[str, CachedObject]:
     """
-    Save the prediction result to MinIO.
+    Fetch the stored model into the local object cache, without loading it, to
+    load it in a worker process with load_model_file.
     Args:
         minio_client (Minio): Configured MinIO client.
-        bucket (str): Bucket where the prediction will be stored.
-        model: The model used for prediction.
-        result (List[AnimalData]): The prediction result to be saved.
+        bucket (str): Bucket where the model is stored.
+        model_key (str): Model, in the format 'seed-number_of_datapoints'.
+    Returns:
+        tuple: Object path of the model (artifact or legacy pickle) and its copy.
+    Raises:
+        FileNotFoundError: If the model does not exist in either format.
+    """
+    for name in (MODEL_ARTIFACT_NAME, LEGACY_MODEL_NAME):
+        object_path = f"{model_key}/{name}"
+        if _known_missing(object_path):
+            continue
+        try:
+            return object_path, OBJECT_CACHE.fetch(minio_client, bucket, object_path)
+        except Exception as e:
+            if "NoSuchKey" not in str(e):
+                raise e
+            if name == MODEL_ARTIFACT_NAME:
+                _MISSING_MODEL_OBJECTS[object_path] = time.monotonic()
+    raise FileNotFoundError(f"Model not found in MinIO: {model_key}")
+
+
+def get_surrogate_from_minio(minio_client: Minio, bucket: str, model_key: str):
+    """
+    Load the distilled fast-path tree of a model. A model without one is
+    remembered, so its fast predictions do not fail a lookup every time.
+    Args:
+        minio_client (Minio): Configured MinIO client.
+        bucket (str): Bucket where the model is stored.
+        model_key (str): Model, as 'seed-number_of_datapoints'.
+    Returns:
+        tuple: The compiled tree and the label encoder of the model.
+    Raises:
+        FileNotFoundError: If the model has no surrogate.
     """
-    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    object_path = f"{now}/prediction.data"
+    surrogate_path = f"{model_key}/{SURROGATE_MODEL_NAME}"
+    if _known_missing(surrogate_path):
+        raise FileNotFoundError(f"Model {model_key} has no surrogate")
     try:
-        # Convert the result to a DataFrame and save it as a CSV in memory
-        df = ps.DataFrame(result)
-        csv_buffer = BytesIO()
-        df.write_csv(csv_buffer)
-        csv_buffer.seek(0)
+        surrogate = get_model_deserialized_from_minio(
+            minio_client, bucket, surrogate_path
+        )
+    except FileNotFoundError:
+        _MISSING_MODEL_OBJECTS[surrogate_path] = time.monotonic()
+        raise
+    _MISSING_MODEL_OBJECTS.pop(surrogate_path, None)
+    return surrogate
+
+
+def save_metrics_as_json(
+    result: AnalysisResult, path: str, minio_client: Minio, bucket: str
+):
+    """
+    Save evaluation metrics as a JSON file in MinIO.
+
+    Args:
+        result (AnalysisResult): Object containing model results.
+        path (str): Path within the bucket (e.g., '123-500/metrics.json').
+        minio_client (Minio): Configured MinIO client.
+        bucket (str): Bucket where the file will be saved.
+    """
 
-        # Upload the CSV to MinIO
+    # Convertir a dict y serializar
+    data = result.model_dump(exclude={"model"})
+    json_bytes = json.dumps(data, indent=4).encode("utf-8")
+    buffer = io.BytesIO(json_bytes)
+
+    with stage_timer("minio_put"):
         minio_client.put_object(
             bucket,
-            object_path,
-            csv_buffer,
-            len(csv_buffer.getvalue()),
-            content_type="text/csv",
+            path,
+            buffer,
+            length=len(json_bytes),
+            content_type="application/json",
         )
-    except Exception as e:
-        logger.error(f"Error saving prediction to MinIO: {str(e)}")
-        raise e
+
+
+def store_trained_model(
+    minio_client: Minio,
+    seed: int,
+    number_of_datapoints: int,
+    results: AnalysisResult,
+    label_encoder,
+) -> dict:
+    """
+    Store a trained model and its metrics in MinIO.
+    Args:
+        minio_client (Minio): Configured MinIO client.
+        seed (int): Seed the training data was generated with.
+        number_of_datapoints (int): Number of data points of the training data.
+        results (AnalysisResult): Object containing the model and its results.
+        label_encoder (LabelEncoder): Label encoder used for the target variable.
+    Returns:
+        dict: Summary of the metrics of the model.
+    """
+    # Guardar el modelo
+    model_buffer = encode_model_artifact(results.model, label_encoder)
+
+    initial_path = f"{seed}-{number_of_datapoints}"
+    model_path = f"{initial_path}/{MODEL_ARTIFACT_NAME}"
+    metrics_path = f"{initial_path}/metrics.json"
+
+    with stage_timer("minio_put"):
+        minio_client.put_object(
+            BUCKET_MODELS,
+            model_path,
+            model_buffer,
+            len(model_buffer.getvalue()),
+        )
+    # Drop the previous version of the model from the in-memory caches
+    for name in (MODEL_ARTIFACT_NAME, SURROGATE_MODEL_NAME):
+        _MISSING_MODEL_OBJECTS.pop(f"{initial_path}/{name}", None)
+    MODEL_CACHE.invalidate(initial_path)
+    OBJECT_CACHE.invalidate(BUCKET_MODELS, f"{initial_path}/")
+
+    # The surrogate of the previous version would not match the new model
+    surrogate_path = f"{initial_path}/{SURROGATE_MODEL_NAME}"
+    if results.surrogate_model is not None:
+        with stage_timer("pickle"):
+            surrogate_bytes = pickle.dumps(
+                {"model": results.surrogate_model, "label_encoder": label_encoder}
+            )
+        with stage_timer("minio_put"):
+            minio_client.put_object(
+                BUCKET_MODELS,
+                surrogate_path,
+                io.BytesIO(surrogate_bytes),
+                len(surrogate_bytes),
+            )
+    else:
+        minio_client.remove_object(BUCKET_MODELS, surrogate_path)
+
+    # Guardar las métricas
+    save_metrics_as_json(results, metrics_path, minio_client, BUCKET_MODELS)
+
+    return {
+        "accuracy": results.accuracy,
+        "precision": results.precision,
+        "recall": results.recall,
+        "f1": results.f1,
+        "confusion_matrix": results.confusion_matrix,
+        "training_mode": results.training_mode,
+        "training_rows": results.training_rows,
+        "fidelity": results.fidelity,
+        "warm_start_from": results.warm_start_from,
+        "surrogate": results.surrogate,
+    }
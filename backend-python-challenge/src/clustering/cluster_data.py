@@ -1,7 +1,89 @@
+import operator
+
+import numpy as np
 from sklearn.cluster import KMeans
 import polars as pl
 
 
+DEFAULT_LABEL = "outlier"
+
+# Ordered labeling rules. Each rule is a label and the conditions, as
+# (column, operator, value), that must all hold; the first matching rule wins
+# and rows matching none of them get DEFAULT_LABEL. Null values never match.
+LABELING_RULES: list[tuple[str, list[tuple[str, str, object]]]] = [
+    ("chicken", [("walks_on_n_legs", "==", 2), ("has_wings", "==", True)]),
+    ("kangaroo", [("walks_on_n_legs", "==", 2)]),
+    ("elephant", [("walks_on_n_legs", "==", 4), ("weight", ">", 150)]),
+    ("dog", [("walks_on_n_legs", "==", 4)]),
+]
+
+RULE_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+def _rule_columns(
+    rules: list[tuple[str, list[tuple[str, str, object]]]],
+) -> dict[str, pl.DataType]:
+    """
+    Types of the columns read by the rules, to build them from dictionaries.
+    Numbers are read as floats, so no value is truncated (2.5 legs is not 2 and
+    150.7 kg is over 150), and columns compared with booleans follow the Python
+    truthiness of their values.
+    """
+    columns = {}
+    for _, conditions in rules:
+        for column, _, value in conditions:
+            columns[column] = pl.Boolean if isinstance(value, bool) else pl.Float64
+    return columns
+
+
+def build_label_expression(
+    rules: list[tuple[str, list[tuple[str, str, object]]]] = LABELING_RULES,
+    default_label: str = DEFAULT_LABEL,
+) -> pl.Expr:
+    """
+    Builds a single when/then expression that evaluates the labeling rules in order.
+    Args:
+        rules (list): Ordered labeling rules, see LABELING_RULES.
+        default_label (str): Label of the rows that match no rule.
+    Returns:
+        pl.Expr: Expression producing the 'label' column.
+    """
+    expression = pl
+    for label, conditions in rules:
+        condition = pl.lit(True)
+        for column, op, value in conditions:
+            condition = condition & RULE_OPERATORS[op](pl.col(column), value)
+        expression = expression.when(condition).then(pl.lit(label))
+
+    if expression is pl:
+        return pl.lit(default_label).alias("label")
+    return expression.otherwise(pl.lit(default_label)).alias("label")
+
+
+def label_dataframe(
+    data: pl.DataFrame | dict[str, np.ndarray],
+    rules: list[tuple[str, list[tuple[str, str, object]]]] = LABELING_RULES,
+) -> pl.DataFrame:
+    """
+    Assigns labels to animals in a single columnar pass.
+    Args:
+        data (pl.DataFrame | dict[str, np.ndarray]): Animal data as a DataFrame or
+            as one array per column.
+        rules (list): Ordered labeling rules, see LABELING_RULES.
+    Returns:
+        pl.DataFrame: The data with an added (or replaced) 'label' column.
+    """
+    df = data if isinstance(data, pl.DataFrame) else pl.DataFrame(data)
+    return df.with_columns(build_label_expression(rules))
+
+
 def label_dataset_no_clustering(data: list[dict]) -> list[dict]:
     """
     Assigns labels to animals based on their characteristics.
@@ -15,35 +97,30 @@ def label_dataset_no_clustering(data: list[dict]) -> list[dict]:
         - else → dog
     En cualquier otro caso → outlier
 
+    The rules are defined in LABELING_RULES; prefer label_dataframe for large
+    datasets, which avoids going through Python dictionaries. Only the columns
+    read by the rules are built, with explicit types instead of types inferred
+    from the first rows, and a missing or null value matches no rule.
 
     Args:
         data (list[dict]): List of dictionaries containing animal data.
 
     Returns:
-        list[dict]: List of dictionaries with assigned labels.
+        list[dict]: The same dictionaries, with their 'label' key set.
     """
-    labeled_data = []
-
-    for item in data:
-        label = "outlier"
-
-        if item.get("walks_on_n_legs") == 2:
-            if item.get("has_wings"):
-                label = "chicken"
-            else:
-                label = "kangaroo"
-
-        elif item.get("walks_on_n_legs") == 4:
-            if item.get("weight", 0) > 150:
-                label = "elephant"
-            else:
-                label = "dog"
-
-        # Agregamos la etiqueta al item
+    if not data:
+        return []
+    columns = {}
+    for column, dtype in _rule_columns(LABELING_RULES).items():
+        values = [item.get(column) for item in data]
+        if dtype == pl.Boolean:
+            values = [None if value is None else bool(value) for value in values]
+        # Values that are not numbers become null instead of failing the batch
+        columns[column] = pl.Series(column, values, dtype=dtype, strict=False)
+    labels = label_dataframe(pl.DataFrame(columns))["label"].to_list()
+    for item, label in zip(data, labels, strict=True):
         item["label"] = label
-        labeled_data.append(item)
-
-    return labeled_data
+    return data
 
 
 def label_dataset_with_clustering_polars(data: list[dict]) -> list[dict]:
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,6 +16,85 @@ class Settings(BaseSettings):
     # External API
     DATA_SERVICE_URL: str = "http://data_service:8777"
 
+    # Datasets
+    DATASET_FORMAT: str = "parquet"
+    INGEST_CHUNK_ROWS: int = 100_000
+    INGEST_PART_SIZE: int = 16 * 1024 * 1024
+    INGEST_MAX_BUFFERED_BLOCKS: int = 8
+    # Lease held in MinIO by the worker generating a dataset
+    DATASET_LOCK_TTL_SECONDS: float = 60.0
+    DATASET_LOCK_TIMEOUT_SECONDS: float = 3600.0
+
+    # Async object store (connection pool size, requests in flight, retries)
+    STORAGE_MAX_CONCURRENCY: int = 16
+    STORAGE_RETRIES: int = 3
+    STORAGE_RETRY_BACKOFF_SECONDS: float = 0.2
+    STORAGE_TIMEOUT_SECONDS: float = 30.0
+
+    # Executors (None means one worker per CPU core)
+    IO_EXECUTOR_WORKERS: int = 32
+    COMPUTE_EXECUTOR_WORKERS: Optional[int] = None
+    CPU_EXECUTOR_WORKERS: Optional[int] = None
+
+    # Training jobs
+    TRAINING_MAX_CONCURRENT_JOBS: int = 1
+    TRAINING_SEARCH_HALVING: bool = False
+    # 'full', 'subsample', or 'auto' to subsample above TRAINING_SUBSAMPLE_MIN_ROWS
+    TRAINING_MODE: str = "auto"
+    TRAINING_SUBSAMPLE_MIN_ROWS: int = 200_000
+    TRAINING_SEARCH_ROWS: int = 20_000
+    TRAINING_KNN_ROWS: int = 25_000
+    TRAINING_FIDELITY_ROWS: int = 25_000
+    # 'hard' (majority) or 'soft' (mean probability) voting of the ensemble members
+    TRAINING_VOTING: str = "hard"
+    # Reuse the hyperparameters of a smaller model of the same seed, if it has at
+    # least this fraction of the data points, instead of searching them again.
+    # Default of the warm_start parameter of /train
+    TRAINING_WARM_START: bool = False
+    TRAINING_WARM_START_MIN_RATIO: float = 0.25
+    # Distill a shallow tree served by /predict?mode=fast, kept if it agrees with
+    # the model on at least TRAINING_DISTILL_MIN_AGREEMENT of the test rows
+    TRAINING_DISTILL: bool = True
+    TRAINING_DISTILL_MAX_DEPTH: int = 8
+    TRAINING_DISTILL_MIN_AGREEMENT: float = 0.99
+    TRAINING_DISTILL_ROWS: int = 50_000
+
+    # Validation (rows predicted at once, confidence level of the bootstrap CIs)
+    VALIDATION_CHUNK_ROWS: int = 100_000
+    VALIDATION_CONFIDENCE: float = 0.95
+
+    # Prediction log
+    PREDICTION_LOG_FLUSH_ROWS: int = 10_000
+    PREDICTION_LOG_FLUSH_SECONDS: float = 5.0
+    PREDICTION_LOG_MAX_BUFFERED_ROWS: int = 1_000_000
+    PREDICTION_LOG_COMPACTION_SECONDS: float = 600.0
+    PREDICTION_LOG_COMPACTION_MIN_FILES: int = 8
+
+    # Model cache
+    MODEL_CACHE_MAX_ITEMS: int = 16
+    MODEL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    MODEL_CACHE_REVALIDATE_SECONDS: float = 5.0
+
+    # Model registry (manifest of the trained models)
+    MODEL_REGISTRY_REVALIDATE_SECONDS: float = 5.0
+
+    # Local disk cache of MinIO objects (datasets, model artifacts, predictions)
+    OBJECT_CACHE_DIR: str = "/tmp/mpc-object-cache"
+    OBJECT_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    OBJECT_CACHE_REVALIDATE_SECONDS: float = 5.0
+
+    # Prediction micro-batching
+    PREDICT_MICRO_BATCHING: bool = False
+    PREDICT_BATCH_MAX_ROWS: int = 1024
+    PREDICT_BATCH_WAIT_MS: float = 5.0
+
+    # Tracing (proportion of the requests and jobs traced, 0 disables it; spans
+    # are kept in memory for /api/v1/system/traces or appended to TRACING_FILE)
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_EXPORTER: str = "memory"
+    TRACING_MEMORY_SPANS: int = 10_000
+    TRACING_FILE: str = "/tmp/mpc-traces.jsonl"
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -1,19 +1,33 @@
+import logging
+from typing import Optional
+
+import numpy as np
 import polars as ps
 from sklearn.calibration import LabelEncoder
 from sklearn.discriminant_analysis import StandardScaler
-from sklearn.ensemble import VotingClassifier
+from sklearn.metrics import accuracy_score
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 
 from .models.analysis_result import AnalysisResult
+from .estimators import (
+    SharedScalingVotingClassifier,
+    SubsampledClassifier,
+    make_scalable_svc,
+)
+from .search import make_learner, search_hyperparameters
 from .machine_learning_functions import (
     evaluate_model,
     prepare_data_for_machine_learning,
+    split_data,
+    stratified_subsample_indices,
     train_model_with_grid_search,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def classify_data_using_knn(
     dataframe: ps.DataFrame,
@@ -45,67 +59,156 @@ def classify_data_using_knn(
 
 def classify_data_using_hard_voting(
     dataframe: ps.DataFrame,
+    halving: bool = False,
+    best_params: Optional[dict] = None,
+    voting: str = "hard",
 ) -> tuple[AnalysisResult, LabelEncoder]:
     """ "
     Function to classify data using hard voting with KNN, Decision Tree, and SVC classifiers.
     For this specific case, this is too much, but it is a good example of how to use the hard voting classifier.
     Args:
         dataframe (DataFrame): DataFrame containing the animal data.
+        halving (bool): Prune bad hyperparameters early with successive halving.
+        best_params (Optional[dict]): Hyperparameters of each learner to use
+            instead of searching them, e.g. those of a previous model.
+        voting (str): 'hard' or 'soft' (averaged probabilities) voting.
     Returns:
-        AnalysisResult: Object containing model results.
+        AnalysisResult: Object containing model results, with the best
+            hyperparameters of each learner in best_params.
         LabelEncoder: Label encoder used for encoding the target variable.
 
     """
 
     X, y, label_encoder = prepare_data_for_machine_learning(dataframe)
-    # KNN Classifier
-    grid_knn = {
-        "model__n_neighbors": [3, 5, 7],
-        "model__weights": ["uniform", "distance"],
-        "model__metric": ["euclidean", "cosine"],
-    }
-    pipeline_knn = Pipeline(
-        [("scaler", StandardScaler()), ("model", KNeighborsClassifier())]
-    )
 
-    knn_model, _ = train_model_with_grid_search(X, y, pipeline_knn, grid_knn)
+    search_rows = 0
+    if best_params is None:
+        # Search the hyperparameters of the three learners on shared, pre-scaled folds
+        search_results = search_hyperparameters(X, y, halving=halving)
+        best_params = {
+            learner: result.best_params for learner, result in search_results.items()
+        }
+        search_rows = len(X)
 
-    # Decision Tree Classifier
-    grid_dtc = {
-        "model__criterion": ["gini", "entropy"],
-        "model__max_depth": [3, 5],
-        "model__min_samples_split": [2, 4],
-    }
+    training_rows = len(split_data(X, y)[0])
 
-    pipeline_dtc = Pipeline(
-        [("scaler", StandardScaler()), ("model", DecisionTreeClassifier())]
-    )
-    dtc_model, _ = train_model_with_grid_search(X, y, pipeline_dtc, grid_dtc)
+    # Hard Voting Classifier
+    estimators = [
+        ("knn", make_learner("knn", best_params["knn"], n_rows=training_rows)),
+        ("dtc", DecisionTreeClassifier(**best_params["dtc"])),
+        ("svc", SVC(**best_params["svc"], probability=voting == "soft")),
+    ]
 
-    # SVC Classifier
-    grid_svc = {
-        "model__C": [0.1, 1],
-        "model__kernel": ["linear", "rbf"],
-        "model__gamma": [0.01, 0.1],
-    }
+    pipeline = _build_voting_pipeline(estimators, voting)
 
-    pipeline_svc = Pipeline([("scaler", StandardScaler()), ("model", SVC())])
+    result = evaluate_model(pipeline, X, y)
+    result.best_params = best_params
+    result.training_mode = "full"
+    result.training_rows = training_rows
+    result.search_rows = search_rows
+    return result, label_encoder
 
-    svc_model, _ = train_model_with_grid_search(X, y, pipeline_svc, grid_svc)
 
-    # Hard Voting Classifier
-    estimators = [
-        ("knn", knn_model.named_steps["model"]),
-        ("dtc", dtc_model.named_steps["model"]),
-        ("svc", svc_model.named_steps["model"]),
-    ]
+def _build_voting_pipeline(
+    estimators: list, voting: str = "hard"
+) -> SharedScalingVotingClassifier:
+    return SharedScalingVotingClassifier(estimators=estimators, voting=voting)
 
-    pipeline = Pipeline(
+
+def classify_data_using_subsampling(
+    dataframe: ps.DataFrame,
+    search_rows: int = 20_000,
+    knn_rows: int = 25_000,
+    fidelity_rows: int = 25_000,
+    halving: bool = False,
+    best_params: Optional[dict] = None,
+    voting: str = "hard",
+) -> tuple[AnalysisResult, LabelEncoder]:
+    """
+    Hard voting classifier for datasets too large for an exact KNN and SVC.
+
+    The hyperparameters are searched on a stratified sample of search_rows rows.
+    The final ensemble is then trained on the whole train split with scalable
+    substitutes: the KNN only keeps a stratified sample of knn_rows rows and the
+    SVC is replaced by an SGD linear SVM (with a Nystroem feature map for the RBF
+    kernel). The decision tree is trained on all the rows.
+
+    Fidelity is measured against the exact ensemble (KNN and SVC with the same
+    hyperparameters) trained on up to fidelity_rows rows, which is the full-data
+    model when the train split is not larger than that. Both are compared on the
+    same test split.
+    Args:
+        dataframe (DataFrame): DataFrame containing the animal data.
+        search_rows (int): Rows used for the hyperparameter search.
+        knn_rows (int): Rows kept by the KNN of the final model.
+        fidelity_rows (int): Rows used to train the exact reference model.
+        halving (bool): Prune bad hyperparameters early with successive halving.
+        best_params (Optional[dict]): Hyperparameters of each learner to use
+            instead of searching them, e.g. those of a previous model.
+        voting (str): 'hard' or 'soft' voting. With soft voting, the SGD
+            substitute of the SVC votes with a one-hot probability.
+    Returns:
+        AnalysisResult: Object containing model results and fidelity metrics.
+        LabelEncoder: Label encoder used for encoding the target variable.
+    """
+    X, y, label_encoder = prepare_data_for_machine_learning(dataframe)
+    # Same split as evaluate_model, so the test rows are never seen by the search
+    X_train, X_test, y_train, y_test = split_data(X, y)
+
+    search_sample = []
+    if best_params is None:
+        search_sample = stratified_subsample_indices(y_train, search_rows)
+        search_results = search_hyperparameters(
+            X_train[search_sample], y_train[search_sample], halving=halving
+        )
+        best_params = {
+            learner: result.best_params for learner, result in search_results.items()
+        }
+
+    pipeline = _build_voting_pipeline(
         [
-            ("scaler", StandardScaler()),
-            ("voting", VotingClassifier(estimators=estimators, voting="hard")),
-        ]
+            (
+                "knn",
+                SubsampledClassifier(
+                    make_learner(
+                        "knn",
+                        best_params["knn"],
+                        n_rows=min(len(X_train), knn_rows),
+                    ),
+                    max_rows=knn_rows,
+                ),
+            ),
+            ("dtc", DecisionTreeClassifier(**best_params["dtc"])),
+            ("svc", make_scalable_svc(best_params["svc"], len(X_train))),
+        ],
+        voting,
     )
-
     result = evaluate_model(pipeline, X, y)
+    y_pred = result.model.predict(X_test)
+
+    # Exact reference model, on a sample if the train split is too large
+    reference_sample = stratified_subsample_indices(y_train, fidelity_rows)
+    reference = _build_voting_pipeline(
+        [
+            ("knn", make_learner("knn", {**best_params["knn"], "index": "exact"})),
+            ("dtc", DecisionTreeClassifier(**best_params["dtc"])),
+            ("svc", SVC(**best_params["svc"], probability=voting == "soft")),
+        ],
+        voting,
+    )
+    reference.fit(X_train[reference_sample], y_train[reference_sample])
+    y_reference = reference.predict(X_test)
+    reference_accuracy = accuracy_score(y_test, y_reference)
+
+    result.best_params = best_params
+    result.training_mode = "subsample"
+    result.training_rows = len(X_train)
+    result.search_rows = len(search_sample)
+    result.fidelity = {
+        "reference_rows": float(len(reference_sample)),
+        "agreement": float(np.mean(y_pred == y_reference)),
+        "reference_accuracy": float(reference_accuracy),
+        "accuracy_delta": float(result.accuracy - reference_accuracy),
+    }
+    logger.info(f"Subsample training fidelity: {result.fidelity}")
     return result, label_encoder
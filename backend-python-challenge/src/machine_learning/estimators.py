@@ -0,0 +1,211 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm._base import BaseLibSVM
+
+from .machine_learning_functions import stratified_subsample_indices
+
+# Below this number of rows, the members of a voting ensemble predict one after
+# the other: handing them to threads costs more than it saves
+PARALLEL_PREDICT_MIN_ROWS = 2_000
+
+# Threads running the members of the voting ensembles, shared by every ensemble
+# of the process and created on first use
+_member_pool: Optional[ThreadPoolExecutor] = None
+_member_pool_lock = threading.Lock()
+
+
+def _get_member_pool() -> ThreadPoolExecutor:
+    global _member_pool
+    with _member_pool_lock:
+        if _member_pool is None:
+            _member_pool = ThreadPoolExecutor(thread_name_prefix="voting-member")
+        return _member_pool
+
+
+class SubsampledClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Fits the wrapped classifier on a stratified sample of at most max_rows rows.
+    Used for learners whose fit or predict cost grows too fast with the number of
+    rows, such as KNN, when the rest of an ensemble is trained on the full data.
+    """
+
+    def __init__(self, estimator=None, max_rows: int = 100_000, random_state=42):
+        self.estimator = estimator
+        self.max_rows = max_rows
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        rows = stratified_subsample_indices(y, self.max_rows, self.random_state)
+        self.estimator_ = clone(self.estimator).fit(X[rows], y[rows])
+        self.classes_ = self.estimator_.classes_
+        self.n_training_rows_ = len(rows)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.estimator_.predict(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.estimator_.predict_proba(X)
+
+
+class SharedScalingVotingClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Voting ensemble whose members share one standardized feature matrix.
+
+    Replaces a Pipeline of a StandardScaler and a VotingClassifier: the features
+    are scaled once per call and the members are fitted, and predict batches of
+    at least PARALLEL_PREDICT_MIN_ROWS rows, in the threads of a pool shared by
+    the process, on the same matrix. With hard voting the predicted class is the
+    most voted one; with soft voting it is the class with the highest mean
+    probability. predict_proba is available in both modes, as the mean
+    probabilities of the members with soft voting. With hard voting it returns
+    the share of the members that voted for each class (e.g. 2/3 and 1/3), not a
+    calibrated probability. A member without predict_proba (such as a hinge-loss
+    SGD) votes with a one-hot probability.
+    """
+
+    def __init__(
+        self,
+        estimators: Optional[list] = None,
+        voting: str = "hard",
+        n_jobs: Optional[int] = None,
+    ):
+        """
+        Args:
+            estimators (Optional[list]): (name, estimator) pairs of the members.
+            voting (str): 'hard' or 'soft'.
+            n_jobs (Optional[int]): Maximum number of members running at once,
+                defaults to all of them. 1 runs them one after the other.
+        """
+        self.estimators = estimators
+        self.voting = voting
+        self.n_jobs = n_jobs
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # libsvm's predict_proba takes writable views of these small arrays, copy
+        # them out of a read-only memory-mapped artifact (the support vectors
+        # stay shared)
+        for estimator in state.get("estimators_", []):
+            if isinstance(estimator, BaseLibSVM) and estimator.probability:
+                for name in ("_dual_coef_", "_intercept_", "_probA", "_probB"):
+                    setattr(estimator, name, np.array(getattr(estimator, name)))
+
+    def fit(self, X, y):
+        if self.voting not in ("hard", "soft"):
+            raise ValueError(f"Unsupported voting '{self.voting}'")
+        self.scaler_ = StandardScaler().fit(X)
+        X = self.scaler_.transform(X)
+        self.classes_ = np.unique(y)
+        self.estimators_ = self._map(
+            lambda estimator: clone(estimator).fit(X, y),
+            [estimator for _, estimator in self.estimators],
+        )
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Args:
+            X: Features array, not scaled.
+        Returns:
+            np.ndarray: Mean probabilities of the members with soft voting, share
+            of the members' votes with hard voting, one column per class.
+        """
+        X = self.scaler_.transform(X)
+        parallel = len(X) >= PARALLEL_PREDICT_MIN_ROWS
+        if self.voting == "soft":
+            member_probabilities = self._map(
+                lambda estimator: self._member_proba(estimator, X),
+                self.estimators_,
+                parallel=parallel,
+            )
+            return np.mean(member_probabilities, axis=0)
+
+        votes = self._map(
+            lambda estimator: np.searchsorted(self.classes_, estimator.predict(X)),
+            self.estimators_,
+            parallel=parallel,
+        )
+        probabilities = np.zeros((len(X), len(self.classes_)))
+        for member_votes in votes:
+            probabilities[np.arange(len(X)), member_votes] += 1
+        return probabilities / len(self.estimators_)
+
+    def predict(self, X) -> np.ndarray:
+        # On a tie, the first class wins, as with VotingClassifier
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _member_proba(self, estimator, X: np.ndarray) -> np.ndarray:
+        probabilities = np.zeros((len(X), len(self.classes_)))
+        if hasattr(estimator, "predict_proba"):
+            columns = np.searchsorted(self.classes_, estimator.classes_)
+            probabilities[:, columns] = estimator.predict_proba(X)
+        else:
+            predicted = np.searchsorted(self.classes_, estimator.predict(X))
+            probabilities[np.arange(len(X)), predicted] = 1.0
+        return probabilities
+
+    def _map(self, func: Callable, estimators: list, parallel: bool = True) -> list:
+        n_jobs = min(self.n_jobs or len(estimators), len(estimators))
+        if not parallel or n_jobs <= 1:
+            return [func(estimator) for estimator in estimators]
+        # At most n_jobs members are submitted at once, the others wait for them
+        pool = _get_member_pool()
+        results = []
+        for start in range(0, len(estimators), n_jobs):
+            batch = [
+                pool.submit(func, estimator)
+                for estimator in estimators[start : start + n_jobs]
+            ]
+            results.extend(future.result() for future in batch)
+        return results
+
+
+def make_scalable_svc(
+    params: dict, n_rows: int, n_components: int = 300, random_state: int = 42
+):
+    """
+    Build a linear-time substitute of an SVC with the given hyperparameters.
+    A linear kernel becomes a hinge-loss SGDClassifier whose regularization matches
+    C; an RBF kernel is approximated with a Nystroem feature map followed by the
+    same SGDClassifier.
+    Args:
+        params (dict): SVC hyperparameters (C, kernel, gamma).
+        n_rows (int): Number of training rows, used to translate C into alpha.
+        n_components (int): Dimension of the Nystroem feature map.
+        random_state (int): Seed of the SGD and Nystroem sampling.
+    Returns:
+        The estimator, SGDClassifier or Pipeline.
+    """
+    sgd = SGDClassifier(
+        loss="hinge",
+        alpha=1.0 / (params.get("C", 1.0) * max(n_rows, 1)),
+        max_iter=20,
+        tol=1e-4,
+        random_state=random_state,
+    )
+    if params.get("kernel", "rbf") == "linear":
+        return sgd
+
+    gamma = params.get("gamma", "scale")
+    return Pipeline(
+        [
+            (
+                "features",
+                Nystroem(
+                    gamma=None if gamma == "scale" else gamma,
+                    n_components=min(n_components, max(n_rows, 1)),
+                    random_state=random_state,
+                ),
+            ),
+            ("model", sgd),
+        ]
+    )
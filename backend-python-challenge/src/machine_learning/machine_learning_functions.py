@@ -16,11 +16,13 @@ from sklearn.pipeline import Pipeline
 
 
 from machine_learning.models.analysis_result import AnalysisResult
+from observability.metrics import stage_timer
 
 
 logger = logging.getLogger(__name__)
 
 
+@stage_timer("prepare_data_for_prediction")
 def prepare_data_for_prediction(df: ps.DataFrame) -> np.ndarray:
     """
     Prepares the DataFrame for prediction by applying the same transformations
@@ -38,6 +40,7 @@ def prepare_data_for_prediction(df: ps.DataFrame) -> np.ndarray:
     return X
 
 
+@stage_timer("prepare_data_for_machine_learning")
 def prepare_data_for_machine_learning(
     df: ps.DataFrame,
 ) -> tuple[np.ndarray, np.ndarray, LabelEncoder]:
@@ -95,6 +98,26 @@ def split_data(X, y, test_size: float = 0.2, random_state: int = 42) -> tuple:
     return X_train, X_test, y_train, y_test
 
 
+def stratified_subsample_indices(
+    y: np.ndarray, n_rows: int, random_state: int = 42
+) -> np.ndarray:
+    """
+    Select a stratified sample of rows, keeping the class proportions.
+    Args:
+        y (np.ndarray): Target variable.
+        n_rows (int): Maximum number of rows of the sample.
+        random_state (int): Random seed for reproducibility.
+    Returns:
+        np.ndarray: Indices of the selected rows, all of them if n_rows >= len(y).
+    """
+    if n_rows >= len(y):
+        return np.arange(len(y))
+    indices, _ = train_test_split(
+        np.arange(len(y)), train_size=n_rows, random_state=random_state, stratify=y
+    )
+    return np.sort(indices)
+
+
 def train_model_with_grid_search(
     X: np.ndarray,
     y: np.ndarray,
@@ -130,8 +153,10 @@ def evaluate_model(
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y
     )
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+    with stage_timer("model_fit"):
+        model.fit(X_train, y_train)
+    with stage_timer("model_evaluate"):
+        y_pred = model.predict(X_test)
 
     acc = accuracy_score(y_test, y_pred)
     prec = precision_score(y_test, y_pred, average="weighted")
@@ -14,5 +14,40 @@ class AnalysisResult(BaseModel):
     confusion_matrix: Optional[List[List[int]]] = Field(
         None, description="Confusion matrix as a nested list"
     )
+    classes: Optional[List[str]] = Field(
+        None, description="Labels of the rows and columns of the confusion matrix"
+    )
+    validation_rows: Optional[int] = Field(
+        None, description="Number of rows a stored model was validated on"
+    )
+    confidence_intervals: Optional[Dict[str, List[float]]] = Field(
+        None, description="Bootstrap confidence interval (low, high) of each metric"
+    )
+    training_mode: Optional[str] = Field(
+        None, description="'full' or 'subsample', see classify_data_using_subsampling"
+    )
+    training_rows: Optional[int] = Field(
+        None, description="Number of rows the final model was trained on"
+    )
+    search_rows: Optional[int] = Field(
+        None, description="Number of rows the hyperparameter search used"
+    )
+    warm_start_from: Optional[str] = Field(
+        None,
+        description="Model whose hyperparameters were reused instead of searched",
+    )
+    fidelity: Optional[Dict[str, float]] = Field(
+        None,
+        description=(
+            "Agreement of a subsample-trained model with an exact reference model"
+        ),
+    )
+
+    surrogate: Optional[Dict[str, float]] = Field(
+        None,
+        description="Agreement, depth and leaves of the distilled fast-path tree",
+    )
 
     model: Optional[Any] = Field(None, exclude=True)  # not to be serialized
+    # Distilled tree served with mode=fast, None if it did not agree enough
+    surrogate_model: Optional[Any] = Field(None, exclude=True)
@@ -0,0 +1,249 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.cluster import MiniBatchKMeans
+
+# Arrays of a fitted index, written as one .npy file each so they can be mmapped
+INDEX_ARRAYS = (
+    "centroids_",
+    "list_offsets_",
+    "vectors_",
+    "sq_norms_",
+    "labels_",
+    "quant_min_",
+    "quant_scale_",
+    "classes_",
+)
+INDEX_METADATA = "index.json"
+INDEX_FORMAT_VERSION = 1
+
+STORAGE_DTYPES = {"float32": np.float32, "uint8": np.uint8}
+
+
+class ApproximateKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest neighbors classifier backed by an inverted file (IVF) index.
+
+    The training rows are grouped by their nearest centroid of a coarse k-means
+    quantizer and stored contiguously per list, as float32 or as uint8 codes with
+    a per-feature scale. A query is only compared with the rows of the n_probe
+    lists whose centroids are closest to it, instead of every training row, so the
+    predict cost no longer grows linearly with the training set.
+
+    The fitted arrays can be written with save() and loaded back memory-mapped
+    with load(), so several processes share the same pages.
+    """
+
+    def __init__(
+        self,
+        n_neighbors: int = 5,
+        weights: str = "uniform",
+        metric: str = "euclidean",
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        storage: str = "float32",
+        query_batch_size: int = 4096,
+        random_state: int = 42,
+    ):
+        """
+        Args:
+            n_neighbors (int): Number of neighbors that vote.
+            weights (str): 'uniform' or 'distance', as in KNeighborsClassifier.
+            metric (str): 'euclidean', 'cosine' or 'manhattan'.
+            n_lists (Optional[int]): Number of lists of the index. Defaults to the
+                square root of the number of training rows.
+            n_probe (int): Number of lists searched per query.
+            storage (str): 'float32' or 'uint8' (scalar-quantized) vectors.
+            query_batch_size (int): Queries processed at once, bounds memory usage.
+            random_state (int): Seed of the quantizer.
+        """
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.storage = storage
+        self.query_batch_size = query_batch_size
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        if self.metric not in ("euclidean", "cosine", "manhattan"):
+            raise ValueError(f"Unsupported metric '{self.metric}'")
+        if self.storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported storage '{self.storage}'")
+
+        X = self._transform(np.asarray(X, dtype=np.float32))
+        self.classes_, labels = np.unique(y, return_inverse=True)
+
+        n_lists = self.n_lists or int(np.sqrt(len(X)))
+        n_lists = max(1, min(n_lists, len(X)))
+        quantizer = MiniBatchKMeans(
+            n_clusters=n_lists,
+            n_init=1,
+            batch_size=min(len(X), 4096),
+            random_state=self.random_state,
+        ).fit(X)
+        assignments = quantizer.labels_
+
+        order = np.argsort(assignments, kind="stable")
+        self.centroids_ = quantizer.cluster_centers_.astype(np.float32)
+        self.list_offsets_ = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]
+        ).astype(np.int64)
+        self.labels_ = labels[order].astype(np.int32)
+
+        X = X[order]
+        if self.storage == "uint8":
+            self.quant_min_ = X.min(axis=0)
+            self.quant_scale_ = np.maximum(
+                (X.max(axis=0) - self.quant_min_) / 255, np.float32(1e-12)
+            ).astype(np.float32)
+            self.vectors_ = np.clip(
+                np.rint((X - self.quant_min_) / self.quant_scale_), 0, 255
+            ).astype(np.uint8)
+            X = self._decode(self.vectors_)
+        else:
+            self.quant_min_ = np.zeros(X.shape[1], dtype=np.float32)
+            self.quant_scale_ = np.ones(X.shape[1], dtype=np.float32)
+            self.vectors_ = X
+        self.sq_norms_ = np.einsum("ij,ij->i", X, X)
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        probabilities = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), self.query_batch_size):
+            batch = slice(start, start + self.query_batch_size)
+            probabilities[batch] = self._vote(*self._search(X[batch]))
+        return probabilities
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path: str) -> None:
+        """
+        Write the fitted index to a directory, one .npy file per array.
+        Args:
+            path (str): Directory, created if needed.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, INDEX_METADATA), "w") as f:
+            json.dump(
+                {"format_version": INDEX_FORMAT_VERSION, "params": self.get_params()}, f
+            )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ApproximateKNeighborsClassifier":
+        """
+        Load an index written by save().
+        Args:
+            path (str): Directory of the index.
+            mmap (bool): Map the arrays read-only instead of reading them.
+        Returns:
+            ApproximateKNeighborsClassifier: The fitted classifier.
+        """
+        with open(os.path.join(path, INDEX_METADATA)) as f:
+            metadata = json.load(f)
+        if metadata["format_version"] != INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported index format version {metadata['format_version']}"
+            )
+        model = cls(**metadata["params"])
+        for name in INDEX_ARRAYS:
+            setattr(
+                model,
+                name,
+                np.load(
+                    os.path.join(path, f"{name}.npy"),
+                    # classes_ is tiny and may hold strings, read it normally
+                    mmap_mode="r" if mmap and name != "classes_" else None,
+                    allow_pickle=name == "classes_",
+                ),
+            )
+        return model
+
+    def _transform(self, X: np.ndarray) -> np.ndarray:
+        if self.metric == "cosine":
+            # On unit vectors the euclidean ranking is the cosine ranking
+            norms = np.linalg.norm(X, axis=1, keepdims=True)
+            return X / np.maximum(norms, np.float32(1e-12))
+        return X
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.storage == "uint8":
+            return codes.astype(np.float32) * self.quant_scale_ + self.quant_min_
+        return codes
+
+    def _distances(
+        self, queries: np.ndarray, vectors: np.ndarray, sq_norms: np.ndarray
+    ) -> np.ndarray:
+        if self.metric == "manhattan":
+            return np.abs(queries[:, None, :] - vectors[None, :, :]).sum(axis=2)
+        sq = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * queries @ vectors.T
+            + sq_norms[None, :]
+        )
+        return np.sqrt(np.maximum(sq, 0))
+
+    def _search(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Find the approximate neighbors of a batch of queries."""
+        X = self._transform(X)
+        k = self.n_neighbors
+        best_distances = np.full((len(X), k), np.inf, dtype=np.float32)
+        best_labels = np.zeros((len(X), k), dtype=np.int32)
+
+        # Lists to probe for every query
+        n_probe = min(self.n_probe, len(self.centroids_))
+        centroid_distances = self._distances(
+            X, self.centroids_, np.einsum("ij,ij->i", self.centroids_, self.centroids_)
+        )
+        probes = np.argpartition(centroid_distances, n_probe - 1, axis=1)[:, :n_probe]
+
+        # Visit each list once, with all the queries that probe it
+        query_index = np.repeat(np.arange(len(X)), n_probe)
+        list_index = probes.ravel()
+        by_list = np.argsort(list_index, kind="stable")
+        query_index, list_index = query_index[by_list], list_index[by_list]
+        bounds = np.searchsorted(list_index, np.arange(len(self.centroids_) + 1))
+
+        for list_id in range(len(self.centroids_)):
+            queries = query_index[bounds[list_id] : bounds[list_id + 1]]
+            start, end = self.list_offsets_[list_id], self.list_offsets_[list_id + 1]
+            if len(queries) == 0 or start == end:
+                continue
+
+            vectors = self._decode(np.asarray(self.vectors_[start:end]))
+            distances = self._distances(X[queries], vectors, self.sq_norms_[start:end])
+            labels = np.broadcast_to(self.labels_[start:end], distances.shape)
+
+            # Merge the candidates of this list with the best ones found so far
+            distances = np.concatenate([best_distances[queries], distances], axis=1)
+            labels = np.concatenate([best_labels[queries], labels], axis=1)
+            keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            best_distances[queries] = np.take_along_axis(distances, keep, axis=1)
+            best_labels[queries] = np.take_along_axis(labels, keep, axis=1)
+
+        return best_distances, best_labels
+
+    def _vote(self, distances: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        found = np.isfinite(distances)
+        if self.weights == "distance":
+            with np.errstate(divide="ignore"):
+                weights = np.where(found, 1.0 / distances, 0.0)
+            # Exact matches take all the weight, like KNeighborsClassifier
+            exact = distances == 0
+            has_exact = exact.any(axis=1)
+            weights[has_exact] = exact[has_exact]
+        else:
+            weights = found.astype(np.float64)
+
+        votes = np.zeros((len(labels), len(self.classes_)))
+        np.add.at(votes, (np.arange(len(labels))[:, None], labels), weights)
+        totals = votes.sum(axis=1, keepdims=True)
+        return votes / np.where(totals == 0, 1, totals)
@@ -6,8 +6,57 @@ from .machine_learning_functions import (
     scale_data,
 )
 from sklearn.preprocessing import LabelEncoder
+import numpy as np
 import polars as ps
 
+from observability.metrics import stage_timer
+
+
+def animals_to_features(data: List[AnimalData]) -> np.ndarray:
+    """
+    Build the features array of a list of animals.
+    Args:
+        data (List[AnimalData]): List of AnimalData objects.
+    Returns:
+        np.ndarray: Features array for prediction.
+    """
+    # Transform data to DataFrame
+    df = ps.DataFrame(
+        [animal.dict(exclude={"label", "probabilities"}) for animal in data]
+    )
+
+    # Prepare features for prediction
+    return prepare_data_for_prediction(df)
+
+
+def predict_labels(X: np.ndarray, model, label_encoder: LabelEncoder) -> np.ndarray:
+    """
+    Predict the decoded labels of a features array.
+    Args:
+        X (np.ndarray): Features array.
+        model: Trained machine learning model.
+        label_encoder (LabelEncoder): Label encoder for decoding labels.
+    Returns:
+        np.ndarray: Predicted labels.
+    """
+    with stage_timer("model_predict"):
+        y_pred = model.predict(X)
+    return label_encoder.inverse_transform(y_pred)
+
+
+def predict_frame(df: ps.DataFrame, model, label_encoder: LabelEncoder) -> np.ndarray:
+    """
+    Predict the decoded labels of a DataFrame of features, without going through
+    AnimalData objects. Used for bulk predictions.
+    Args:
+        df (ps.DataFrame): Features of the animals, one row per animal.
+        model: Trained machine learning model.
+        label_encoder (LabelEncoder): Label encoder for decoding labels.
+    Returns:
+        np.ndarray: Predicted labels.
+    """
+    return predict_labels(prepare_data_for_prediction(df), model, label_encoder)
+
 
 def predict(
     data: List[AnimalData], model, label_encoder: LabelEncoder
@@ -21,23 +70,70 @@ def predict(
     Returns:
         List[AnimalData]: List of AnimalData objects with predicted labels.
     """
-    # Transform data to DataFrame
-    df = ps.DataFrame(
-        [
-            {key: value for key, value in animal.dict().items() if key != "label"}
-            for animal in data
-        ]
-    )
-
-    # Prepare features for prediction
-    X = prepare_data_for_prediction(df)
+    X = animals_to_features(data)
 
     # Predict using the model
-    y_pred = model.predict(X)
-    labels = label_encoder.inverse_transform(y_pred)
+    labels = predict_labels(X, model, label_encoder)
 
     # Add labels to the original data
     for animal, label in zip(data, labels):
         animal.label = label
 
     return data
+
+
+def supports_probabilities(model) -> bool:
+    """
+    Args:
+        model: Trained machine learning model.
+    Returns:
+        bool: Whether the model scores every class, models trained before the
+        voting ensemble shared its scaling do not.
+    """
+    return hasattr(model, "predict_proba")
+
+
+def attach_probabilities(
+    data: List[AnimalData],
+    probabilities: np.ndarray,
+    model,
+    label_encoder: LabelEncoder,
+) -> List[AnimalData]:
+    """
+    Set the label and the class probabilities of each animal from the
+    probabilities predicted by the model.
+    Args:
+        data (List[AnimalData]): Animals, in the same order as the rows of
+            probabilities.
+        probabilities (np.ndarray): Output of model.predict_proba.
+        model: Trained machine learning model.
+        label_encoder (LabelEncoder): Label encoder for decoding labels.
+    Returns:
+        List[AnimalData]: The animals with their labels and probabilities.
+    """
+    classes = [str(label) for label in label_encoder.inverse_transform(model.classes_)]
+    best = np.argmax(probabilities, axis=1)
+    for animal, row, label_index in zip(
+        data, probabilities.tolist(), best, strict=True
+    ):
+        animal.label = classes[label_index]
+        animal.probabilities = dict(zip(classes, row, strict=True))
+    return data
+
+
+def predict_with_probabilities(
+    data: List[AnimalData], model, label_encoder: LabelEncoder
+) -> List[AnimalData]:
+    """
+    Predict the labels and the class probabilities of the given animal data.
+    Args:
+        data (List[AnimalData]): List of AnimalData objects to predict.
+        model: Trained machine learning model, with predict_proba.
+        label_encoder (LabelEncoder): Label encoder for decoding labels.
+    Returns:
+        List[AnimalData]: The animals with their labels and probabilities.
+    """
+    X = animals_to_features(data)
+    with stage_timer("model_predict_proba"):
+        probabilities = model.predict_proba(X)
+    return attach_probabilities(data, probabilities, model, label_encoder)
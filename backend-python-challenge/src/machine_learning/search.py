@@ -0,0 +1,332 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from observability.metrics import observe_stage
+from observability.tracing import span
+
+from .neighbors import ApproximateKNeighborsClassifier
+
+logger = logging.getLogger(__name__)
+
+
+# Base learners of the voting classifier and their hyperparameter grids
+LEARNERS = {
+    "knn": KNeighborsClassifier(),
+    "dtc": DecisionTreeClassifier(),
+    "svc": SVC(),
+}
+
+# Neighbor search backends of the KNN learner
+KNN_INDEXES = {
+    "exact": KNeighborsClassifier(),
+    "ivf": ApproximateKNeighborsClassifier(),
+}
+
+# Training rows from which the KNN uses the IVF index. Below, a brute-force search
+# is as fast and the lists of the index hold too few rows to be accurate
+KNN_IVF_MIN_ROWS = 20_000
+
+PARAM_GRIDS = {
+    "knn": {
+        "n_neighbors": [3, 5, 7],
+        "weights": ["uniform", "distance"],
+        "metric": ["euclidean", "cosine"],
+    },
+    "dtc": {
+        "criterion": ["gini", "entropy"],
+        "max_depth": [3, 5],
+        "min_samples_split": [2, 4],
+    },
+    "svc": {
+        "C": [0.1, 1],
+        "kernel": ["linear", "rbf"],
+        "gamma": [0.01, 0.1],
+    },
+}
+
+
+def select_knn_index(n_rows: int) -> str:
+    """
+    Args:
+        n_rows (int): Number of rows the KNN is fitted on.
+    Returns:
+        str: The neighbor search backend to use, a key of KNN_INDEXES.
+    """
+    return "ivf" if n_rows >= KNN_IVF_MIN_ROWS else "exact"
+
+
+def make_learner(learner: str, params: dict, n_rows: Optional[int] = None):
+    """
+    Build an unfitted learner with the given hyperparameters.
+    Args:
+        learner (str): Name of the learner, a key of LEARNERS.
+        params (dict): Hyperparameters. For the KNN, an 'index' entry forces the
+            neighbor search backend in KNN_INDEXES.
+        n_rows (Optional[int]): Number of rows the learner is fitted on, which
+            selects the KNN backend (exact if unknown).
+    Returns:
+        The estimator.
+    """
+    params = dict(params)
+    if learner == "knn":
+        index = params.pop("index", None)
+        if index is None:
+            index = select_knn_index(n_rows) if n_rows is not None else "exact"
+        base = KNN_INDEXES[index]
+    else:
+        base = LEARNERS[learner]
+    return clone(base).set_params(**params)
+
+
+def is_valid_best_params(best_params: Any) -> bool:
+    """
+    Check that hyperparameters stored with a model can be reused as they are.
+    Args:
+        best_params: The best_params of a stored model.
+    Returns:
+        bool: True if they hold one dict per learner, with parameters of
+        PARAM_GRIDS only (models of older versions used other names).
+    """
+    if not isinstance(best_params, dict) or set(best_params) != set(LEARNERS):
+        return False
+    return all(
+        isinstance(params, dict) and set(params) <= set(PARAM_GRIDS[learner])
+        for learner, params in best_params.items()
+    )
+
+
+@dataclass
+class Fold:
+    """Train and validation matrices of a CV fold, scaled with the train rows."""
+
+    X_train: np.ndarray
+    y_train: np.ndarray
+    X_val: np.ndarray
+    y_val: np.ndarray
+    # Order in which the train rows are used when a candidate gets fewer rows
+    subsample_order: np.ndarray
+
+
+@dataclass
+class SearchResult:
+    """Outcome of the search of one learner."""
+
+    best_params: dict[str, Any]
+    best_score: float
+    # One entry per evaluated (candidate, resources): params, n_rows, mean_score
+    cv_results: list[dict[str, Any]] = field(default_factory=list)
+
+
+def expand_grid(param_grid: dict[str, list]) -> list[dict[str, Any]]:
+    """
+    Args:
+        param_grid (dict): Values to try for each parameter.
+    Returns:
+        list[dict]: Every combination of the values, like sklearn's ParameterGrid.
+    """
+    keys = sorted(param_grid)
+    return [
+        dict(zip(keys, values, strict=True))
+        for values in product(*(param_grid[k] for k in keys))
+    ]
+
+
+def build_folds(
+    X: np.ndarray, y: np.ndarray, cv: int = 5, random_state: int = 42
+) -> list[Fold]:
+    """
+    Split the data in stratified folds and scale each of them once.
+    The scaled matrices are shared by every candidate of every learner instead of
+    refitting a StandardScaler per candidate and fold, as GridSearchCV does with a
+    scaling pipeline.
+    Args:
+        X (np.ndarray): Features array.
+        y (np.ndarray): Encoded target.
+        cv (int): Number of folds.
+        random_state (int): Seed of the fold split and of the subsampling order.
+    Returns:
+        list[Fold]: The scaled folds.
+    """
+    rng = np.random.default_rng(random_state)
+    splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    folds = []
+    for train_index, val_index in splitter.split(X, y):
+        scaler = StandardScaler().fit(X[train_index])
+        folds.append(
+            Fold(
+                X_train=scaler.transform(X[train_index]),
+                y_train=y[train_index],
+                X_val=scaler.transform(X[val_index]),
+                y_val=y[val_index],
+                subsample_order=rng.permutation(len(train_index)),
+            )
+        )
+    return folds
+
+
+def _fit_and_score(
+    learner: str, params: dict, fold: Fold, n_rows: int, scoring: str
+) -> tuple[float, float]:
+    """Returns the score and the duration of the fit, timed in the joblib worker."""
+    start = time.perf_counter()
+    rows = fold.subsample_order[:n_rows]
+    X_train, y_train = fold.X_train[rows], fold.y_train[rows]
+    if len(np.unique(y_train)) < 2:
+        # Not enough rows to see two classes, the candidate cannot be fitted
+        return -np.inf, time.perf_counter() - start
+    estimator = make_learner(learner, params, n_rows=len(rows))
+    estimator.fit(X_train, y_train)
+    score = get_scorer(scoring)(estimator, fold.X_val, fold.y_val)
+    return score, time.perf_counter() - start
+
+
+def _rung_resources(
+    n_rows: int, n_candidates: int, factor: int, min_resources: int
+) -> list[int]:
+    """Number of train rows per fold used at each rung of successive halving."""
+    n_rungs = max(1, math.ceil(math.log(max(n_candidates, 1), factor)) + 1)
+    resources = [
+        max(min_resources, n_rows // factor ** (n_rungs - 1 - rung))
+        for rung in range(n_rungs)
+    ]
+    return sorted(set(min(r, n_rows) for r in resources))
+
+
+@span("search_hyperparameters")
+def search_hyperparameters(
+    X: np.ndarray,
+    y: np.ndarray,
+    param_grids: Optional[dict[str, dict[str, list]]] = None,
+    scoring: str = "accuracy",
+    cv: int = 5,
+    n_jobs: int = -1,
+    halving: bool = False,
+    factor: int = 3,
+    min_resources: int = 100,
+    random_state: int = 42,
+) -> dict[str, SearchResult]:
+    """
+    Search the hyperparameters of several learners at once.
+
+    Folds are computed and scaled once and shared by all candidates. All
+    (learner, candidate, fold) fits are scheduled on a single joblib pool, so the
+    slow learners do not leave workers idle as with one GridSearchCV per learner.
+
+    With halving, every candidate is first evaluated on a subsample of the train
+    rows of each fold; only the best 1/factor of each learner's candidates are
+    evaluated again with factor times more rows, until the full folds are used.
+    Args:
+        X (np.ndarray): Features array, not scaled.
+        y (np.ndarray): Encoded target.
+        param_grids (dict): Grid per learner name. Defaults to PARAM_GRIDS.
+        scoring (str): sklearn scorer name.
+        cv (int): Number of folds.
+        n_jobs (int): Number of joblib workers, -1 for all cores.
+        halving (bool): Use successive halving instead of an exhaustive search.
+        factor (int): Proportion of candidates kept at each halving rung.
+        min_resources (int): Train rows per fold of the first halving rung.
+        random_state (int): Seed of the folds.
+    Returns:
+        dict[str, SearchResult]: Result of the search, by learner name.
+    """
+    param_grids = param_grids or PARAM_GRIDS
+    start = time.perf_counter()
+    folds = build_folds(X, y, cv=cv, random_state=random_state)
+    n_train_rows = min(len(fold.y_train) for fold in folds)
+
+    candidates = {learner: expand_grid(grid) for learner, grid in param_grids.items()}
+    if halving:
+        n_max = max(len(c) for c in candidates.values())
+        resources = _rung_resources(n_train_rows, n_max, factor, min_resources)
+    else:
+        resources = [n_train_rows]
+
+    cv_results: dict[str, list[dict]] = {learner: [] for learner in candidates}
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung, n_rows in enumerate(resources):
+            tasks = [
+                (learner, index, fold_index)
+                for learner, learner_candidates in candidates.items()
+                for index in range(len(learner_candidates))
+                for fold_index in range(len(folds))
+            ]
+            fold_scores: dict[tuple[str, int], list[float]] = {}
+            # The fits run in joblib workers, the rung span sums their durations
+            with span(
+                "search_rung", rung=rung, n_rows=n_rows, fits=len(tasks)
+            ) as active:
+                scores = parallel(
+                    delayed(_fit_and_score)(
+                        learner,
+                        candidates[learner][index],
+                        folds[fold_index],
+                        n_rows,
+                        scoring,
+                    )
+                    for learner, index, fold_index in tasks
+                )
+
+                fit_seconds: dict[str, float] = {}
+                for (learner, index, _), (score, seconds) in zip(
+                    tasks, scores, strict=True
+                ):
+                    fold_scores.setdefault((learner, index), []).append(score)
+                    fit_seconds[learner] = fit_seconds.get(learner, 0.0) + seconds
+                    observe_stage(f"search_fit_{learner}", seconds)
+                if active is not None:
+                    for learner, seconds in fit_seconds.items():
+                        active.set_attribute(
+                            f"fit_seconds_{learner}", round(seconds, 3)
+                        )
+
+            is_last_rung = rung == len(resources) - 1
+            for learner, learner_candidates in candidates.items():
+                ranked = sorted(
+                    range(len(learner_candidates)),
+                    key=lambda i: np.mean(fold_scores[(learner, i)]),
+                    reverse=True,
+                )
+                for index in ranked:
+                    cv_results[learner].append(
+                        {
+                            "params": learner_candidates[index],
+                            "n_rows": n_rows,
+                            "mean_score": float(np.mean(fold_scores[(learner, index)])),
+                        }
+                    )
+                if not is_last_rung:
+                    keep = max(1, math.ceil(len(ranked) / factor))
+                    candidates[learner] = [learner_candidates[i] for i in ranked[:keep]]
+                else:
+                    candidates[learner] = [learner_candidates[i] for i in ranked]
+
+    results = {}
+    for learner, learner_candidates in candidates.items():
+        best = cv_results[learner][-len(learner_candidates)]
+        results[learner] = SearchResult(
+            best_params=best["params"],
+            best_score=best["mean_score"],
+            cv_results=cv_results[learner],
+        )
+        logger.info(
+            f"Best {learner} params: {best['params']} (score {best['mean_score']:.4f})"
+        )
+    logger.info(
+        f"Hyperparameter search of {list(candidates)} done in "
+        f"{time.perf_counter() - start:.1f}s over {len(resources)} rung(s)"
+    )
+    return results
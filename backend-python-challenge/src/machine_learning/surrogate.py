@@ -0,0 +1,123 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import polars as ps
+from sklearn.tree import DecisionTreeClassifier
+
+from observability.metrics import stage_timer
+
+from .machine_learning_functions import (
+    prepare_data_for_machine_learning,
+    split_data,
+    stratified_subsample_indices,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledTreeClassifier:
+    """
+    Decision tree flattened into NumPy arrays.
+
+    Prediction walks all the rows down the tree at once, one vectorized
+    comparison per level, with no scaler and no sklearn overhead. It predicts the
+    same encoded classes as the model it was distilled from.
+    """
+
+    def __init__(self, tree: DecisionTreeClassifier):
+        """
+        Args:
+            tree (DecisionTreeClassifier): Fitted tree, trained on unscaled features.
+        """
+        nodes = tree.tree_
+        self.feature = nodes.feature.astype(np.int64)
+        self.threshold = nodes.threshold.astype(np.float64)
+        self.left = nodes.children_left.astype(np.int64)
+        self.right = nodes.children_right.astype(np.int64)
+        self.is_leaf = self.left == -1
+        # Leaves point to themselves, so rows that reached one stay there
+        self.left[self.is_leaf] = np.flatnonzero(self.is_leaf)
+        self.right[self.is_leaf] = np.flatnonzero(self.is_leaf)
+        self.feature[self.is_leaf] = 0
+        # The node values are the class fractions that predict_proba returns
+        # (scikit-learn >= 1.4), normalizing them again changes their last bit
+        self.leaf_proba = nodes.value[:, 0, :]
+        self.leaf_class = tree.classes_[np.argmax(self.leaf_proba, axis=1)]
+        self.classes_ = tree.classes_
+        self.depth = int(tree.get_depth())
+        self.n_leaves = int(tree.get_n_leaves())
+
+    def predict(self, X) -> np.ndarray:
+        return self.leaf_class[self._leaves(X)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.leaf_proba[self._leaves(X)]
+
+    def _leaves(self, X) -> np.ndarray:
+        # sklearn compares float32 features with the float64 thresholds, a row
+        # next to a threshold takes another branch as float64
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))
+        node = np.zeros(len(X), dtype=np.int64)
+        for _ in range(self.depth):
+            goes_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(goes_left, self.left[node], self.right[node])
+        return node
+
+
+@stage_timer("distill")
+def distill_model(
+    dataframe: ps.DataFrame,
+    model,
+    max_depth: int = 8,
+    min_agreement: float = 0.99,
+    max_rows: int = 50_000,
+) -> tuple[Optional[CompiledTreeClassifier], dict]:
+    """
+    Fit a shallow decision tree that imitates a trained model.
+    The tree learns the predictions of the model (not the true labels) on rows of
+    the train split, and its agreement with the model is measured on rows of the
+    test split used by evaluate_model. Depths are tried from 1 to max_depth and
+    the shallowest tree reaching min_agreement is kept.
+    Args:
+        dataframe (ps.DataFrame): Training data of the model.
+        model: The trained model.
+        max_depth (int): Maximum depth of the tree.
+        min_agreement (float): Agreement with the model required to keep the tree.
+        max_rows (int): Rows labeled by the model, for the train and the test
+            split each.
+    Returns:
+        tuple: The compiled tree, or None if no depth reaches min_agreement, and a
+        summary with the agreement, depth and number of leaves of the best tree.
+    """
+    X, y, _ = prepare_data_for_machine_learning(dataframe)
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    X_train = X_train[stratified_subsample_indices(y_train, max_rows)]
+    X_test = X_test[stratified_subsample_indices(y_test, max_rows)]
+    teacher_train = model.predict(X_train)
+    teacher_test = model.predict(X_test)
+
+    best, best_agreement = None, -1.0
+    for depth in range(1, max_depth + 1):
+        tree = DecisionTreeClassifier(max_depth=depth, random_state=42)
+        compiled = CompiledTreeClassifier(tree.fit(X_train, teacher_train))
+        agreement = float(np.mean(compiled.predict(X_test) == teacher_test))
+        if agreement > best_agreement:
+            best, best_agreement = compiled, agreement
+        if agreement >= min_agreement:
+            break
+
+    summary = {
+        "agreement": best_agreement,
+        "depth": float(best.depth),
+        "n_leaves": float(best.n_leaves),
+        "test_rows": float(len(X_test)),
+    }
+    if best_agreement < min_agreement:
+        logger.info(
+            f"Surrogate discarded, agreement {best_agreement:.4f} < {min_agreement}"
+        )
+        return None, summary
+    logger.info(f"Surrogate kept: {summary}")
+    return best, summary
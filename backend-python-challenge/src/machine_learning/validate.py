@@ -1,24 +1,186 @@
-from .machine_learning_functions import (
-    evaluate_model,
-    prepare_data_for_machine_learning,
-    scale_data,
-)
-from machine_learning.models.analysis_result import AnalysisResult
+import numpy as np
 import polars as ps
+from sklearn.preprocessing import LabelEncoder
+
+from .machine_learning_functions import prepare_data_for_prediction
+from machine_learning.models.analysis_result import AnalysisResult
+from observability.metrics import stage_timer
 
 
-def validate(dataframe: ps.DataFrame, model) -> AnalysisResult:
+def validation_classes(
+    dataframe: ps.DataFrame, label_encoder: LabelEncoder
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Classes of the confusion matrix of a validation.
+    Args:
+        dataframe (ps.DataFrame): Labeled validation data, without outliers.
+        label_encoder (LabelEncoder): Label encoder of the model.
+    Returns:
+        tuple: The sorted classes (those of the model, plus the labels of the data
+        the model does not know, which it never predicts) and the position in them
+        of each encoded class of the model.
     """
-    Validate the model using the provided dataframe and model.
+    classes = np.union1d(label_encoder.classes_, dataframe["label"].unique().to_numpy())
+    return classes, np.searchsorted(classes, label_encoder.classes_)
 
+
+def score_chunk(
+    model,
+    dataframe: ps.DataFrame,
+    classes: np.ndarray,
+    model_class_index: np.ndarray,
+    chunk_rows: int = 100_000,
+) -> np.ndarray:
+    """
+    Predict labeled rows and count their (true, predicted) pairs. The rows are
+    predicted chunk_rows at a time, so memory stays bounded by the chunk size.
     Args:
-        dataframe (pd.DataFrame): The input data for validation.
-        model: The trained model to be validated.
+        model: The trained model.
+        dataframe (ps.DataFrame): Labeled rows, without outliers.
+        classes (np.ndarray): Classes of the confusion matrix, see validation_classes.
+        model_class_index (np.ndarray): Position of each model class in classes.
+        chunk_rows (int): Rows predicted at once.
+    Returns:
+        np.ndarray: Confusion matrix of the rows.
+    """
+    n_classes = len(classes)
+    cm = np.zeros((n_classes, n_classes), dtype=np.int64)
+    for offset in range(0, dataframe.height, chunk_rows):
+        chunk = dataframe.slice(offset, chunk_rows)
+        y_true = np.searchsorted(classes, chunk["label"].to_numpy())
+        X = prepare_data_for_prediction(chunk)
+        with stage_timer("validate_predict"):
+            y_pred = model_class_index[model.predict(X)]
+        cm += np.bincount(
+            y_true * n_classes + y_pred, minlength=n_classes * n_classes
+        ).reshape(n_classes, n_classes)
+    return cm
 
+
+def metrics_from_confusion_matrix(cm: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Compute the metrics of one or several confusion matrices, with the same
+    definitions as sklearn (weighted averages over the true classes, 0 when a
+    class is never predicted).
+    Args:
+        cm (np.ndarray): Confusion matrix (classes x classes) or a stack of them
+            (n x classes x classes); rows are true classes, columns predictions.
     Returns:
-        AnalysisResult: The result of the validation process.
+        dict[str, np.ndarray]: accuracy, precision, recall and f1, one value per matrix.
     """
-    X, y, _ = prepare_data_for_machine_learning(dataframe)
-    X_scaled = scale_data(X)
+    cm = np.asarray(cm, dtype=np.float64)
+    true_positives = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    total = np.maximum(support.sum(axis=-1), 1)
+    weights = support / total[..., None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(
+            precision + recall > 0,
+            2 * precision * recall / (precision + recall),
+            0.0,
+        )
+    return {
+        "accuracy": true_positives.sum(axis=-1) / total,
+        "precision": (weights * precision).sum(axis=-1),
+        "recall": (weights * recall).sum(axis=-1),
+        "f1": (weights * f1).sum(axis=-1),
+    }
 
-    return evaluate_model(model, X_scaled, y)
+
+def bootstrap_confidence_intervals(
+    cm: np.ndarray,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    random_state: int = 42,
+) -> dict[str, list[float]]:
+    """
+    Percentile bootstrap confidence intervals of the metrics.
+    The metrics only depend on the confusion matrix, so resampling the rows with
+    replacement is the same as drawing the cells of the matrix from a multinomial
+    distribution: the intervals cost O(n_resamples * classes^2) whatever the
+    number of validation rows.
+    Args:
+        cm (np.ndarray): Confusion matrix of the validation data.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        random_state (int): Seed of the resampling.
+    Returns:
+        dict[str, list[float]]: Lower and upper bound of each metric.
+    """
+    rng = np.random.default_rng(random_state)
+    total = int(cm.sum())
+    resamples = rng.multinomial(
+        total, cm.ravel() / max(total, 1), size=n_resamples
+    ).reshape(n_resamples, *cm.shape)
+    alpha = (1 - confidence) / 2
+    return {
+        metric: [float(bound) for bound in np.quantile(values, [alpha, 1 - alpha])]
+        for metric, values in metrics_from_confusion_matrix(resamples).items()
+    }
+
+
+def summarize_validation(
+    cm: np.ndarray,
+    classes: np.ndarray,
+    bootstrap: int = 0,
+    confidence: float = 0.95,
+) -> AnalysisResult:
+    """
+    Args:
+        cm (np.ndarray): Confusion matrix of the whole validation data.
+        classes (np.ndarray): Classes of the confusion matrix.
+        bootstrap (int): Number of bootstrap resamples for the confidence
+            intervals of the metrics, 0 to skip them.
+        confidence (float): Confidence level of the intervals.
+    Returns:
+        AnalysisResult: The metrics of the validation.
+    """
+    metrics = {
+        metric: float(value)
+        for metric, value in metrics_from_confusion_matrix(cm).items()
+    }
+    confidence_intervals = None
+    if bootstrap > 0:
+        confidence_intervals = bootstrap_confidence_intervals(
+            cm, n_resamples=bootstrap, confidence=confidence
+        )
+    return AnalysisResult(
+        **metrics,
+        confusion_matrix=cm.astype(int).tolist(),
+        classes=[str(label) for label in classes],
+        validation_rows=int(cm.sum()),
+        confidence_intervals=confidence_intervals,
+    )
+
+
+def validate(
+    dataframe: ps.DataFrame,
+    model,
+    label_encoder: LabelEncoder,
+    chunk_rows: int = 100_000,
+    bootstrap: int = 0,
+    confidence: float = 0.95,
+) -> AnalysisResult:
+    """
+    Score a trained model on a dataset, without refitting it. The API spreads
+    score_chunk over the process pool instead, see validate_controller.
+    Args:
+        dataframe (ps.DataFrame): Labeled validation data.
+        model: The trained model.
+        label_encoder (LabelEncoder): Label encoder of the model.
+        chunk_rows (int): Rows predicted at once.
+        bootstrap (int): Number of bootstrap resamples for the confidence
+            intervals of the metrics, 0 to skip them.
+        confidence (float): Confidence level of the intervals.
+    Returns:
+        AnalysisResult: The metrics of the model on the dataset. The rows and
+        columns of the confusion matrix follow the order of classes.
+    """
+    dataframe = dataframe.filter(ps.col("label") != "outlier")
+    classes, model_class_index = validation_classes(dataframe, label_encoder)
+    cm = score_chunk(model, dataframe, classes, model_class_index, chunk_rows)
+    return summarize_validation(cm, classes, bootstrap, confidence)
@@ -0,0 +1,450 @@
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from observability.tracing import Span, start_span
+
+# Upper bounds of the stage duration buckets, in seconds: from sub-millisecond
+# feature preparation to multi-minute trainings
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+# Keys of the stats() dicts of the API components that are current levels rather
+# than running totals; the other numeric keys are exported as counters
+GAUGE_KEYS = {
+    "items",
+    "bytes",
+    "max_items",
+    "max_bytes",
+    "in_flight",
+    "active",
+    "queue_depth",
+    "max_workers",
+    "max_concurrency",
+    "buffered_rows",
+    "models",
+    "avg_batch_requests",
+    "avg_fill_ratio",
+    "sample_rate",
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricFamily:
+    """Samples of one metric, in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        """
+        Args:
+            name (str): Name of the metric.
+            metric_type (str): 'counter', 'gauge' or 'histogram'.
+            help_text (str): Description of the metric.
+        """
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: list[tuple[str, dict, float]] = []
+
+    def add(self, value: float, suffix: str = "", **labels) -> None:
+        self.samples.append((self.name + suffix, labels, value))
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines += [
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in self.samples
+        ]
+        return "\n".join(lines)
+
+
+class _Metric:
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, "
+                f"got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key, strict=True))
+
+
+class Counter(_Metric):
+    """Running total, such as a number of errors."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "counter", self.help_text)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                family.add(value, **self._labels(key))
+        return family
+
+
+class Gauge(_Metric):
+    """Current level, such as a number of jobs in flight."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "gauge", self.help_text)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                family.add(value, **self._labels(key))
+        return family
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, counted in cumulative buckets."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (the last one is +Inf), sum
+        self._values: dict[tuple, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or (
+                [0] * (len(self.buckets) + 1),
+                0.0,
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, "histogram", self.help_text)
+        with self._lock:
+            values = sorted((key, (list(c), s)) for key, (c, s) in self._values.items())
+        for key, (counts, total) in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts, strict=True):
+                cumulative += count
+                family.add(cumulative, "_bucket", **labels, le=_format_value(bound))
+            family.add(total, "_sum", **labels)
+            family.add(cumulative, "_count", **labels)
+        return family
+
+
+class MetricsRegistry:
+    """Metrics of the process, rendered together by /metrics."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(
+        self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect(self) -> list[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect() for metric in metrics]
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "mpc_stage_duration_seconds",
+    "Duration of the processing stages of the API.",
+    ["stage"],
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "mpc_stage_errors_total", "Processing stages that raised an error.", ["stage"]
+)
+STAGE_MISSES = REGISTRY.counter(
+    "mpc_stage_misses_total",
+    "Processing stages that found nothing, such as a missing object.",
+    ["stage"],
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "mpc_http_request_duration_seconds",
+    "Duration of the HTTP requests, by route and status code.",
+    ["method", "route", "status"],
+)
+
+# Stages observed by the current task of a worker process, see capture_stages
+_captured: Optional[list[tuple[str, float, bool, bool]]] = None
+
+
+def observe_stage(
+    stage: str, seconds: float, failed: bool = False, missed: bool = False
+) -> None:
+    """
+    Record the duration of a stage.
+    Args:
+        stage (str): Name of the stage.
+        seconds (float): Its duration.
+        failed (bool): Whether it raised an error.
+        missed (bool): Whether it found nothing, an expected outcome that is
+            not counted as an error.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if failed:
+        STAGE_ERRORS.inc(stage=stage)
+    if missed:
+        STAGE_MISSES.inc(stage=stage)
+    if _captured is not None:
+        _captured.append((stage, seconds, failed, missed))
+
+
+class stage_timer:
+    """
+    Time a stage, as a context manager or as a decorator of functions and
+    coroutine functions. Costs two perf_counter calls and a histogram update;
+    inside a sampled trace, the stage is also recorded as a span.
+
+        with stage_timer("model_predict"):
+            y_pred = model.predict(X)
+
+        @stage_timer("prepare_data_for_prediction")
+        def prepare_data_for_prediction(df): ...
+
+    Errors the caller expects, such as a missing object, can be counted as misses
+    instead of errors with the misses predicate.
+    """
+
+    def __init__(
+        self, stage: str, misses: Optional[Callable[[BaseException], bool]] = None
+    ):
+        """
+        Args:
+            stage (str): Name of the stage, the 'stage' label of the histogram.
+            misses (Optional[Callable]): Tells whether an error raised by the
+                stage is a miss rather than a failure.
+        """
+        self.stage = stage
+        self.misses = misses
+        self._start: list[tuple[float, Optional[Span]]] = []
+
+    def __enter__(self) -> "stage_timer":
+        self._start.append((time.perf_counter(), start_span(self.stage)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        start, span = self._start.pop()
+        self._observe(start, span, exc)
+
+    def _observe(
+        self, start: float, span: Optional[Span], error: Optional[BaseException]
+    ) -> None:
+        seconds = time.perf_counter() - start
+        if error is not None and self.misses is not None and self.misses(error):
+            observe_stage(self.stage, seconds, missed=True)
+            if span is not None:
+                span.set_attribute("outcome", "miss")
+                span.end()
+            return
+        observe_stage(self.stage, seconds, error is not None)
+        if span is not None:
+            span.end(error)
+
+    def __call__(self, func: Callable) -> Callable:
+        stage = self.stage
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                span = start_span(stage)
+                start = time.perf_counter()
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._observe(start, span, error)
+
+            return timed_coroutine
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            span = start_span(stage)
+            start = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._observe(start, span, error)
+
+        return timed
+
+
+def capture_stages(func: Callable, *args, **kwargs) -> tuple[Any, list]:
+    """
+    Run a function in a worker process and return the stages it observed with
+    its result, since the metrics of the worker are not those served by the API.
+    Stages of a call that raises are lost.
+    Args:
+        func (Callable): Function to run.
+        *args, **kwargs: Its arguments.
+    Returns:
+        tuple: The result of the function and its stage observations, to pass to
+        replay_stages in the API process.
+    """
+    global _captured
+    _captured = []
+    try:
+        result = func(*args, **kwargs)
+        return result, _captured
+    finally:
+        _captured = None
+
+
+def replay_stages(observations: list[tuple[str, float, bool, bool]]) -> None:
+    """
+    Record stages observed in a worker process, see capture_stages.
+    Args:
+        observations (list): Stage observations returned by capture_stages.
+    """
+    for stage, seconds, failed, missed in observations:
+        observe_stage(stage, seconds, failed, missed)
+
+
+def families_from_stats(
+    prefix: str, help_text: str, stats: dict, label: Optional[str] = None
+) -> list[MetricFamily]:
+    """
+    Export the stats() dict of an API component. Numeric values become metrics
+    named prefix_key, gauges if their key is in GAUGE_KEYS and counters
+    otherwise; with a label, stats is a dict of such dicts keyed by its value
+    (such as the executors by name). Other values are skipped.
+    Args:
+        prefix (str): Prefix of the metric names.
+        help_text (str): Description of the component.
+        stats (dict): The stats.
+        label (Optional[str]): Name of the label of nested stats.
+    Returns:
+        list[MetricFamily]: One family per numeric key.
+    """
+    rows = stats.items() if label else [(None, stats)]
+    families: dict[str, MetricFamily] = {}
+    for label_value, values in rows:
+        if not isinstance(values, dict):
+            continue
+        labels = {label: label_value} if label else {}
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in GAUGE_KEYS:
+                name, metric_type = f"{prefix}_{key}", "gauge"
+            else:
+                name, metric_type = f"{prefix}_{key}_total", "counter"
+            family = families.get(name)
+            if family is None:
+                family = families[name] = MetricFamily(
+                    name, metric_type, f"{help_text}: {key.replace('_', ' ')}."
+                )
+            family.add(value, **labels)
+    return list(families.values())
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    """
+    Args:
+        families (Iterable[MetricFamily]): Metrics to render.
+    Returns:
+        str: The metrics in the Prometheus text exposition format.
+    """
+    return "\n".join(family.render() for family in families) + "\n"
@@ -0,0 +1,379 @@
+import collections
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from config.settings import settings
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identity of the current span, propagated to executors and worker processes."""
+
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+# Span of the current task or thread. Copied into the tasks and into the threads of
+# the executors, and passed explicitly to worker processes, see capture_spans
+_current: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+# Spans ended by the current task of a worker process, see capture_spans
+_captured: Optional[list[dict]] = None
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """
+    A timed operation of a trace. Spans of unsampled traces only carry the
+    sampling decision to their children and are never exported.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str],
+        attributes: dict,
+    ):
+        """
+        Args:
+            name (str): Name of the operation.
+            context (SpanContext): Identity of the span.
+            parent_id (Optional[str]): Id of the parent span, None for a root span.
+            attributes (dict): Attributes of the operation.
+        """
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        # Error of a failed operation, set by end or by the caller
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current.set(context)
+        self._ended = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """
+        End the span and restore the previous current span.
+        Args:
+            error (Optional[BaseException]): Error raised by the operation.
+        """
+        if self._ended:
+            return
+        self._ended = True
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        duration = time.perf_counter() - self._start
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Ended from another context than the one that started it
+            pass
+        if not self.context.sampled:
+            return
+        record = {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(duration * 1000, 3),
+            "status": "error" if self.error is not None else "ok",
+            "attributes": dict(self.attributes),
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        export_spans([record])
+
+
+class InMemoryExporter:
+    """Keeps the most recent spans of the process, served by the traces endpoint."""
+
+    def __init__(self, max_spans: int = 10_000):
+        """
+        Args:
+            max_spans (int): Number of spans kept, the oldest are dropped first.
+        """
+        self._spans: collections.deque[dict] = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[dict]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def traces(self, limit: int = 20, trace_id: Optional[str] = None) -> list[dict]:
+        """
+        Args:
+            limit (int): Number of traces returned.
+            trace_id (Optional[str]): Only return this trace.
+        Returns:
+            list[dict]: The most recent traces, each with its spans in start order.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        by_trace: dict[str, list[dict]] = {}
+        for span in spans:
+            if trace_id is None or span["trace_id"] == trace_id:
+                by_trace.setdefault(span["trace_id"], []).append(span)
+        traces = []
+        for tid, trace_spans in by_trace.items():
+            trace_spans.sort(key=lambda span: span["start_time"])
+            root = next(
+                (span for span in trace_spans if span["parent_id"] is None),
+                trace_spans[0],
+            )
+            traces.append(
+                {
+                    "trace_id": tid,
+                    "name": root["name"],
+                    "start_time": trace_spans[0]["start_time"],
+                    "duration_ms": root["duration_ms"],
+                    "spans": trace_spans,
+                }
+            )
+        traces.sort(key=lambda trace: trace["start_time"], reverse=True)
+        return traces[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonlFileExporter:
+    """Appends the spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the file, created on the first export.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[dict]) -> None:
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+
+class Tracer:
+    """Sampling decision and destination of the spans of the process."""
+
+    def __init__(self, sample_rate: float = 0.0, exporter=None):
+        """
+        Args:
+            sample_rate (float): Proportion of the new traces that are recorded,
+                0 disables tracing.
+            exporter: InMemoryExporter or JsonlFileExporter receiving the spans.
+        """
+        self.sample_rate = sample_rate
+        self.exporter = exporter or InMemoryExporter()
+        self.exported = 0
+        self.dropped = 0
+
+    def configure(self, sample_rate: Optional[float] = None, exporter=None) -> None:
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if exporter is not None:
+            self.exporter = exporter
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def export(self, spans: list[dict]) -> None:
+        try:
+            self.exporter.export(spans)
+            self.exported += len(spans)
+        except Exception:
+            # Tracing must not fail the traced operation
+            self.dropped += len(spans)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "exporter": type(self.exporter).__name__,
+            "exported_spans": self.exported,
+            "dropped_spans": self.dropped,
+        }
+
+
+def create_exporter(name: str):
+    """
+    Args:
+        name (str): 'memory' or 'file', see the TRACING_* settings.
+    Returns:
+        The exporter.
+    """
+    if name == "file":
+        return JsonlFileExporter(settings.TRACING_FILE)
+    if name == "memory":
+        return InMemoryExporter(settings.TRACING_MEMORY_SPANS)
+    raise ValueError(f"Unknown tracing exporter '{name}', expected 'memory' or 'file'")
+
+
+TRACER = Tracer(
+    settings.TRACING_SAMPLE_RATE, create_exporter(settings.TRACING_EXPORTER)
+)
+
+
+def current_span_context() -> Optional[SpanContext]:
+    return _current.get()
+
+
+def start_span(name: str, root: bool = False, **attributes) -> Optional[Span]:
+    """
+    Start a span, the current span until it ends. The sampling decision is made
+    once per trace, when its root span starts, and inherited by all its spans.
+    Args:
+        name (str): Name of the operation.
+        root (bool): Start a new trace if there is no current span. Otherwise the
+            span is only recorded inside a trace.
+        **attributes: Attributes of the operation.
+    Returns:
+        Optional[Span]: The span, to end, or None if there is nothing to record.
+    """
+    parent = _current.get()
+    if parent is None:
+        if not root or TRACER.sample_rate <= 0:
+            return None
+        context = SpanContext(_new_id(128), _new_id(64), TRACER.should_sample())
+        return Span(name, context, None, attributes)
+    if not parent.sampled:
+        return None
+    context = SpanContext(parent.trace_id, _new_id(64), True)
+    return Span(name, context, parent.span_id, attributes)
+
+
+class span:
+    """
+    Trace an operation, as a (sync or async) context manager or as a decorator of
+    functions and coroutine functions. Costs a context variable lookup outside
+    sampled traces.
+
+        with span("training_job", root=True, seed=seed) as active:
+            ...
+
+        @span("get_data")
+        async def get_data(...): ...
+    """
+
+    def __init__(self, name: str, root: bool = False, **attributes):
+        """
+        Args:
+            name (str): Name of the operation.
+            root (bool): Start a new trace if there is no current span.
+            **attributes: Attributes of the operation.
+        """
+        self.name = name
+        self.root = root
+        self.attributes = attributes
+        self._active: list[Optional[Span]] = []
+
+    def __enter__(self) -> Optional[Span]:
+        active = start_span(self.name, self.root, **self.attributes)
+        self._active.append(active)
+        return active
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        active = self._active.pop()
+        if active is not None:
+            active.end(exc)
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, func: Callable) -> Callable:
+        name, root, attributes = self.name, self.root, self.attributes
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def traced_coroutine(*args, **kwargs):
+                active = start_span(name, root, **attributes)
+                if active is None:
+                    return await func(*args, **kwargs)
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    active.end(e)
+                    raise
+                active.end()
+                return result
+
+            return traced_coroutine
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            active = start_span(name, root, **attributes)
+            if active is None:
+                return func(*args, **kwargs)
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                active.end(e)
+                raise
+            active.end()
+            return result
+
+        return traced
+
+
+def export_spans(spans: list[dict]) -> None:
+    """
+    Export ended spans, or keep them to return them to the API process when
+    running in a worker, see capture_spans.
+    Args:
+        spans (list[dict]): The spans.
+    """
+    if _captured is not None:
+        _captured.extend(spans)
+    else:
+        TRACER.export(spans)
+
+
+def capture_spans(
+    parent: Optional[SpanContext], func: Callable, *args, **kwargs
+) -> tuple[Any, list[dict]]:
+    """
+    Run a function in a worker process as part of the trace of the caller, and
+    return the spans it ended with its result, since the exporter of the worker
+    is not the one of the API. Spans of a call that raises are lost.
+    Args:
+        parent (Optional[SpanContext]): Current span of the caller.
+        func (Callable): Function to run.
+        *args, **kwargs: Its arguments.
+    Returns:
+        tuple: The result of the function and its spans, to pass to export_spans
+        in the API process.
+    """
+    global _captured
+    _captured = []
+    token = _current.set(parent)
+    try:
+        result = func(*args, **kwargs)
+        return result, _captured
+    finally:
+        _current.reset(token)
+        _captured = None
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from typing import BinaryIO
+
+from storage.object_store import ObjectInfo, ObjectNotFoundError, ObjectStore
+
+
+class InMemoryObjectStore(ObjectStore):
+    """
+    In-process ObjectStore, for tests and local runs without MinIO.
+
+    latency_seconds simulates the round trip of every request, which makes the
+    benefit of concurrent requests measurable without a server.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0):
+        """
+        Args:
+            latency_seconds (float): Delay added to every request.
+        """
+        self.latency_seconds = latency_seconds
+        self._objects: dict[str, dict[str, tuple[bytes, ObjectInfo]]] = {}
+        self.requests = 0
+
+    async def get(self, bucket: str, object_name: str) -> bytes:
+        data, _ = await self._lookup(bucket, object_name)
+        return data
+
+    async def put(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> ObjectInfo:
+        await self._round_trip()
+        info = ObjectInfo(
+            name=object_name,
+            size=len(data),
+            etag=hashlib.md5(data).hexdigest(),
+            last_modified=datetime.now(timezone.utc),
+        )
+        self._objects.setdefault(bucket, {})[object_name] = (bytes(data), info)
+        return info
+
+    async def put_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: int = 16 * 1024 * 1024,
+    ) -> ObjectInfo:
+        return await self.put(bucket, object_name, stream.read(), content_type)
+
+    async def stat(self, bucket: str, object_name: str) -> ObjectInfo:
+        _, info = await self._lookup(bucket, object_name)
+        return info
+
+    async def list(
+        self, bucket: str, prefix: str = "", recursive: bool = False
+    ) -> list[ObjectInfo]:
+        await self._round_trip()
+        results: dict[str, ObjectInfo] = {}
+        for name, (_, info) in sorted(self._objects.get(bucket, {}).items()):
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix) :]
+            if not recursive and "/" in rest:
+                # Collapse deeper objects into their common prefix, like S3
+                directory = prefix + rest.split("/", 1)[0] + "/"
+                results.setdefault(directory, ObjectInfo(name=directory, is_dir=True))
+            else:
+                results[name] = info
+        return list(results.values())
+
+    async def remove(self, bucket: str, object_name: str) -> None:
+        await self._round_trip()
+        self._objects.get(bucket, {}).pop(object_name, None)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "objects": sum(len(objects) for objects in self._objects.values()),
+        }
+
+    async def _lookup(self, bucket: str, object_name: str) -> tuple[bytes, ObjectInfo]:
+        await self._round_trip()
+        try:
+            return self._objects[bucket][object_name]
+        except KeyError as e:
+            raise ObjectNotFoundError(bucket, object_name) from e
+
+    async def _round_trip(self) -> None:
+        self.requests += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
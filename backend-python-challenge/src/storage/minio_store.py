@@ -0,0 +1,258 @@
+import asyncio
+import contextvars
+import functools
+import io
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
+
+import urllib3
+from minio import Minio, S3Error
+
+from observability.metrics import stage_timer
+from storage.object_store import ObjectInfo, ObjectNotFoundError, ObjectStore
+
+logger = logging.getLogger(__name__)
+
+
+NOT_FOUND_CODES = {"NoSuchKey", "NoSuchBucket", "NoSuchObject"}
+# S3 error codes worth retrying; any other S3Error is returned as is
+RETRYABLE_CODES = {
+    "InternalError",
+    "ServiceUnavailable",
+    "SlowDown",
+    "RequestTimeout",
+    "RequestTimeTooSkewed",
+}
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, S3Error):
+        return error.code in RETRYABLE_CODES
+    # Connection resets, timeouts and other transport errors
+    return isinstance(
+        error, (urllib3.exceptions.HTTPError, ConnectionError, TimeoutError)
+    )
+
+
+class MinioObjectStore(ObjectStore):
+    """
+    ObjectStore backed by MinIO.
+
+    The synchronous minio client runs on a dedicated thread pool, with one pooled
+    HTTP connection per worker thread. At most max_concurrency requests are in
+    flight; transient failures are retried with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        max_concurrency: int = 16,
+        retries: int = 3,
+        backoff_seconds: float = 0.2,
+        timeout_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            endpoint (str): MinIO host and port.
+            access_key (str): Access key.
+            secret_key (str): Secret key.
+            secure (bool): Use HTTPS.
+            max_concurrency (int): Maximum number of requests in flight, and size
+                of the connection pool.
+            retries (int): Retries of a failed request.
+            backoff_seconds (float): Delay before the first retry, doubled after
+                every attempt.
+            timeout_seconds (float): Connect and read timeout of a request.
+        """
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+
+        http_client = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=max_concurrency,
+            block=True,
+            timeout=urllib3.Timeout(connect=timeout_seconds, read=timeout_seconds),
+            # Retries are handled here, with backoff between attempts
+            retries=False,
+        )
+        self.client = Minio(
+            endpoint=endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=http_client,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="object-store"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    @stage_timer("minio_get", misses=lambda e: isinstance(e, ObjectNotFoundError))
+    async def get(self, bucket: str, object_name: str) -> bytes:
+        return await self._call(
+            lambda: self._get(bucket, object_name),
+            bucket=bucket,
+            object_name=object_name,
+        )
+
+    @stage_timer("minio_put")
+    async def put(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> ObjectInfo:
+        result = await self._call(
+            lambda: self.client.put_object(
+                bucket,
+                object_name,
+                io.BytesIO(data),
+                len(data),
+                content_type=content_type,
+            ),
+            bucket=bucket,
+            object_name=object_name,
+        )
+        return ObjectInfo(name=object_name, size=len(data), etag=result.etag)
+
+    async def put_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: int = 16 * 1024 * 1024,
+    ) -> ObjectInfo:
+        # A partially consumed stream cannot be replayed, so it is never retried
+        result = await self._call(
+            lambda: self.client.put_object(
+                bucket,
+                object_name,
+                stream,
+                length=-1,
+                part_size=part_size,
+                content_type=content_type,
+            ),
+            bucket=bucket,
+            object_name=object_name,
+            retry=False,
+        )
+        return ObjectInfo(name=object_name, etag=result.etag)
+
+    async def stat(self, bucket: str, object_name: str) -> ObjectInfo:
+        stat = await self._call(
+            lambda: self.client.stat_object(bucket, object_name),
+            bucket=bucket,
+            object_name=object_name,
+        )
+        return ObjectInfo(
+            name=object_name,
+            size=stat.size or 0,
+            etag=stat.etag,
+            last_modified=stat.last_modified,
+        )
+
+    async def list(
+        self, bucket: str, prefix: str = "", recursive: bool = False
+    ) -> list[ObjectInfo]:
+        return await self._call(
+            lambda: [
+                ObjectInfo(
+                    name=obj.object_name,
+                    size=obj.size or 0,
+                    etag=obj.etag,
+                    last_modified=obj.last_modified,
+                    is_dir=obj.is_dir,
+                )
+                for obj in self.client.list_objects(
+                    bucket, prefix=prefix, recursive=recursive
+                )
+            ],
+            bucket=bucket,
+            object_name=prefix,
+        )
+
+    async def remove(self, bucket: str, object_name: str) -> None:
+        await self._call(
+            lambda: self.client.remove_object(bucket, object_name),
+            bucket=bucket,
+            object_name=object_name,
+        )
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def _get(self, bucket: str, object_name: str) -> bytes:
+        response = self.client.get_object(bucket, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def _call(
+        self,
+        func,
+        bucket: str = "",
+        object_name: str = "",
+        retry: bool = True,
+    ):
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            # Semaphores are bound to the event loop they are first used on
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+
+        attempts = self.retries + 1 if retry else 1
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                for attempt in range(attempts):
+                    self.requests += 1
+                    try:
+                        return await loop.run_in_executor(
+                            self._executor,
+                            functools.partial(contextvars.copy_context().run, func),
+                        )
+                    except S3Error as e:
+                        if e.code in NOT_FOUND_CODES:
+                            raise ObjectNotFoundError(bucket, object_name) from e
+                        error = e
+                    except Exception as e:
+                        error = e
+
+                    if attempt == attempts - 1 or not _is_retryable(error):
+                        self.failed += 1
+                        raise error
+                    self.retried += 1
+                    delay = self.backoff_seconds * 2**attempt
+                    delay *= random.uniform(0.5, 1.5)
+                    logger.warning(
+                        f"Retrying {bucket}/{object_name} in {delay:.2f}s "
+                        f"after error: {str(error)}"
+                    )
+                    await asyncio.sleep(delay)
+            finally:
+                self.in_flight -= 1
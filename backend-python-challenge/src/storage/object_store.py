@@ -0,0 +1,112 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, List, Optional
+
+
+class ObjectNotFoundError(FileNotFoundError):
+    """The requested object or bucket does not exist."""
+
+    def __init__(self, bucket: str, object_name: str):
+        # 'NoSuchKey' keeps the message compatible with the S3Error checks of the API
+        super().__init__(f"NoSuchKey: {bucket}/{object_name}")
+        self.bucket = bucket
+        self.object_name = object_name
+
+
+@dataclass
+class ObjectInfo:
+    """Metadata of a stored object, or of a prefix in non recursive listings."""
+
+    name: str
+    size: int = 0
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+    is_dir: bool = False
+
+
+class ObjectStore(ABC):
+    """
+    Asynchronous object store.
+
+    Implementations limit the number of requests in flight and retry transient
+    failures, so callers can issue many requests at once with asyncio.gather or
+    fetch_many instead of making serial round trips.
+    """
+
+    @abstractmethod
+    async def get(self, bucket: str, object_name: str) -> bytes: ...
+
+    @abstractmethod
+    async def put(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> ObjectInfo: ...
+
+    @abstractmethod
+    async def put_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: int = 16 * 1024 * 1024,
+    ) -> ObjectInfo:
+        """Upload a stream of unknown length as a multipart upload."""
+
+    @abstractmethod
+    async def stat(self, bucket: str, object_name: str) -> ObjectInfo: ...
+
+    @abstractmethod
+    async def list(
+        self, bucket: str, prefix: str = "", recursive: bool = False
+    ) -> list[ObjectInfo]: ...
+
+    @abstractmethod
+    async def remove(self, bucket: str, object_name: str) -> None: ...
+
+    async def list_many(
+        self, bucket: str, prefixes: List[str], recursive: bool = False
+    ) -> List[ObjectInfo]:
+        """
+        List several prefixes concurrently.
+        Args:
+            bucket (str): Bucket to list.
+            prefixes (list[str]): Prefixes to list.
+            recursive (bool): List the objects under sub-prefixes too.
+        Returns:
+            list[ObjectInfo]: Objects of every prefix, in the order of the prefixes.
+        """
+        listings = await asyncio.gather(
+            *[self.list(bucket, prefix, recursive=recursive) for prefix in prefixes]
+        )
+        return [info for listing in listings for info in listing]
+
+    async def fetch_many(
+        self, bucket: str, object_names: List[str], return_exceptions: bool = False
+    ) -> List[bytes]:
+        """
+        Download several objects concurrently, within the concurrency limit of the
+        store.
+        Args:
+            bucket (str): Bucket of the objects.
+            object_names (list[str]): Names of the objects.
+            return_exceptions (bool): Return the error of an object in its position
+                instead of raising it.
+        Returns:
+            list: Content of each object (bytes), in the order of object_names.
+        """
+        return await asyncio.gather(
+            *[self.get(bucket, name) for name in object_names],
+            return_exceptions=return_exceptions,
+        )
+
+    async def close(self) -> None:  # noqa: B027
+        """Release the connections of the store. Optional, the default does nothing."""
+
+    def stats(self) -> dict:
+        return {}
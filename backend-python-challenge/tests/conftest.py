@@ -0,0 +1,6 @@
+import os
+
+# The settings are read when the API modules are imported and require the MinIO
+# credentials; the tests never reach a MinIO server
+os.environ.setdefault("MINIO_ROOT_USER", "test")
+os.environ.setdefault("MINIO_ROOT_PASSWORD", "test-password")
@@ -0,0 +1,149 @@
+import io
+import json
+
+import polars as ps
+import pyarrow as pa
+import pytest
+
+from api.bulk_payloads import (
+    ARROW_FILE_CONTENT_TYPE,
+    ARROW_STREAM_CONTENT_TYPE,
+    FEATURE_SCHEMA,
+    JSON_CONTENT_TYPE,
+    PARQUET_CONTENT_TYPE,
+    decode_bulk_features,
+    detect_bulk_payload_format,
+)
+
+FEATURES = {
+    "height": [1.5, 3.0],
+    "weight": [10, 4000.5],
+    "walks_on_n_legs": [4, 4],
+    "has_wings": [False, False],
+    "has_tail": [True, True],
+}
+
+
+def encode_json(columns: dict) -> bytes:
+    return json.dumps(columns).encode()
+
+
+def encode_arrow_stream(columns: dict) -> bytes:
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_arrow_file(columns: dict) -> bytes:
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_parquet(columns: dict) -> bytes:
+    buffer = io.BytesIO()
+    ps.from_arrow(pa.table(columns)).write_parquet(buffer)
+    return buffer.getvalue()
+
+
+FORMATS = [
+    pytest.param(encode_json, JSON_CONTENT_TYPE, id="json"),
+    pytest.param(encode_arrow_stream, ARROW_STREAM_CONTENT_TYPE, id="arrow_stream"),
+    pytest.param(encode_arrow_file, ARROW_FILE_CONTENT_TYPE, id="arrow_file"),
+    pytest.param(encode_parquet, PARQUET_CONTENT_TYPE, id="parquet"),
+]
+
+
+@pytest.mark.parametrize("encode, content_type", FORMATS)
+def test_decodes_every_format(encode, content_type):
+    body = encode({**FEATURES, "label": ["dog", "elephant"]})
+
+    for header in [content_type, None]:
+        df = decode_bulk_features(body, header)
+        assert df.schema == ps.Schema(FEATURE_SCHEMA)
+        assert df["weight"].to_list() == [10.0, 4000.5]
+
+
+@pytest.mark.parametrize(
+    "encode, expected",
+    [
+        (encode_json, "json"),
+        (encode_arrow_stream, "arrow_stream"),
+        (encode_arrow_file, "arrow_file"),
+        (encode_parquet, "parquet"),
+    ],
+)
+def test_detects_the_format_from_the_body(encode, expected):
+    body = encode(FEATURES)
+    assert detect_bulk_payload_format(body, None) == expected
+    assert detect_bulk_payload_format(body, "application/octet-stream") == expected
+
+
+@pytest.mark.parametrize("encode, content_type", FORMATS)
+@pytest.mark.parametrize("column", ["height", "walks_on_n_legs", "has_wings"])
+def test_rejects_nulls(encode, content_type, column):
+    values = list(FEATURES[column])
+    values[1] = None
+    body = encode({**FEATURES, column: values})
+
+    with pytest.raises(ValueError, match=f"Null or NaN feature values: .*{column}"):
+        decode_bulk_features(body, content_type)
+
+
+@pytest.mark.parametrize("encode, content_type", FORMATS)
+def test_rejects_nan(encode, content_type):
+    body = encode({**FEATURES, "weight": [10.0, float("nan")]})
+
+    with pytest.raises(ValueError, match="Null or NaN feature values: .*weight"):
+        decode_bulk_features(body, content_type)
+
+
+@pytest.mark.parametrize("encode, content_type", FORMATS)
+def test_rejects_missing_columns(encode, content_type):
+    columns = {key: value for key, value in FEATURES.items() if key != "has_tail"}
+
+    with pytest.raises(ValueError, match=r"Missing feature columns: \['has_tail'\]"):
+        decode_bulk_features(encode(columns), content_type)
+
+
+@pytest.mark.parametrize("encode, content_type", FORMATS)
+def test_rejects_empty_payloads(encode, content_type):
+    columns = {
+        "height": pa.array([], pa.float64()),
+        "weight": pa.array([], pa.float64()),
+        "walks_on_n_legs": pa.array([], pa.int64()),
+        "has_wings": pa.array([], pa.bool_()),
+        "has_tail": pa.array([], pa.bool_()),
+    }
+    if encode is encode_json:
+        columns = {key: [] for key in columns}
+
+    with pytest.raises(ValueError, match="The payload has no rows"):
+        decode_bulk_features(encode(columns), content_type)
+
+
+def test_rejects_json_arrays_of_different_lengths():
+    body = encode_json({**FEATURES, "height": [1.5]})
+
+    with pytest.raises(ValueError, match="Invalid json payload"):
+        decode_bulk_features(body, JSON_CONTENT_TYPE)
+
+
+@pytest.mark.parametrize(
+    "body, content_type, error",
+    [
+        (b"", JSON_CONTENT_TYPE, ValueError),
+        (b"[1, 2]", JSON_CONTENT_TYPE, TypeError),
+        (b"{", None, ValueError),
+        (b"\xff\xff\xff\xff\x00", None, ValueError),
+        (b"ARROW1 truncated", None, ValueError),
+        (b"PAR1 truncated", None, ValueError),
+    ],
+)
+def test_rejects_malformed_bodies(body, content_type, error):
+    with pytest.raises(error):
+        decode_bulk_features(body, content_type)
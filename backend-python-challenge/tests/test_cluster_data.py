@@ -0,0 +1,87 @@
+import copy
+
+import pytest
+
+from clustering.cluster_data import label_dataset_no_clustering
+
+
+def label_with_loop(data: list[dict]) -> list[dict]:
+    """The per-dictionary labeling that label_dataset_no_clustering replaced."""
+    labeled_data = []
+    for item in data:
+        label = "outlier"
+        if item.get("walks_on_n_legs") == 2:
+            if item.get("has_wings"):
+                label = "chicken"
+            else:
+                label = "kangaroo"
+        elif item.get("walks_on_n_legs") == 4:
+            if item.get("weight", 0) > 150:
+                label = "elephant"
+            else:
+                label = "dog"
+        item["label"] = label
+        labeled_data.append(item)
+    return labeled_data
+
+
+def animal(**values) -> dict:
+    return {
+        "height": 1.0,
+        "weight": 10,
+        "walks_on_n_legs": 4,
+        "has_wings": False,
+        "has_tail": True,
+        **values,
+    }
+
+
+CASES = [
+    # More than the rows a DataFrame infers its types from, with integer weights
+    *[animal(weight=i) for i in range(120)],
+    animal(weight=150.7),
+    animal(weight=150),
+    animal(weight=150.0),
+    animal(weight=151),
+    animal(weight=149.99),
+    animal(walks_on_n_legs=2, has_wings=True),
+    animal(walks_on_n_legs=2, has_wings=1),
+    animal(walks_on_n_legs=2, has_wings="yes"),
+    animal(walks_on_n_legs=2, has_wings=0),
+    animal(walks_on_n_legs=2, has_wings=None),
+    animal(walks_on_n_legs=2.0, has_wings=True),
+    animal(walks_on_n_legs=2.5),
+    animal(walks_on_n_legs=4.0, weight=200.5),
+    animal(walks_on_n_legs=3),
+    animal(walks_on_n_legs=None),
+    animal(walks_on_n_legs=2, weight=None),
+    {"height": 1.0, "walks_on_n_legs": 4},
+    {"walks_on_n_legs": 2},
+    {"extra": "key only in the last row"},
+]
+
+
+def test_matches_the_per_dictionary_loop():
+    expected = label_with_loop(copy.deepcopy(CASES))
+    assert label_dataset_no_clustering(copy.deepcopy(CASES)) == expected
+
+
+def test_labels_the_input_dictionaries_in_place():
+    data = [animal(weight=150.7), animal(weight=12.5)]
+    items = list(data)
+    original = copy.deepcopy(data)
+
+    labeled = label_dataset_no_clustering(data)
+
+    assert labeled is data
+    assert all(
+        item is input_item for item, input_item in zip(labeled, items, strict=True)
+    )
+    assert [item.pop("label") for item in data] == ["elephant", "dog"]
+    # Nothing else is changed, the weights keep their values and types
+    assert data == original
+
+
+@pytest.mark.parametrize("data", [[], [{}]])
+def test_empty_input(data):
+    assert label_dataset_no_clustering(data) == label_with_loop(copy.deepcopy(data))
@@ -0,0 +1,82 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from api.model_artifact import (
+    ALIGNMENT,
+    ARTIFACT_MAGIC,
+    decode_model_artifact,
+    encode_model_artifact,
+    read_manifest,
+    read_model_file,
+)
+
+
+@pytest.fixture(scope="module")
+def trained_model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    labels = np.where(X[:, 0] > 0, "dog", "cat")
+    label_encoder = LabelEncoder().fit(labels)
+    model = KNeighborsClassifier(n_neighbors=3).fit(X, label_encoder.transform(labels))
+    return model, label_encoder, X
+
+
+def test_round_trip(trained_model):
+    model, label_encoder, X = trained_model
+    data = encode_model_artifact(model, label_encoder).getvalue()
+
+    assert data.startswith(ARTIFACT_MAGIC)
+    loaded_model, loaded_encoder, manifest = decode_model_artifact(data)
+
+    np.testing.assert_array_equal(loaded_model.predict(X), model.predict(X))
+    assert list(loaded_encoder.classes_) == ["cat", "dog"]
+    assert manifest["model_type"] == "KNeighborsClassifier"
+    assert manifest["classes"] == ["cat", "dog"]
+
+
+def test_large_arrays_are_aligned_out_of_band(trained_model):
+    model, label_encoder, _ = trained_model
+    data = encode_model_artifact(model, label_encoder).getvalue()
+    manifest = read_manifest(data)
+
+    # The training rows of the KNN are stored outside of the pickle stream
+    assert manifest["buffers"]
+    for section in [manifest["pickle"], *manifest["buffers"]]:
+        assert section["offset"] % ALIGNMENT == 0
+        assert section["offset"] + section["length"] <= len(data)
+
+
+def test_read_model_file_maps_artifacts(trained_model, tmp_path):
+    model, label_encoder, X = trained_model
+    path = tmp_path / "model.artifact"
+    path.write_bytes(encode_model_artifact(model, label_encoder).getvalue())
+
+    with open(path, "rb") as f:
+        loaded_model, loaded_encoder = read_model_file(f)
+
+    np.testing.assert_array_equal(loaded_model.predict(X), model.predict(X))
+    # The arrays are read-only views of the mapped file, not copies
+    assert not loaded_model._fit_X.flags.writeable
+    assert list(loaded_encoder.classes_) == ["cat", "dog"]
+
+
+def test_read_model_file_reads_legacy_pickles(trained_model, tmp_path):
+    model, label_encoder, X = trained_model
+    path = tmp_path / "model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"model": model, "label_encoder": label_encoder}, f)
+
+    with open(path, "rb") as f:
+        loaded_model, loaded_encoder = read_model_file(f)
+
+    np.testing.assert_array_equal(loaded_model.predict(X), model.predict(X))
+    assert list(loaded_encoder.classes_) == ["cat", "dog"]
+
+
+def test_read_manifest_rejects_other_files():
+    with pytest.raises(ValueError, match="Not a model artifact"):
+        read_manifest(b"\x80\x05" + b"\0" * 32)
@@ -0,0 +1,84 @@
+import time
+
+from api.model_cache import ModelCache
+
+
+def test_get_checks_the_etag():
+    cache = ModelCache(max_items=10, max_bytes=1000)
+    cache.put("1-10/model.artifact", "etag-1", "model", 10)
+
+    assert cache.get("1-10/model.artifact", "etag-1") == "model"
+    # A new version of the object makes the entry stale, it is dropped
+    assert cache.get("1-10/model.artifact", "etag-2") is None
+    assert cache.get("1-10/model.artifact") is None
+    assert cache.stats()["items"] == 0
+
+
+def test_needs_revalidation_after_the_delay():
+    cache = ModelCache(max_items=10, max_bytes=1000, revalidate_seconds=60)
+    assert cache.needs_revalidation("1-10/model.artifact")
+
+    cache.put("1-10/model.artifact", "etag-1", "model", 10)
+    assert not cache.needs_revalidation("1-10/model.artifact")
+
+    cache.revalidate_seconds = 0.0
+    time.sleep(0.001)
+    assert cache.needs_revalidation("1-10/model.artifact")
+
+
+def test_revalidation_is_only_renewed_by_an_etag_check():
+    cache = ModelCache(max_items=10, max_bytes=1000, revalidate_seconds=0.05)
+    cache.put("1-10/model.artifact", "etag-1", "model", 10)
+    time.sleep(0.06)
+
+    # Trusted hits do not postpone the next check
+    assert cache.get("1-10/model.artifact") == "model"
+    assert cache.needs_revalidation("1-10/model.artifact")
+
+    assert cache.get("1-10/model.artifact", "etag-1") == "model"
+    assert not cache.needs_revalidation("1-10/model.artifact")
+
+
+def test_evicts_the_least_recently_used_entries():
+    cache = ModelCache(max_items=2, max_bytes=100)
+    cache.put("a/model.pkl", "e", "a", 10)
+    cache.put("b/model.pkl", "e", "b", 10)
+    cache.get("a/model.pkl")
+    cache.put("c/model.pkl", "e", "c", 10)
+
+    assert cache.get("b/model.pkl") is None
+    assert cache.get("a/model.pkl") == "a"
+    assert cache.stats()["evictions"] == 1
+
+    cache.put("d/model.pkl", "e", "d", 90)
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_invalidate_drops_every_object_of_a_model():
+    cache = ModelCache(max_items=10, max_bytes=1000)
+    cache.put("1-10/model.artifact", "e", "model", 10)
+    cache.put("1-10/surrogate.pkl", "e", "surrogate", 10)
+    cache.put("1-100/model.artifact", "e", "other", 10)
+
+    cache.invalidate("1-10")
+
+    assert cache.get("1-10/model.artifact") is None
+    assert cache.get("1-10/surrogate.pkl") is None
+    assert cache.get("1-100/model.artifact") == "other"
+
+
+def test_removal_listeners_see_every_removed_entry():
+    cache = ModelCache(max_items=1, max_bytes=1000)
+    removed = []
+    cache.add_removal_listener(lambda key, value: removed.append((key, value)))
+
+    def failing_listener(key, value):
+        raise RuntimeError("listener error")
+
+    cache.add_removal_listener(failing_listener)
+
+    cache.put("a/model.pkl", "e", "a", 10)
+    cache.put("b/model.pkl", "e", "b", 10)
+    cache.get("b/model.pkl", "new-etag")
+
+    assert removed == [("a/model.pkl", "a"), ("b/model.pkl", "b")]
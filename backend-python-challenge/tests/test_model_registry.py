@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+from api.model_artifact import LEGACY_MODEL_NAME, MODEL_ARTIFACT_NAME
+from api.model_registry import (
+    METRICS_NAME,
+    REGISTRY_OBJECT,
+    ModelRegistry,
+    filter_models,
+    sort_models,
+)
+from api.models.model_registry import RegisteredModel
+from config.minio_config import BUCKET_MODELS
+from storage.memory_store import InMemoryObjectStore
+
+MODELS = [
+    RegisteredModel(name="1-10", accuracy=0.9, training_mode="full", seed=1),
+    RegisteredModel(name="1-100", accuracy=0.7, training_mode="fast", seed=1),
+    RegisteredModel(name="2-10", accuracy=None, training_mode="full", seed=2),
+    RegisteredModel(name="3-1000", accuracy=0.95, training_mode=None, seed=3),
+]
+
+
+def names(models: list[RegisteredModel]) -> list[str]:
+    return [model.name for model in models]
+
+
+def test_filter_models():
+    assert names(filter_models(MODELS)) == ["1-10", "1-100", "2-10", "3-1000"]
+    assert names(filter_models(MODELS, name="1-10")) == ["1-10", "1-100"]
+    assert names(filter_models(MODELS, training_mode="full")) == ["1-10", "2-10"]
+    # Models without an accuracy never reach a minimum
+    assert names(filter_models(MODELS, min_accuracy=0.8)) == ["1-10", "3-1000"]
+    assert names(filter_models(MODELS, name="1-", min_accuracy=0.8)) == ["1-10"]
+
+
+def test_sort_models():
+    assert names(sort_models(MODELS, "accuracy")) == [
+        "1-100",
+        "1-10",
+        "3-1000",
+        "2-10",
+    ]
+    # Models without a value come last in both orders
+    assert names(sort_models(MODELS, "-accuracy")) == [
+        "3-1000",
+        "1-10",
+        "1-100",
+        "2-10",
+    ]
+    assert names(sort_models(MODELS, "-name")) == ["3-1000", "2-10", "1-100", "1-10"]
+
+
+def test_sort_models_rejects_other_fields():
+    with pytest.raises(ValueError, match="Cannot sort by 'artifact_format'"):
+        sort_models(MODELS, "artifact_format")
+
+
+async def store_model(
+    store: InMemoryObjectStore,
+    name: str,
+    artifact_name: str = MODEL_ARTIFACT_NAME,
+    metrics: dict | None = None,
+) -> None:
+    await store.put(BUCKET_MODELS, f"{name}/{artifact_name}", b"model")
+    if metrics is not None:
+        await store.put(
+            BUCKET_MODELS, f"{name}/{METRICS_NAME}", json.dumps(metrics).encode()
+        )
+
+
+async def remove_model(store: InMemoryObjectStore, name: str) -> None:
+    for info in await store.list(BUCKET_MODELS, prefix=f"{name}/", recursive=True):
+        await store.remove(BUCKET_MODELS, info.name)
+
+
+async def stored_manifest_names(store: InMemoryObjectStore) -> list[str]:
+    manifest = json.loads(await store.get(BUCKET_MODELS, REGISTRY_OBJECT))
+    return [entry["name"] for entry in manifest["models"]]
+
+
+def test_rebuilds_the_manifest_from_the_bucket():
+    async def scenario():
+        store = InMemoryObjectStore()
+        await store_model(
+            store, "1-10", metrics={"accuracy": 0.9, "training_mode": "full"}
+        )
+        await store_model(store, "2-20", artifact_name=LEGACY_MODEL_NAME)
+        # A training interrupted before its model was stored
+        await store.put(BUCKET_MODELS, f"3-30/{METRICS_NAME}", b"{}")
+
+        registry = ModelRegistry(revalidate_seconds=60)
+        models = await registry.list(store)
+
+        assert names(models) == ["1-10", "2-20"]
+        first, second = models
+        assert (first.seed, first.number_of_datapoints) == (1, 10)
+        assert (first.accuracy, first.training_mode) == (0.9, "full")
+        assert (first.artifact_format, first.artifact_bytes) == ("artifact", 5)
+        assert (second.artifact_format, second.accuracy) == ("pickle", None)
+        assert await stored_manifest_names(store) == ["1-10", "2-20"]
+        assert registry.stats()["rebuilds"] == 1
+
+        # The cached manifest is trusted until the revalidation delay
+        requests = store.stats()["requests"]
+        assert names(await registry.list(store)) == ["1-10", "2-20"]
+        assert store.stats()["requests"] == requests
+
+        # Another worker reads the stored manifest instead of rebuilding it
+        other = ModelRegistry(revalidate_seconds=60)
+        assert names(await other.list(store)) == ["1-10", "2-20"]
+        assert other.stats()["rebuilds"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_adds_the_models_missing_from_the_manifest():
+    async def scenario():
+        store = InMemoryObjectStore()
+        await store_model(store, "1-10")
+        registry = ModelRegistry(revalidate_seconds=0)
+        await registry.list(store)
+
+        # Stored, but its registration was lost
+        await store_model(store, "2-20", metrics={"accuracy": 0.8})
+
+        models = await registry.list(store)
+        assert names(models) == ["1-10", "2-20"]
+        assert models[1].accuracy == 0.8
+        assert await stored_manifest_names(store) == ["1-10", "2-20"]
+        assert registry.stats()["reconciliations"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_drops_the_models_removed_from_the_bucket():
+    async def scenario():
+        store = InMemoryObjectStore()
+        for name in ["1-10", "2-20", "3-30"]:
+            await store_model(store, name)
+        registry = ModelRegistry(revalidate_seconds=0)
+        await registry.list(store)
+
+        await remove_model(store, "2-20")
+        await remove_model(store, "3-30")
+        await store_model(store, "4-40")
+
+        assert names(await registry.list(store)) == ["1-10", "4-40"]
+        assert await stored_manifest_names(store) == ["1-10", "4-40"]
+        assert registry.stats()["reconciliations"] == 1
+
+        # Nothing to change, the manifest is not written again
+        writes = registry.stats()["writes"]
+        await registry.list(store)
+        assert registry.stats()["writes"] == writes
+
+    asyncio.run(scenario())
+
+
+def test_register_keeps_the_models_of_other_workers():
+    async def scenario():
+        store = InMemoryObjectStore()
+        await store_model(store, "1-10")
+        registry = ModelRegistry(revalidate_seconds=60)
+        other = ModelRegistry(revalidate_seconds=60)
+        await registry.list(store)
+        await other.list(store)
+
+        await store_model(store, "2-20")
+        await other.register(store, RegisteredModel(name="2-20", accuracy=0.5))
+        await store_model(store, "3-30")
+        await registry.register(store, RegisteredModel(name="3-30"))
+
+        assert await stored_manifest_names(store) == ["1-10", "2-20", "3-30"]
+        assert names(await registry.list(store)) == ["1-10", "2-20", "3-30"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsClassifier, NearestNeighbors
+
+from machine_learning.neighbors import ApproximateKNeighborsClassifier
+
+
+@pytest.fixture(scope="module")
+def blobs():
+    """Overlapping classes, so the votes depend on the exact neighbors."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=2.0, size=(4, 5))
+    labels = rng.integers(0, 4, size=3000)
+    X = (centers[labels] + rng.normal(size=(3000, 5))).astype(np.float32)
+    names = np.array(["cat", "dog", "elephant", "kangaroo"])[labels]
+    return X[:2500], names[:2500], X[2500:], names[2500:]
+
+
+def recall(X_train, X_test, indices, n_neighbors: int) -> float:
+    """Mean share of the true neighbors of each query among the rows found."""
+    exact = NearestNeighbors(n_neighbors=n_neighbors).fit(X_train)
+    true = exact.kneighbors(X_test, return_distance=False)
+    return np.mean(
+        [len(set(a) & set(b)) / n_neighbors for a, b in zip(true, indices, strict=True)]
+    )
+
+
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_probing_every_list_is_exact(blobs, weights):
+    X_train, y_train, X_test, _ = blobs
+    model = ApproximateKNeighborsClassifier(
+        n_neighbors=7, weights=weights, n_lists=16, n_probe=16
+    ).fit(X_train, y_train)
+    exact = KNeighborsClassifier(n_neighbors=7, weights=weights).fit(X_train, y_train)
+
+    np.testing.assert_array_equal(model.predict(X_test), exact.predict(X_test))
+    np.testing.assert_allclose(
+        model.predict_proba(X_test), exact.predict_proba(X_test), atol=1e-5
+    )
+
+
+def test_neighbors_found_with_every_list(blobs):
+    X_train, y_train, X_test, _ = blobs
+    model = ApproximateKNeighborsClassifier(n_neighbors=5, n_lists=16, n_probe=16)
+    model.fit(X_train, np.arange(len(X_train)))
+
+    # With one class per training row, the labels found are the neighbor indices
+    distances, labels = model._search(X_test)
+    found = model.classes_[labels]
+
+    assert recall(X_train, X_test, found, 5) == 1.0
+    assert np.isfinite(distances).all()
+
+
+def test_few_probes_keep_a_high_agreement(blobs):
+    X_train, y_train, X_test, _ = blobs
+    model = ApproximateKNeighborsClassifier(n_neighbors=5, n_lists=32, n_probe=4)
+    model.fit(X_train, y_train)
+    exact = KNeighborsClassifier(n_neighbors=5).fit(X_train, y_train)
+
+    agreement = np.mean(model.predict(X_test) == exact.predict(X_test))
+    assert agreement >= 0.95
+
+
+@pytest.mark.parametrize("metric", ["cosine", "manhattan"])
+def test_other_metrics_match_the_exact_search(blobs, metric):
+    X_train, y_train, X_test, _ = blobs
+    # Encoded labels, the manhattan brute force of sklearn fails on strings
+    _, y_train = np.unique(y_train, return_inverse=True)
+    model = ApproximateKNeighborsClassifier(
+        n_neighbors=5, metric=metric, n_lists=8, n_probe=8
+    ).fit(X_train, y_train)
+    exact = KNeighborsClassifier(n_neighbors=5, metric=metric, algorithm="brute")
+    exact.fit(X_train, y_train)
+
+    np.testing.assert_array_equal(model.predict(X_test), exact.predict(X_test))
+
+
+def test_uint8_storage(blobs):
+    X_train, y_train, X_test, y_test = blobs
+    model = ApproximateKNeighborsClassifier(
+        n_neighbors=5, n_lists=16, n_probe=16, storage="uint8"
+    ).fit(X_train, y_train)
+    exact = KNeighborsClassifier(n_neighbors=5).fit(X_train, y_train)
+
+    assert model.vectors_.dtype == np.uint8
+    # One byte per feature, a quarter of the float32 index
+    assert model.vectors_.nbytes == X_train.size
+    # The quantization moves few neighbors, so few votes change
+    agreement = np.mean(model.predict(X_test) == exact.predict(X_test))
+    assert agreement >= 0.97
+    assert abs(model.score(X_test, y_test) - exact.score(X_test, y_test)) < 0.02
+
+
+def test_distance_weights_with_exact_matches():
+    X_train = np.array([[0, 0], [0, 0], [1, 0], [0, 1], [1, 1]], dtype=np.float32)
+    y_train = np.array(["cat", "dog", "dog", "dog", "dog"])
+    model = ApproximateKNeighborsClassifier(
+        n_neighbors=5, weights="distance", n_lists=1, n_probe=1
+    ).fit(X_train, y_train)
+    exact = KNeighborsClassifier(n_neighbors=5, weights="distance")
+    exact.fit(X_train, y_train)
+
+    # The query is a training row: the exact matches take all the weight,
+    # whatever the number of other neighbors
+    queries = np.array([[0, 0], [0.9, 0.9]], dtype=np.float32)
+    np.testing.assert_allclose(model.predict_proba(queries)[0], [0.5, 0.5])
+    np.testing.assert_allclose(
+        model.predict_proba(queries), exact.predict_proba(queries), atol=1e-6
+    )
+
+
+def test_save_and_load_mmap(blobs, tmp_path):
+    X_train, y_train, X_test, _ = blobs
+    model = ApproximateKNeighborsClassifier(
+        n_neighbors=5, n_lists=16, n_probe=4, storage="uint8"
+    ).fit(X_train, y_train)
+    model.save(str(tmp_path / "index"))
+
+    loaded = ApproximateKNeighborsClassifier.load(str(tmp_path / "index"), mmap=True)
+
+    assert loaded.get_params() == model.get_params()
+    assert isinstance(loaded.vectors_, np.memmap)
+    assert not loaded.vectors_.flags.writeable
+    assert list(loaded.classes_) == list(model.classes_)
+    np.testing.assert_array_equal(loaded.predict(X_test), model.predict(X_test))
+    np.testing.assert_array_equal(
+        loaded.predict_proba(X_test), model.predict_proba(X_test)
+    )
+
+
+def test_load_rejects_other_format_versions(blobs, tmp_path):
+    X_train, y_train, _, _ = blobs
+    ApproximateKNeighborsClassifier(n_lists=4).fit(X_train, y_train).save(str(tmp_path))
+    metadata = tmp_path / "index.json"
+    metadata.write_text(
+        metadata.read_text().replace('"format_version": 1', '"format_version": 99')
+    )
+
+    with pytest.raises(ValueError, match="Unsupported index format version 99"):
+        ApproximateKNeighborsClassifier.load(str(tmp_path))
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from storage.memory_store import InMemoryObjectStore
+from storage.object_store import ObjectNotFoundError
+
+
+def test_put_get_and_stat():
+    async def scenario():
+        store = InMemoryObjectStore()
+        info = await store.put("bucket", "a/b.txt", b"hello")
+        assert await store.get("bucket", "a/b.txt") == b"hello"
+        stat = await store.stat("bucket", "a/b.txt")
+        assert (stat.size, stat.etag) == (5, info.etag)
+
+    asyncio.run(scenario())
+
+
+def test_missing_object_raises_not_found():
+    async def scenario():
+        store = InMemoryObjectStore()
+        with pytest.raises(ObjectNotFoundError) as error:
+            await store.get("bucket", "missing")
+        # The API detects missing objects from the S3 error code in the message
+        assert "NoSuchKey" in str(error.value)
+        assert isinstance(error.value, FileNotFoundError)
+
+    asyncio.run(scenario())
+
+
+def test_list_collapses_prefixes_unless_recursive():
+    async def scenario():
+        store = InMemoryObjectStore()
+        for name in ("1-10/model.pkl", "1-10/metrics.json", "_registry.json"):
+            await store.put("models", name, b"x")
+
+        top = await store.list("models")
+        assert [(info.name, info.is_dir) for info in top] == [
+            ("1-10/", True),
+            ("_registry.json", False),
+        ]
+        nested = await store.list("models", recursive=True)
+        assert [info.name for info in nested] == [
+            "1-10/metrics.json",
+            "1-10/model.pkl",
+            "_registry.json",
+        ]
+        listed = await store.list_many("models", ["1-10/", "_"])
+        assert [info.name for info in listed] == [
+            "1-10/metrics.json",
+            "1-10/model.pkl",
+            "_registry.json",
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_remove():
+    async def scenario():
+        store = InMemoryObjectStore()
+        await store.put("bucket", "a", b"1")
+        await store.remove("bucket", "a")
+        # Removing a missing object is not an error, as with S3
+        await store.remove("bucket", "a")
+        assert await store.list("bucket") == []
+
+    asyncio.run(scenario())
+
+
+def test_fetch_many_keeps_the_order_of_the_names():
+    async def scenario():
+        store = InMemoryObjectStore(latency_seconds=0.001)
+        for index in range(5):
+            await store.put("bucket", f"object-{index}", str(index).encode())
+        names = [f"object-{index}" for index in (3, 0, 4, 1)]
+        assert await store.fetch_many("bucket", names) == [b"3", b"0", b"4", b"1"]
+
+    asyncio.run(scenario())
+
+
+def test_fetch_many_errors():
+    async def scenario():
+        store = InMemoryObjectStore()
+        await store.put("bucket", "present", b"1")
+        with pytest.raises(ObjectNotFoundError):
+            await store.fetch_many("bucket", ["present", "missing"])
+
+        results = await store.fetch_many(
+            "bucket", ["present", "missing"], return_exceptions=True
+        )
+        assert results[0] == b"1"
+        assert isinstance(results[1], ObjectNotFoundError)
+        assert results[1].object_name == "missing"
+
+    asyncio.run(scenario())
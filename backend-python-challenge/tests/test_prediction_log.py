@@ -0,0 +1,135 @@
+import asyncio
+import io
+from datetime import datetime
+
+import polars as ps
+
+from api.prediction_history import PARTITION_FORMAT
+from api.prediction_log import (
+    COMPACTED_PREFIX,
+    PART_PREFIX,
+    PredictionLogWriter,
+    decode_manifest,
+    manifest_name,
+)
+from storage.memory_store import InMemoryObjectStore
+
+BUCKET = "predictions"
+WRITER_ID = "test-0"
+
+
+def animals(rows: int, label: str = "dog") -> ps.DataFrame:
+    return ps.DataFrame(
+        {
+            "height": [float(i) for i in range(rows)],
+            "weight": [float(i) for i in range(rows)],
+            "walks_on_n_legs": [4] * rows,
+            "has_wings": [False] * rows,
+            "has_tail": [True] * rows,
+            "label": [label] * rows,
+        }
+    )
+
+
+async def write_requests(writer: PredictionLogWriter, sizes: list[int]) -> str:
+    """Log and flush one request per size, each in its own part."""
+    for size in sizes:
+        writer.append_frame("1-10", animals(size))
+        await writer.flush()
+    return datetime.now().strftime(PARTITION_FORMAT)
+
+
+async def stored_names(store: InMemoryObjectStore, partition: str) -> list[str]:
+    return [
+        info.name[len(partition) + 1 :]
+        for info in await store.list(BUCKET, f"{partition}/")
+    ]
+
+
+async def read_manifest(store: InMemoryObjectStore, partition: str):
+    return decode_manifest(await store.get(BUCKET, manifest_name(partition, WRITER_ID)))
+
+
+def test_flush_writes_a_part_and_lists_it_in_the_manifest():
+    async def scenario():
+        store = InMemoryObjectStore()
+        writer = PredictionLogWriter(store, BUCKET, writer_id=WRITER_ID)
+        partition = await write_requests(writer, [3, 2])
+
+        entries = await read_manifest(store, partition)
+        assert [(entry.rows, entry.requests) for entry in entries] == [(3, 1), (2, 1)]
+        assert all(
+            entry.name.startswith(f"{partition}/{PART_PREFIX}") for entry in entries
+        )
+        assert writer.stats()["flushed_rows"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_compact_partition_merges_the_parts():
+    async def scenario():
+        store = InMemoryObjectStore()
+        writer = PredictionLogWriter(store, BUCKET, writer_id=WRITER_ID)
+        partition = await write_requests(writer, [3, 2, 4])
+        parts = await read_manifest(store, partition)
+
+        await writer._compact_partition(partition, parts)
+
+        entries = await read_manifest(store, partition)
+        assert len(entries) == 1
+        compacted = entries[0]
+        assert compacted.name.startswith(f"{partition}/{COMPACTED_PREFIX}{WRITER_ID}-")
+        assert (compacted.rows, compacted.requests) == (9, 3)
+        assert compacted.start == min(part.start for part in parts)
+        assert compacted.end == max(part.end for part in parts)
+
+        df = ps.read_parquet(io.BytesIO(await store.get(BUCKET, compacted.name)))
+        assert df.height == 9
+        assert df["timestamp"].is_sorted()
+        assert df["request_id"].n_unique() == 3
+
+        # The parts are deleted once the manifest lists the merged file
+        names = await stored_names(store, partition)
+        assert not [name for name in names if name.startswith(PART_PREFIX)]
+
+    asyncio.run(scenario())
+
+
+def test_compact_waits_for_enough_parts():
+    async def scenario():
+        store = InMemoryObjectStore()
+        writer = PredictionLogWriter(
+            store, BUCKET, writer_id=WRITER_ID, compaction_min_files=3
+        )
+        partition = await write_requests(writer, [1, 1])
+        await writer.compact()
+        assert len(await read_manifest(store, partition)) == 2
+        assert writer.stats()["compactions"] == 0
+
+        await write_requests(writer, [1])
+        await writer.compact()
+        assert len(await read_manifest(store, partition)) == 1
+        assert writer.stats()["compactions"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_compact_removes_files_missing_from_the_manifest():
+    async def scenario():
+        store = InMemoryObjectStore()
+        writer = PredictionLogWriter(store, BUCKET, writer_id=WRITER_ID)
+        partition = await write_requests(writer, [1])
+        # A part whose manifest update failed, and a part of another writer
+        orphan = f"{partition}/{PART_PREFIX}{WRITER_ID}-000000-deadbeef.parquet"
+        other = f"{partition}/{PART_PREFIX}other-1-000000-deadbeef.parquet"
+        await store.put(BUCKET, orphan, b"")
+        await store.put(BUCKET, other, b"")
+
+        await writer.compact()
+
+        names = await stored_names(store, partition)
+        assert orphan.split("/", 1)[1] not in names
+        assert other.split("/", 1)[1] in names
+        assert len(await read_manifest(store, partition)) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from machine_learning import search
+from machine_learning.search import (
+    PARAM_GRIDS,
+    build_folds,
+    is_valid_best_params,
+    search_hyperparameters,
+)
+
+
+def easy_problem(rows: int = 600, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Two classes split by the signs of the first two features, off a margin."""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(-1, 1, size=(rows, 4))
+    X[:, :2] += np.sign(X[:, :2]) * 0.2
+    y = ((X[:, 0] > 0) & (X[:, 1] > 0)).astype(int)
+    return X, y
+
+
+def test_build_folds_are_stratified():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 3))
+    y = np.array([0] * 400 + [1] * 75 + [2] * 25)
+
+    folds = build_folds(X, y, cv=5)
+
+    assert len(folds) == 5
+    for fold in folds:
+        # Same class proportions in every validation fold
+        assert np.bincount(fold.y_val).tolist() == [80, 15, 5]
+        assert np.bincount(fold.y_train).tolist() == [320, 60, 20]
+        # Scaled with the statistics of the train rows
+        np.testing.assert_allclose(fold.X_train.mean(axis=0), 0, atol=1e-12)
+        np.testing.assert_allclose(fold.X_train.std(axis=0), 1)
+        assert sorted(fold.subsample_order) == list(range(len(fold.y_train)))
+    # Every row is validated once
+    assert sum(len(fold.y_val) for fold in folds) == len(y)
+
+
+def test_build_folds_are_reproducible():
+    X, y = easy_problem()
+    first, second = build_folds(X, y, random_state=3), build_folds(X, y, random_state=3)
+
+    for a, b in zip(first, second, strict=True):
+        np.testing.assert_array_equal(a.X_val, b.X_val)
+        np.testing.assert_array_equal(a.subsample_order, b.subsample_order)
+
+
+def test_folds_are_built_once_and_shared_by_the_learners(monkeypatch):
+    built = []
+    fitted = {}
+
+    def counting_build_folds(*args, **kwargs):
+        built.append(build_folds(*args, **kwargs))
+        return built[-1]
+
+    def recording_fit_and_score(learner, params, fold, n_rows, scoring):
+        fitted.setdefault(learner, set()).add(id(fold))
+        return 1.0, 0.0
+
+    monkeypatch.setattr(search, "build_folds", counting_build_folds)
+    monkeypatch.setattr(search, "_fit_and_score", recording_fit_and_score)
+    X, y = easy_problem()
+
+    search_hyperparameters(
+        X,
+        y,
+        param_grids={
+            "dtc": {"max_depth": [1, 2]},
+            "knn": {"n_neighbors": [3]},
+        },
+        cv=3,
+        n_jobs=1,
+    )
+
+    assert len(built) == 1
+    fold_ids = {id(fold) for fold in built[0]}
+    assert fitted == {"dtc": fold_ids, "knn": fold_ids}
+
+
+def test_halving_keeps_the_best_candidate():
+    X, y = easy_problem()
+    param_grids = {
+        "dtc": {
+            "max_depth": [1, 2, 5],
+            "criterion": ["gini", "entropy"],
+            "min_samples_split": [2],
+        }
+    }
+
+    exhaustive = search_hyperparameters(X, y, param_grids=param_grids, n_jobs=1)
+    halving = search_hyperparameters(
+        X,
+        y,
+        param_grids=param_grids,
+        n_jobs=1,
+        halving=True,
+        factor=3,
+        min_resources=50,
+    )
+
+    result = halving["dtc"]
+    assert result.best_params["max_depth"] >= 2
+    assert result.best_score == pytest.approx(exhaustive["dtc"].best_score)
+    assert result.best_score > 0.95
+    # The six candidates, then the best third of them on three times more rows,
+    # until the full folds of 480 train rows
+    rungs = [entry["n_rows"] for entry in result.cv_results]
+    assert rungs == [53] * 6 + [160] * 2 + [480]
+
+
+def test_is_valid_best_params():
+    current = {
+        learner: {name: values[0] for name, values in grid.items()}
+        for learner, grid in PARAM_GRIDS.items()
+    }
+    assert is_valid_best_params(current)
+    assert is_valid_best_params({learner: {} for learner in PARAM_GRIDS})
+
+
+@pytest.mark.parametrize(
+    "best_params",
+    [
+        None,
+        [],
+        "knn",
+        # Pipeline parameter names of older versions
+        {
+            "knn": {"knn__n_neighbors": 3},
+            "dtc": {"dtc__max_depth": 3},
+            "svc": {"svc__C": 1},
+        },
+        # A single set of parameters for the voting classifier
+        {"n_neighbors": 3, "max_depth": 3, "C": 1},
+        # A learner is missing, or unknown
+        {"knn": {}, "dtc": {}},
+        {"knn": {}, "dtc": {}, "svc": {}, "rf": {}},
+        {"knn": {}, "dtc": {}, "svc": [("C", 1)]},
+    ],
+)
+def test_is_valid_best_params_rejects_stale_formats(best_params):
+    assert not is_valid_best_params(best_params)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from api.single_flight import LeaseLostError, MinioLease, SingleFlight, minio_lock
+
+BUCKET = "data"
+LEASE = "locks/1-10.lock"
+
+
+def test_coalesces_concurrent_calls():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await release.wait()
+            return "dataset"
+
+        callers = [asyncio.create_task(flight.do("1-10", func)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.stats() == {"in_flight": 1, "executions": 1, "coalesced": 2}
+
+        release.set()
+        assert await asyncio.gather(*callers) == ["dataset"] * 3
+        assert calls == [1]
+        assert flight.stats()["in_flight"] == 0
+
+        # The key is free again once the call is done
+        assert await flight.do("1-10", func) == "dataset"
+        assert calls == [1, 1]
+
+    asyncio.run(scenario())
+
+
+def test_exceptions_reach_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def func():
+            await release.wait()
+            raise ValueError("generation failed")
+
+        callers = [asyncio.create_task(flight.do("1-10", func)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def func():
+            await release.wait()
+            return "dataset"
+
+        first = asyncio.create_task(flight.do("1-10", func))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("1-10", func))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "dataset"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 1}
+
+    asyncio.run(scenario())
+
+
+class FakeResponse:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class FakeLeaseClient:
+    """Stores objects in a dict, with the calls MinioLease makes."""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def get_object(self, bucket, object_name):
+        try:
+            return FakeResponse(self.objects[(bucket, object_name)])
+        except KeyError:
+            raise Exception("S3 operation failed; code: NoSuchKey") from None
+
+    def put_object(self, bucket, object_name, data, length, content_type=None):
+        self.objects[(bucket, object_name)] = data.read(length)
+
+    def remove_object(self, bucket, object_name):
+        del self.objects[(bucket, object_name)]
+
+    def set_lease(self, owner: str, expires_in: float) -> None:
+        self.objects[(BUCKET, LEASE)] = json.dumps(
+            {"owner": owner, "expires_at": time.time() + expires_in}
+        ).encode()
+
+    def lease_owner(self):
+        data = self.objects.get((BUCKET, LEASE))
+        return json.loads(data)["owner"] if data is not None else None
+
+
+FAST = {"poll_seconds": 0.01, "settle_seconds": 0.01}
+
+
+def test_takes_over_an_expired_lease():
+    async def scenario():
+        client = FakeLeaseClient()
+        client.set_lease("crashed-worker", expires_in=-1)
+
+        async with minio_lock(client, BUCKET, LEASE, 1.0, **FAST) as acquired:
+            assert acquired
+            assert client.lease_owner() not in (None, "crashed-worker")
+        assert client.lease_owner() is None
+
+    asyncio.run(scenario())
+
+
+def test_lease_taken_over_during_the_work():
+    async def scenario():
+        client = FakeLeaseClient()
+        with pytest.raises(LeaseLostError, match="taken over by other-worker"):
+            async with minio_lock(
+                client, BUCKET, LEASE, 1.0, ttl_seconds=0.15, **FAST
+            ) as acquired:
+                assert acquired
+                # This worker stalls past the expiration and another one takes
+                # the lease, the next renewal finds it and aborts the block
+                client.set_lease("other-worker", expires_in=60)
+                await asyncio.sleep(5)
+
+        # The lease of the other worker is kept
+        assert client.lease_owner() == "other-worker"
+
+    asyncio.run(scenario())
+
+
+def test_renewal_extends_a_held_lease():
+    async def scenario():
+        client = FakeLeaseClient()
+        lease = MinioLease(client, BUCKET, LEASE, ttl_seconds=0.15, **FAST)
+        assert await lease.acquire(1.0)
+        first_expiration = json.loads(client.objects[(BUCKET, LEASE)])["expires_at"]
+
+        await asyncio.sleep(0.2)
+        expiration = json.loads(client.objects[(BUCKET, LEASE)])["expires_at"]
+        assert expiration > first_expiration
+        assert lease.lost_to is None
+
+        await lease.release()
+        assert client.lease_owner() is None
+
+    asyncio.run(scenario())
+
+
+def test_times_out_on_a_held_lease():
+    async def scenario():
+        client = FakeLeaseClient()
+        client.set_lease("other-worker", expires_in=60)
+
+        started = time.monotonic()
+        async with minio_lock(client, BUCKET, LEASE, 0.1, **FAST) as acquired:
+            assert not acquired
+        assert 0.1 <= time.monotonic() - started < 1.0
+
+        # The block ran without the lease and left it to its owner
+        assert client.lease_owner() == "other-worker"
+
+    asyncio.run(scenario())
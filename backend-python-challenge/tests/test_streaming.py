@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from api.streaming import (
+    UploadPipe,
+    iter_json_array,
+    iter_json_array_batches,
+    upload_pipe_to_minio,
+)
+
+DOCUMENT = json.dumps(
+    [
+        {"name": "dog", "weight": 12.5, "walks_on_n_legs": 4, "has_tail": True},
+        {"name": 'a "quoted" ], {string}', "escaped": "\\\n\t"},
+        {"name": "éléphant 🐘", "weight": 1234567.125e-3, "has_wings": None},
+        [1, [2, [3]], {}],
+        12345,
+        -0.5e10,
+        "text",
+        True,
+        False,
+        None,
+    ],
+    ensure_ascii=False,
+).encode()
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def parse(data: bytes, size: int | None = None) -> list:
+    async def scenario():
+        chunk_size = size or max(len(data), 1)
+        return [item async for item in iter_json_array(chunked(data, chunk_size))]
+
+    return asyncio.run(scenario())
+
+
+def test_chunk_boundaries_anywhere_in_the_document():
+    expected = json.loads(DOCUMENT)
+    # Every split position falls inside a token, a string or a multi-byte
+    # character at some point
+    for size in range(1, 12):
+        assert parse(DOCUMENT, size) == expected
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (b"[]", []),
+        (b"  \r\n\t[ \n ]\n ", []),
+        (b'\n[ {"a" : 1} ,\n\t{"a": 2}  ]  \n', [{"a": 1}, {"a": 2}]),
+        (b"[1,2]", [1, 2]),
+    ],
+)
+def test_whitespace_and_empty_arrays(data, expected):
+    assert parse(data) == expected
+    assert parse(data, 1) == expected
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"   ",
+        b"[",
+        b'[{"a": 1}, {"b"',
+        b"[1, 2",
+        b'["unterminated',
+        b'["\xc3',
+        b'{"a": 1}',
+        b"[1, }]",
+        b"[1] trailing",
+    ],
+)
+def test_truncated_or_malformed_input(data):
+    with pytest.raises(ValueError):
+        parse(data)
+    with pytest.raises(ValueError):
+        parse(data, 1)
+
+
+def test_batches():
+    async def scenario(batch_size: int):
+        data = json.dumps(list(range(7))).encode()
+        return [
+            batch
+            async for batch in iter_json_array_batches(chunked(data, 3), batch_size)
+        ]
+
+    assert asyncio.run(scenario(3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert asyncio.run(scenario(7)) == [list(range(7))]
+    assert asyncio.run(scenario(100)) == [list(range(7))]
+
+
+class RecordingMinio:
+    """Reads the uploaded stream part by part, like the MinIO client does."""
+
+    def __init__(self, fail_after_parts: int | None = None):
+        self.fail_after_parts = fail_after_parts
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.calls: list[dict] = []
+
+    def put_object(self, bucket, object_name, data, length, part_size, content_type):
+        self.calls.append(
+            {"length": length, "part_size": part_size, "content_type": content_type}
+        )
+        content = bytearray()
+        parts = 0
+        while part := data.read(part_size):
+            content += part
+            parts += 1
+            if parts == self.fail_after_parts:
+                raise ConnectionError("connection reset")
+        self.objects[(bucket, object_name)] = bytes(content)
+        return object_name
+
+
+def start_upload(
+    client: RecordingMinio, pipe: UploadPipe
+) -> tuple[threading.Thread, dict]:
+    outcome = {}
+
+    def upload():
+        try:
+            outcome["result"] = upload_pipe_to_minio(
+                client, "data", "dataset.parquet", pipe, "application/x-parquet", 4
+            )
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=upload, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def test_upload_pipe_round_trip():
+    client = RecordingMinio()
+    pipe = UploadPipe(block_size=3, max_blocks=2)
+    thread, outcome = start_upload(client, pipe)
+
+    data = bytes(range(100))
+    for start in range(0, len(data), 7):
+        pipe.write(data[start : start + 7])
+    pipe.close()
+    thread.join(timeout=5)
+
+    assert outcome == {"result": "dataset.parquet"}
+    assert pipe.tell() == len(data)
+    assert client.objects[("data", "dataset.parquet")] == data
+    assert client.calls == [
+        {"length": -1, "part_size": 4, "content_type": "application/x-parquet"}
+    ]
+
+
+def test_abort_by_the_producer_fails_the_upload():
+    client = RecordingMinio()
+    pipe = UploadPipe(block_size=3, max_blocks=2)
+    thread, outcome = start_upload(client, pipe)
+
+    pipe.write(b"partial data")
+    error = ValueError("Unexpected end of JSON array")
+    pipe.abort(error)
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], RuntimeError)
+    assert outcome["error"].__cause__ is error
+    # Nothing is stored, the multipart upload is abandoned
+    assert client.objects == {}
+
+
+def test_failed_upload_unblocks_the_writer():
+    client = RecordingMinio(fail_after_parts=1)
+    pipe = UploadPipe(block_size=3, max_blocks=1)
+    thread, outcome = start_upload(client, pipe)
+
+    # Without the reader error the writer would block on the full pipe forever
+    with pytest.raises(RuntimeError, match="Upload failed"):
+        for _ in range(100):
+            pipe.write(b"abc")
+    thread.join(timeout=5)
+
+    assert isinstance(outcome["error"], ConnectionError)
+    # Aborting after the reader failed does not block either
+    pipe.abort(ValueError("stop"))
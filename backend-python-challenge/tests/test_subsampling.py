@@ -0,0 +1,154 @@
+import numpy as np
+import polars as ps
+import pytest
+from sklearn.linear_model import SGDClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+
+from clustering.cluster_data import label_dataframe
+from machine_learning.classify import classify_data_using_subsampling
+from machine_learning.estimators import SubsampledClassifier, make_scalable_svc
+from machine_learning.machine_learning_functions import (
+    prepare_data_for_machine_learning,
+    split_data,
+    stratified_subsample_indices,
+)
+
+BEST_PARAMS = {
+    "knn": {"n_neighbors": 5, "weights": "uniform", "metric": "euclidean"},
+    "dtc": {"criterion": "gini", "max_depth": 5, "min_samples_split": 2},
+    "svc": {"C": 1, "kernel": "rbf", "gamma": 0.1},
+}
+
+
+def animals(rows: int, seed: int = 0) -> ps.DataFrame:
+    """Animals of the four classes, labeled by the labeling rules."""
+    rng = np.random.default_rng(seed)
+    legs = rng.choice([2, 4], size=rows)
+    wings = (legs == 2) & (rng.random(rows) < 0.5)
+    weight = np.where(
+        legs == 4,
+        rng.choice([20.0, 2000.0], size=rows),
+        np.where(wings, 2.0, 50.0),
+    ) * rng.uniform(0.5, 1.5, size=rows)
+    return label_dataframe(
+        ps.DataFrame(
+            {
+                "height": weight**0.3 * rng.uniform(0.8, 1.2, size=rows),
+                "weight": weight,
+                "walks_on_n_legs": legs,
+                "has_wings": wings,
+                "has_tail": rng.random(rows) < 0.8,
+            }
+        )
+    )
+
+
+def separable(rows: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 3, size=rows)
+    X = rng.normal(scale=0.3, size=(rows, 4)) + np.eye(3, 4)[y] * 3
+    return X, y
+
+
+def test_stratified_subsample_keeps_the_class_proportions():
+    y = np.array([0] * 700 + [1] * 200 + [2] * 100)
+    rows = stratified_subsample_indices(y, 100, random_state=1)
+
+    assert len(rows) == 100
+    assert np.bincount(y[rows]).tolist() == [70, 20, 10]
+    assert list(rows) == sorted(set(rows))
+    np.testing.assert_array_equal(
+        rows, stratified_subsample_indices(y, 100, random_state=1)
+    )
+
+
+def test_stratified_subsample_keeps_every_row_of_small_datasets():
+    y = np.array([0, 1, 1, 0])
+    np.testing.assert_array_equal(stratified_subsample_indices(y, 4), np.arange(4))
+    np.testing.assert_array_equal(stratified_subsample_indices(y, 10), np.arange(4))
+
+
+def test_subsampled_classifier_fits_on_a_sample():
+    X, y = separable(1000)
+    model = SubsampledClassifier(KNeighborsClassifier(), max_rows=200).fit(X, y)
+
+    assert model.n_training_rows_ == 200
+    assert model.estimator_.n_samples_fit_ == 200
+    assert list(model.classes_) == [0, 1, 2]
+    assert model.score(X, y) > 0.95
+    assert model.predict_proba(X[:5]).shape == (5, 3)
+
+
+def test_scalable_svc_with_a_linear_kernel():
+    X, y = separable(600)
+    model = make_scalable_svc({"C": 2.0, "kernel": "linear"}, n_rows=len(X))
+
+    assert isinstance(model, SGDClassifier)
+    assert model.alpha == pytest.approx(1 / (2.0 * 600))
+    assert model.fit(X, y).score(X, y) > 0.95
+
+
+def test_scalable_svc_with_an_rbf_kernel():
+    # Circles, which a linear model cannot separate
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 2))
+    y = (np.linalg.norm(X, axis=1) > 1.2).astype(int)
+
+    model = make_scalable_svc(
+        {"C": 10, "kernel": "rbf", "gamma": 0.5}, n_rows=len(X), n_components=100
+    )
+
+    assert isinstance(model, Pipeline)
+    assert model.named_steps["features"].gamma == 0.5
+    assert model.named_steps["features"].n_components == 100
+    assert model.fit(X, y).score(X, y) > 0.9
+
+    # The feature map cannot have more components than rows
+    small = make_scalable_svc({"kernel": "rbf", "gamma": "scale"}, n_rows=50)
+    assert small.named_steps["features"].n_components == 50
+    assert small.named_steps["features"].gamma is None
+
+
+def test_classify_data_using_subsampling_fills_the_fidelity():
+    dataframe = animals(2000)
+
+    result, label_encoder = classify_data_using_subsampling(
+        dataframe, knn_rows=300, fidelity_rows=500, best_params=BEST_PARAMS
+    )
+
+    X, y, _ = prepare_data_for_machine_learning(dataframe)
+    train_rows = len(split_data(X, y)[0])
+    assert result.training_mode == "subsample"
+    assert result.training_rows == train_rows
+    assert result.search_rows == 0
+    assert result.best_params == BEST_PARAMS
+    assert result.model.estimators_[0].n_training_rows_ == 300
+
+    fidelity = result.fidelity
+    assert set(fidelity) == {
+        "reference_rows",
+        "agreement",
+        "reference_accuracy",
+        "accuracy_delta",
+    }
+    assert fidelity["reference_rows"] == 500
+    assert 0.9 <= fidelity["agreement"] <= 1.0
+    assert fidelity["accuracy_delta"] == pytest.approx(
+        result.accuracy - fidelity["reference_accuracy"]
+    )
+    assert result.accuracy > 0.9
+    assert set(label_encoder.classes_) == {"chicken", "dog", "elephant", "kangaroo"}
+
+
+def test_classify_data_using_subsampling_searches_on_a_sample():
+    dataframe = animals(1000, seed=1)
+
+    result, _ = classify_data_using_subsampling(
+        dataframe, search_rows=200, knn_rows=300, fidelity_rows=10_000, halving=True
+    )
+
+    assert result.search_rows == 200
+    assert set(result.best_params) == {"knn", "dtc", "svc"}
+    # The train split is smaller than fidelity_rows, the reference uses all of it
+    assert result.fidelity["reference_rows"] == result.training_rows
@@ -0,0 +1,98 @@
+import numpy as np
+import polars as ps
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from machine_learning.machine_learning_functions import (
+    prepare_data_for_machine_learning,
+)
+from machine_learning.surrogate import CompiledTreeClassifier, distill_model
+
+
+def animals(rows: int, seed: int = 0) -> ps.DataFrame:
+    rng = np.random.default_rng(seed)
+    legs = rng.choice([2, 4], size=rows)
+    return ps.DataFrame(
+        {
+            "height": rng.uniform(0.2, 4.0, size=rows),
+            "weight": rng.uniform(1.0, 5000.0, size=rows),
+            "walks_on_n_legs": legs,
+            "has_wings": (legs == 2) & (rng.random(rows) < 0.5),
+            "has_tail": rng.random(rows) < 0.8,
+            "label": rng.choice(["chicken", "dog", "elephant"], size=rows),
+        }
+    )
+
+
+@pytest.mark.parametrize("max_depth", [1, 4, None])
+def test_compiled_tree_reproduces_the_tree(max_depth):
+    rng = np.random.default_rng(0)
+    X = np.column_stack(
+        [
+            rng.normal(size=2000),
+            rng.uniform(0, 5000, size=2000),
+            rng.integers(0, 5, size=2000),
+            rng.integers(0, 2, size=2000),
+        ]
+    )
+    y = np.where(X[:, 0] + X[:, 2] > 2, "dog", "cat").astype(object)
+    y[rng.random(2000) < 0.1] = "elephant"
+    tree = DecisionTreeClassifier(max_depth=max_depth, random_state=0).fit(X, y)
+    compiled = CompiledTreeClassifier(tree)
+
+    # New rows, plus rows lying exactly on the thresholds and right next to them
+    X_test = rng.normal(size=(500, 4)) * X.std(axis=0) + X.mean(axis=0)
+    split = tree.tree_.feature >= 0
+    for delta in (-1e-9, 0.0, 1e-9):
+        on_thresholds = np.repeat(X[:1], split.sum(), axis=0)
+        on_thresholds[np.arange(split.sum()), tree.tree_.feature[split]] = (
+            tree.tree_.threshold[split] + delta
+        )
+        X_test = np.vstack([X_test, on_thresholds])
+
+    np.testing.assert_array_equal(compiled.predict(X_test), tree.predict(X_test))
+    np.testing.assert_array_equal(
+        compiled.predict_proba(X_test), tree.predict_proba(X_test)
+    )
+    assert (compiled.depth, compiled.n_leaves) == (
+        tree.get_depth(),
+        tree.get_n_leaves(),
+    )
+    assert list(compiled.classes_) == ["cat", "dog", "elephant"]
+
+
+class RuleModel:
+    """A trained model stand-in, predicting the encoded label from a rule."""
+
+    def __init__(self, rule):
+        self.rule = rule
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.rule(X)
+
+
+def test_distill_model_keeps_a_tree_that_agrees():
+    dataframe = animals(3000)
+    # Weight above 2500 for legs 4, a depth-2 tree
+    model = RuleModel(lambda X: ((X[:, 2] == 4) & (X[:, 1] > 2500)).astype(int))
+
+    compiled, summary = distill_model(dataframe, model, min_agreement=0.99)
+
+    assert compiled is not None
+    assert summary["agreement"] >= 0.99
+    assert summary["depth"] <= 2
+    X, _, _ = prepare_data_for_machine_learning(dataframe)
+    assert np.mean(compiled.predict(X) == model.predict(X)) >= 0.99
+
+
+def test_distill_model_discards_a_tree_below_min_agreement():
+    dataframe = animals(3000)
+    # Labels a shallow tree cannot imitate
+    model = RuleModel(lambda X: (X[:, 1] * 1000).astype(int) % 3)
+
+    compiled, summary = distill_model(dataframe, model, max_depth=3, min_agreement=0.99)
+
+    assert compiled is None
+    assert summary["agreement"] < 0.99
+    assert summary["depth"] <= 3
+    assert summary["test_rows"] == 600
@@ -0,0 +1,137 @@
+import asyncio
+
+import polars as ps
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+
+from api.controllers.validate_controller import score_dataset
+from api.model_artifact import encode_model_artifact
+from api.object_cache import CachedObject
+from config.settings import settings
+from machine_learning.machine_learning_functions import prepare_data_for_prediction
+
+
+def animals(rows: list[tuple[bool, str]]) -> ps.DataFrame:
+    return ps.DataFrame(
+        {
+            "height": [1.0] * len(rows),
+            "weight": [1.0] * len(rows),
+            "walks_on_n_legs": [2 if wings else 4 for wings, _ in rows],
+            "has_wings": [wings for wings, _ in rows],
+            "has_tail": [True] * len(rows),
+            "label": [label for _, label in rows],
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def model_file(tmp_path_factory):
+    """A model that predicts 'bird' for animals with wings, 'dog' otherwise."""
+    train = animals([(True, "bird"), (False, "dog")] * 10)
+    label_encoder = LabelEncoder().fit(train["label"].to_numpy())
+    model = DecisionTreeClassifier().fit(
+        prepare_data_for_prediction(train),
+        label_encoder.transform(train["label"].to_numpy()),
+    )
+    data = encode_model_artifact(model, label_encoder).getvalue()
+    path = tmp_path_factory.mktemp("object-cache") / "etag"
+    path.write_bytes(data)
+    cached_object = CachedObject(
+        bucket="models",
+        object_name="1-20/model.artifact",
+        etag="etag",
+        path=str(path),
+        size=len(data),
+    )
+    return cached_object, label_encoder
+
+
+def test_score_dataset(model_file, monkeypatch):
+    cached_object, label_encoder = model_file
+    # Several slices, so the matrices of the workers are summed
+    monkeypatch.setattr(settings, "VALIDATION_CHUNK_ROWS", 2)
+    dataframe = animals(
+        [
+            (True, "bird"),
+            (True, "bird"),
+            (False, "bird"),
+            (False, "dog"),
+            # Unknown to the model, which never predicts it
+            (False, "cat"),
+            (True, "outlier"),
+        ]
+    )
+
+    result = asyncio.run(
+        score_dataset(
+            dataframe, cached_object.object_name, cached_object, label_encoder
+        )
+    )
+
+    assert result.classes == ["bird", "cat", "dog"]
+    assert result.confusion_matrix == [[2, 0, 1], [0, 0, 1], [0, 0, 1]]
+    assert result.validation_rows == 5
+    assert result.accuracy == pytest.approx(0.6)
+    # Averages weighted by the support of the true classes: bird 3/5, cat 1/5
+    # and dog 1/5
+    assert result.precision == pytest.approx(3 / 5 * 1 + 1 / 5 * 0 + 1 / 5 * 1 / 3)
+    assert result.recall == pytest.approx(3 / 5 * 2 / 3 + 1 / 5 * 0 + 1 / 5 * 1)
+    assert result.confidence_intervals is None
+
+
+def test_score_dataset_with_bootstrap(model_file):
+    cached_object, label_encoder = model_file
+    dataframe = animals([(True, "bird"), (False, "dog"), (False, "bird")] * 10)
+
+    result = asyncio.run(
+        score_dataset(
+            dataframe,
+            cached_object.object_name,
+            cached_object,
+            label_encoder,
+            bootstrap=200,
+        )
+    )
+
+    low, high = result.confidence_intervals["accuracy"]
+    assert low <= result.accuracy <= high
+
+
+def test_score_dataset_without_labeled_rows(model_file):
+    cached_object, label_encoder = model_file
+    dataframe = animals([(True, "outlier"), (False, "outlier")])
+
+    result = asyncio.run(
+        score_dataset(
+            dataframe, cached_object.object_name, cached_object, label_encoder
+        )
+    )
+
+    assert result.validation_rows == 0
+    assert result.classes == ["bird", "dog"]
+    assert result.confusion_matrix == [[0, 0], [0, 0]]
+    assert (result.accuracy, result.precision, result.recall, result.f1) == (
+        0.0,
+        0.0,
+        0.0,
+        0.0,
+    )
+
+
+def test_score_dataset_fails_when_the_copy_was_evicted(model_file, tmp_path):
+    cached_object, label_encoder = model_file
+    # Unknown to the model caches of the workers, and missing from the disk
+    evicted = CachedObject(
+        bucket=cached_object.bucket,
+        object_name="2-20/model.artifact",
+        etag="evicted",
+        path=str(tmp_path / "evicted"),
+        size=cached_object.size,
+    )
+    dataframe = animals([(True, "bird"), (False, "dog")])
+
+    with pytest.raises(FileNotFoundError, match="models/2-20/model.artifact"):
+        asyncio.run(
+            score_dataset(dataframe, evicted.object_name, evicted, label_encoder)
+        )
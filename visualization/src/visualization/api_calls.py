@@ -1,3 +1,5 @@
+import time
+
 import streamlit as st
 import httpx
 
@@ -9,34 +11,55 @@ def fetch_models_from_api(api_base: str) -> list:
     Args:
         api_base (str): The base URL of the API.
     Returns:
-        list: A list of models.
+        list: Names of the models, most recent first.
     """
     try:
         with httpx.Client(timeout=10.0) as client:
-            model_response = client.get(f"{api_base}/models")
+            model_response = client.get(
+                f"{api_base}/models", params={"sort": "-created_at", "limit": 1000}
+            )
             model_response.raise_for_status()
-            return model_response.json().get("data", [])
+            data = model_response.json().get("data") or {}
+            return [model["name"] for model in data.get("items", [])]
     except Exception as e:
         st.error(f"Error fetching models: {e}")
         return []
 
 
-def train_model(seed, num_datapoints, api_base: str) -> dict:
+def train_model(
+    seed, num_datapoints, api_base: str, poll_interval: float = 2.0
+) -> dict:
     """
     Trains a model with the data generated using the provided seed and number of datapoints.
+    Training runs as a background job in the API, which is polled until it finishes.
     Args:
         seed (int): The seed for the model.
         num_datapoints (int): The number of datapoints to train on.
         api_base (str): The base URL of the API.
+        poll_interval (float): Seconds between two status checks of the job.
     """
     try:
-        with httpx.Client(timeout=60.0) as client:
+        with httpx.Client(timeout=10.0) as client:
             response = client.post(
                 f"{api_base}/train?seed={seed}&number_of_datapoints={num_datapoints}"
             )
             response.raise_for_status()
-            fetch_models_from_api.clear()
-            return {"success": True, "data": response.json()}
+            job = response.json()["data"]
+
+            while job["status"] in ("pending", "running"):
+                time.sleep(poll_interval)
+                response = client.get(f"{api_base}/jobs/{job['id']}")
+                response.raise_for_status()
+                job = response.json()["data"]
+
+        if job["status"] != "completed":
+            return {
+                "success": False,
+                "error": job.get("error") or f"Training job {job['status']}",
+            }
+
+        fetch_models_from_api.clear()
+        return {"success": True, "data": job}
 
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -84,6 +107,12 @@ def fetch_history(api_base: str, params):
         with httpx.Client(timeout=30.0) as client:
             response = client.get(f"{api_base}/predictions", params=params)
             response.raise_for_status()
+            if response.status_code == 204:
+                # No predictions in the requested period
+                return {
+                    "success": True,
+                    "data": {"code": 200, "data": {"items": [], "total": 0}},
+                }
             return {"success": True, "data": response.json()}
     except Exception as e:
         return {"success": False, "error": str(e)}
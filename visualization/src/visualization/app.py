@@ -134,6 +134,10 @@ elif section == "History":
 
     start_date = st.date_input("Start date")
     end_date = st.date_input("End date")
+    page_size = st.number_input(
+        "Predictions per page", min_value=1, max_value=1000, value=50
+    )
+    page = st.number_input("Page", min_value=1, value=1)
 
     if st.button("Fetch History"):
         params = {}
@@ -141,16 +145,21 @@ elif section == "History":
             params["start"] = start_date.isoformat()
         if end_date:
             params["end"] = end_date.isoformat()
+        params["limit"] = page_size
+        params["offset"] = (page - 1) * page_size
 
         result = fetch_history(API_BASE, params)
 
         if result["success"]:
             data = result["data"]
             if data["code"] == 200:
-                predictions = data["data"]
+                predictions = data["data"]["items"]
                 if not predictions:
                     st.info("No predictions found for the selected date range.")
                 else:
+                    st.caption(
+                        f"Showing {len(predictions)} of {data['data']['total']} predictions"
+                    )
                     for pred in predictions:
                         st.markdown(f"###  Date: `{pred['date']}`")
                         st.table(pred["animal_data"])